@@ -0,0 +1,136 @@
+# analytics.py
+# Аналитика для организаторов (Dash) под /admin/analytics.
+#
+# Dash и plotly тяжелые, поэтому приложение Dash создается при первом
+# обращении администратора к /admin/analytics, а не в create_app: обычные
+# воркеры их даже не импортируют. Маршрут в routes/admin.py (с проверкой прав)
+# передает запрос WSGI-серверу Dash. Данные берутся только из куба оценок
+# (score_cube.py), сырые оценки не сканируются.
+
+import threading
+
+from flask import Flask, Response
+
+import score_cube
+
+URL_PREFIX = '/admin/analytics/'
+
+TABS = (
+    ('criteria', 'Распределение по критериям'),
+    ('judges', 'Согласованность судей'),
+    ('categories', 'Про и юниоры'),
+    ('completion', 'Готовность конкурсов'),
+)
+
+
+class Analytics:
+    def __init__(self, app=None):
+        self.app = None
+        self._dash = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['analytics'] = self
+
+    def dispatch(self, environ):
+        """Отдает запрос приложению Dash (создает его при первом вызове)."""
+        if self._dash is None:
+            with self._lock:
+                if self._dash is None:
+                    self._dash = self._build()
+        return Response.from_app(self._dash.server.wsgi_app, environ)
+
+    def _build(self):
+        import dash
+        from dash import dcc, html, Input, Output
+
+        app = self.app
+        dash_app = dash.Dash(
+            __name__,
+            server=Flask(__name__),
+            url_base_pathname=URL_PREFIX,
+            title='Аналитика фестиваля',
+        )
+
+        def layout():
+            # Функция, а не готовый макет: список фестивалей обновляется при каждой загрузке страницы
+            with app.app_context():
+                festival_options = [{'label': name, 'value': fid} for fid, name in score_cube.festivals()]
+            return html.Div([
+                html.Div([
+                    html.H3('Аналитика фестиваля', style={'display': 'inline-block', 'marginRight': '20px'}),
+                    html.A('← В админку', href='/admin/results'),
+                ]),
+                dcc.Dropdown(id='festival', options=festival_options,
+                             value=festival_options[0]['value'] if festival_options else None,
+                             clearable=False, style={'maxWidth': '400px'}),
+                dcc.Tabs(id='tab', value=TABS[0][0],
+                         children=[dcc.Tab(label=label, value=value) for value, label in TABS]),
+                dcc.Graph(id='graph', style={'height': '70vh'}),
+            ], style={'fontFamily': 'sans-serif', 'padding': '10px 20px'})
+
+        dash_app.layout = layout
+
+        @dash_app.callback(Output('graph', 'figure'), Input('festival', 'value'), Input('tab', 'value'))
+        def update_graph(festival_id, tab):
+            with app.app_context():
+                return build_figure(tab, festival_id)
+
+        return dash_app
+
+
+def build_figure(tab, festival_id):
+    import plotly.graph_objects as go
+
+    figure = go.Figure()
+    if festival_id is None:
+        figure.update_layout(title='Нет фестивалей')
+        return figure
+
+    if tab == 'criteria':
+        rows = score_cube.criterion_distribution(festival_id)
+        for category in ('pro', 'junior'):
+            part = [r for r in rows if r['category'] == category]
+            figure.add_bar(name=category, x=[r['criterion'] for r in part], y=[r['mean'] for r in part],
+                           error_y={'type': 'data', 'array': [r['std'] for r in part]},
+                           customdata=[r['n'] for r in part],
+                           hovertemplate='%{x}: среднее %{y:.2f}, оценок %{customdata}<extra></extra>')
+        figure.update_layout(title='Средний балл и разброс (±σ) по критериям', barmode='group')
+
+    elif tab == 'judges':
+        names, matrix = score_cube.judge_agreement(festival_id)
+        figure.add_heatmap(z=matrix, x=names, y=names, colorscale='RdYlGn', reversescale=True,
+                           hovertemplate='%{y} / %{x}: %{z}<extra></extra>')
+        figure.update_layout(title='Средняя разница средних баллов судей по общим конкурсам и критериям')
+
+    elif tab == 'categories':
+        rows = score_cube.category_spread(festival_id)
+        for category in ('pro', 'junior'):
+            part = [r for r in rows if r['category'] == category]
+            figure.add_scatter(name=category, mode='markers', x=[r['contest'] for r in part],
+                               y=[r['mean'] for r in part],
+                               error_y={'type': 'data', 'array': [r['std'] for r in part]})
+        figure.update_layout(title='Средний балл и разброс по конкурсам: про и юниоры')
+
+    elif tab == 'completion':
+        rows = score_cube.contest_completion(festival_id)
+        figure.add_bar(name='Готовность, %', x=[r['contest'] for r in rows], y=[r['percent'] for r in rows],
+                       customdata=[[r['done'], r['expected']] for r in rows],
+                       hovertemplate='%{x}: %{customdata[0]} из %{customdata[1]} оценок<extra></extra>')
+        done, expected = 0, 0
+        cumulative = []
+        for r in rows:
+            done += min(r['done'], r['expected'])
+            expected += r['expected']
+            cumulative.append(round(100 * done / expected, 1) if expected else 0.0)
+        figure.add_scatter(name='Накоплено по фестивалю, %', mode='lines+markers',
+                           x=[r['contest'] for r in rows], y=cumulative)
+        figure.update_layout(title='Выставлено оценок из ожидаемых (конкурсы по времени начала)',
+                             yaxis={'range': [0, 105]})
+    return figure
+
+
+analytics = Analytics()
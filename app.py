@@ -4,9 +4,10 @@
 from flask import Flask
 from config import Config
 from extensions import db, migrate
+from refdata import CATEGORY_MAP
 
 # Важно импортировать модели здесь, чтобы Alembic (Migrate) мог их видеть
-from models import User, Festival, EventDay, NominationTemplate, TimeSlot, JudgeNomination, Participation, Criterion, Score, Winner
+from models import User, Festival, EventDay, NominationTemplate, TimeSlot, JudgeNomination, Participation, Criterion, Score, Winner, Job, CacheVersion, Notification, ScoreCube, LeaderboardSnapshot, ScoreSyncOp, ScoreEvent, FestivalArchive
 
 def create_app(config_class=Config):
     # Создаем экземпляр приложения
@@ -15,42 +16,81 @@ def create_app(config_class=Config):
 
     @app.context_processor
     def inject_display_maps():
-        CATEGORY_MAP = {
-            'healed': 'Зажившая',
-            'fresh': 'Битва',
-            'both': 'ПЮ',
-            'pro': 'Про',
-            'junior': 'Юниор',
-            'participant': 'Участник',
-            'judge': 'Судья',
-            'admin': 'Администратор'
-        }
         # Делаем словарь CATEGORY_MAP доступным во всех шаблонах
-        return dict(CATEGORY_MAP=CATEGORY_MAP)   
+        # (неизменяемый, создается один раз при импорте refdata)
+        return dict(CATEGORY_MAP=CATEGORY_MAP)
 
     # --- Инициализируем расширения С ПРИЛОЖЕНИЕМ ---
     # Мы связываем объекты db и migrate с нашим конкретным экземпляром app
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # Фоновые задачи (очередь в таблице jobs, пул потоков внутри процесса)
+    from jobs import job_runner
+    job_runner.init_app(app)
+
+    # Отправитель уведомлений в Telegram (outbox в таблице notifications)
+    from notifications import notifier
+    notifier.init_app(app)
+
+    # Статусы слотов по времени: поток в процессе и команда `flask sweep-slots`
+    from sweeper import slot_sweeper
+    slot_sweeper.init_app(app)
+
+    # Выборочное профилирование запросов (включается на странице /admin/profiling)
+    from profiling import profiler
+    profiler.init_app(app)
+
+    # Журнал медленных SQL-запросов с планами (страница /admin/slow-queries)
+    from slow_queries import slow_query_log
+    slow_query_log.init_app(app)
+
+    # Метрики Prometheus (/metrics): задержки по endpoint-ам, SQL, кэши, запись оценок
+    from metrics import metrics
+    metrics.init_app(app)
+
+    # Сжатие ответов gzip / brotli по Accept-Encoding (и потоковых страниц - по частям)
+    from compression import compression
+    compression.init_app(app)
+
     # --- Регистрируем наши Blueprints (маршруты) ---
     from routes.auth import auth_bp
     from routes.main import main_bp
     from routes.admin import admin_bp
+    from routes.api import api_bp
+    from routes.board import board_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(admin_bp)
+    # Telegram WebApp и его JSON API
+    app.register_blueprint(api_bp)
+    # Офлайн-судейство: команда очистки журнала операций синхронизации оценок
+    import score_sync
+    score_sync.init_app(app)
+    # Публичные табло зон (без входа): итоги из снимков и «сейчас / далее» из индекса расписания в памяти
+    from timeline import timeline
+    timeline.init_app(app)
+    app.register_blueprint(board_bp)
+    import leaderboard
+    leaderboard.init_app(app)
+
+    # Журнал изменений оценок: из него обновляются куб оценок и табло (`flask replay-score-events`)
+    import score_events
+    score_events.init_app(app)
+
+    # Аналитика (Dash под /admin/analytics, создается при первом обращении) и куб оценок для нее
+    import score_cube
+    score_cube.init_app(app)
+    from analytics import analytics
+    analytics.init_app(app)
+
+    # Статика с отпечатками содержимого: до прогрева, чтобы asset_url() в шаблонах уже знал имена
+    from assets import assets
+    assets.init_app(app)
+
+    # Прогрев: байткод-кэш Jinja, компиляция всех шаблонов и загрузка справочников до первого запроса
+    from warmup import warmup
+    warmup.init_app(app)
 
- # ======= Telegram WebApp ========
-    @app.route('/webapp')
-    def webapp():
-        return render_template('webapp.html')
-
-    @app.route('/api/data', methods=['POST'])
-    def handle_telegram_data():
-        data = request.json
-        # Здесь можно добавить логику обработки данных от Telegram
-        return jsonify({"status": "success", "data": data})
-    
-    return app
+    return app
\ No newline at end of file
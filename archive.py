@@ -0,0 +1,300 @@
+# archive.py
+# Холодный архив завершенных фестивалей.
+#
+# Заявки, оценки, слоты и журнал оценок растут с каждым фестивалем, и каждый
+# запрос страниц без фильтра по фестивалю платит за всю историю. Фестиваль,
+# у которого все конкурсы и награждения в статусе 'awarded', можно убрать из
+# рабочих таблиц (фоновая задача 'archive_festival'):
+#
+#   1. весь граф фестиваля (дни, слоты, заявки, судьи, оценки, победители,
+#      уведомления, журнал оценок) и снимок справочников и пользователей, на
+#      которые он ссылается, пишется одним сжатым JSON-файлом в ARCHIVE_DIR
+#      вместе с замороженными итогами - теми же таблицами, что на странице
+#      результатов;
+#   2. файл перечитывается и сверяется по числу строк, опись записывается в
+#      festival_archives;
+#   3. строки удаляются из рабочих таблиц пачками (deletion.py), затем события
+#      журнала оценок этих конкурсов.
+#
+# Если задача прервется на шаге 3, повтор не выгружает фестиваль заново (в нем
+# уже не всё), а дочищает удаление по списку слотов из файла.
+#
+# Файл самоописывающий: формат и версия архива, у каждой таблицы - имена и типы
+# колонок. Просмотр архива (/admin/archives/<id>) читает итоги прямо из файла,
+# рабочие таблицы для этого не нужны.
+
+import functools
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import date, datetime
+
+from flask import current_app
+from sqlalchemy import or_, select
+
+from extensions import db
+from jobs import job_handler
+from models import (Festival, EventDay, TimeSlot, Participation, JudgeNomination, Score, Winner, Notification,
+                    ScoreEvent, User, NominationTemplate, Criterion, FestivalArchive)
+from models.nomination_template import nomination_template_criteria
+import deletion
+
+ARCHIVE_FORMAT = 'tattoo-fest-archive'
+ARCHIVE_VERSION = 1
+# Слоты с жизненным циклом: фестиваль закончен, когда все они 'awarded'
+FINISHING_TYPES = ('judging', 'award')
+# Из пользователей в архив идет только то, что нужно для итогов (без telegram_id и токенов)
+USER_COLUMNS = ('id', 'code', 'nickname', 'role', 'experience_category')
+
+
+class ArchiveError(ValueError):
+    """Фестиваль нельзя архивировать или файл архива не читается."""
+
+
+def archive_dir():
+    return current_app.config['ARCHIVE_DIR']
+
+
+# --- Какие фестивали можно архивировать ---
+
+def _festival_slots(*conditions):
+    return select(EventDay.festival_id).join(TimeSlot, TimeSlot.day_id == EventDay.id).where(*conditions)
+
+
+def archivable_festival_ids():
+    """Фестивали, где есть конкурсы и все конкурсы и награждения в статусе 'awarded'."""
+    unfinished = _festival_slots(TimeSlot.type.in_(FINISHING_TYPES),
+                                 or_(TimeSlot.status.is_(None), TimeSlot.status != 'awarded'))
+    return set(db.session.scalars(select(Festival.id).where(
+        Festival.id.in_(_festival_slots(TimeSlot.type == 'judging')), Festival.id.not_in(unfinished))))
+
+
+# --- Выгрузка ---
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _dump(table, condition, columns=None):
+    """Строки таблицы по условию: {'columns', 'types', 'rows'} - как в файле архива."""
+    columns = [table.c[name] for name in columns] if columns else list(table.columns)
+    rows = db.session.execute(select(*columns).where(condition).order_by(*table.primary_key.columns))
+    return {
+        'columns': [c.name for c in columns],
+        'types': [str(c.type) for c in columns],
+        'rows': [[_json_value(value) for value in row] for row in rows],
+    }
+
+
+def records(dumped):
+    """Строки выгруженной таблицы как словари."""
+    return [dict(zip(dumped['columns'], row)) for row in dumped['rows']]
+
+
+def _export_tables(festival_id):
+    day_ids = select(EventDay.id).where(EventDay.festival_id == festival_id)
+    slot_ids = select(TimeSlot.id).where(TimeSlot.day_id.in_(day_ids))
+    participation_ids = select(Participation.id).where(Participation.time_slot_id.in_(slot_ids))
+    template_ids = select(TimeSlot.nomination_template_id).where(TimeSlot.id.in_(slot_ids))
+    user_ids = (select(Participation.user_id).where(Participation.time_slot_id.in_(slot_ids))
+                .union(select(JudgeNomination.judge_id).where(JudgeNomination.time_slot_id.in_(slot_ids)),
+                       select(Score.judge_id).where(Score.participation_id.in_(participation_ids))))
+    criterion_ids = (select(nomination_template_criteria.c.criterion_id)
+                     .where(nomination_template_criteria.c.nomination_template_id.in_(template_ids))
+                     .union(select(Score.criterion_id).where(Score.participation_id.in_(participation_ids))))
+    return {
+        # Граф фестиваля - удаляется из рабочих таблиц
+        'festivals': _dump(Festival.__table__, Festival.id == festival_id),
+        'event_days': _dump(EventDay.__table__, EventDay.festival_id == festival_id),
+        'time_slots': _dump(TimeSlot.__table__, TimeSlot.id.in_(slot_ids)),
+        'participations': _dump(Participation.__table__, Participation.id.in_(participation_ids)),
+        'judge_nominations': _dump(JudgeNomination.__table__, JudgeNomination.time_slot_id.in_(slot_ids)),
+        'scores': _dump(Score.__table__, Score.participation_id.in_(participation_ids)),
+        'winners': _dump(Winner.__table__, Winner.time_slot_id.in_(slot_ids)),
+        'notifications': _dump(Notification.__table__, Notification.time_slot_id.in_(slot_ids)),
+        'score_events': _dump(ScoreEvent.__table__, ScoreEvent.time_slot_id.in_(slot_ids)),
+        # Снимок справочников и пользователей на момент архивации - в рабочих таблицах остаются
+        'users': _dump(User.__table__, User.id.in_(user_ids), USER_COLUMNS),
+        'nomination_templates': _dump(NominationTemplate.__table__, NominationTemplate.id.in_(template_ids)),
+        'criteria': _dump(Criterion.__table__, Criterion.id.in_(criterion_ids)),
+        'nomination_template_criteria': _dump(
+            nomination_template_criteria,
+            nomination_template_criteria.c.nomination_template_id.in_(template_ids)),
+    }
+
+
+def _frozen_results(tables):
+    """
+    Итоги по дням и конкурсам, посчитанные так же, как на странице результатов:
+    среднее по назначенным судьям от среднего балла судьи по критериям шаблона.
+    """
+    users = {u['id']: u for u in records(tables['users'])}
+    templates = {t['id']: t for t in records(tables['nomination_templates'])}
+    criteria = {c['id']: c for c in records(tables['criteria'])}
+    template_criteria = {}
+    for link in records(tables['nomination_template_criteria']):
+        template_criteria.setdefault(link['nomination_template_id'], []).append(criteria[link['criterion_id']])
+    judges_of, participants_of = {}, {}
+    for nomination in records(tables['judge_nominations']):
+        judges_of.setdefault(nomination['time_slot_id'], []).append(nomination['judge_id'])
+    for participation in records(tables['participations']):
+        participants_of.setdefault(participation['time_slot_id'], []).append(participation)
+    scores = {(s['participation_id'], s['judge_id'], s['criterion_id']): s['score'] for s in records(tables['scores'])}
+    places = {w['participation_id']: w['place'] for w in records(tables['winners'])}
+
+    def name(user_id):
+        user = users.get(user_id) or {}
+        return user.get('nickname') or user.get('code') or f'#{user_id}'
+
+    def contest_results(contest):
+        contest_criteria = sorted(template_criteria.get(contest['nomination_template_id'], []), key=lambda c: c['order'])
+        by_category = {'pro': [], 'junior': []}
+        for participation in participants_of.get(contest['id'], []):
+            judge_evaluations, judge_averages = [], []
+            for judge_id in judges_of.get(contest['id'], []):
+                values = [scores.get((participation['id'], judge_id, c['id'])) for c in contest_criteria]
+                valid = [v for v in values if v is not None]
+                judge_avg = sum(valid) / len(valid) if valid else None
+                if judge_avg is not None:
+                    judge_averages.append(judge_avg)
+                judge_evaluations.append({'judge': name(judge_id), 'scores': values,
+                                          'avg': round(judge_avg, 2) if judge_avg is not None else None})
+            user = users.get(participation['user_id']) or {}
+            by_category['pro' if user.get('experience_category') == 'pro' else 'junior'].append({
+                'participation_id': participation['id'],
+                'participant': name(participation['user_id']),
+                'entry_number': participation['entry_number'],
+                'judge_evaluations': judge_evaluations,
+                'final_score': round(sum(judge_averages) / len(judge_averages), 2) if judge_averages else 0,
+                'place': places.get(participation['id']),
+            })
+        for entries in by_category.values():
+            entries.sort(key=lambda e: e['final_score'], reverse=True)
+        template = templates.get(contest['nomination_template_id']) or {}
+        return {
+            'id': contest['id'],
+            'nomination': template.get('name'),
+            'category': contest['category'],
+            'zone': contest['zone'],
+            'start_time': contest['start_time'],
+            'criteria': [{'id': c['id'], 'name': c['name'], 'max_score': c['max_score']} for c in contest_criteria],
+            'participants': by_category,
+        }
+
+    contests = sorted((s for s in records(tables['time_slots']) if s['type'] == 'judging'),
+                      key=lambda s: s['start_time'])
+    return [
+        {'day': day, 'contests': [contest_results(c) for c in contests if c['day_id'] == day['id']]}
+        for day in sorted(records(tables['event_days']), key=lambda d: d['date'])
+    ]
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_festival(festival):
+    """Пишет файл архива фестиваля, сверяет его и сохраняет опись. Рабочие таблицы не меняет."""
+    tables = _export_tables(festival.id)
+    document = {
+        'format': ARCHIVE_FORMAT,
+        'version': ARCHIVE_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'festival': records(tables['festivals'])[0],
+        'tables': tables,
+        'results': _frozen_results(tables),
+    }
+    os.makedirs(archive_dir(), exist_ok=True)
+    file_name = f'festival-{festival.id}-{festival.start_date:%Y%m%d}-{int(time.time())}.json.gz'
+    path = os.path.join(archive_dir(), file_name)
+    # Сначала во временный файл: оборванная запись не оставит «архив» без хвоста
+    with gzip.open(path + '.tmp', 'wt', encoding='utf-8', compresslevel=9) as f:
+        json.dump(document, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+    row_counts = {name: len(table['rows']) for name, table in tables.items()}
+    written = _read(path, os.path.getmtime(path))
+    if {name: len(table['rows']) for name, table in written['tables'].items()} != row_counts:
+        raise ArchiveError(f'Файл архива {file_name} не совпадает с выгрузкой.')
+
+    record = FestivalArchive(festival_id=festival.id, name=festival.name, start_date=festival.start_date,
+                             end_date=festival.end_date, file_name=file_name, size_bytes=os.path.getsize(path),
+                             sha256=_sha256(path), row_counts=json.dumps(row_counts))
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+# --- Архивация целиком ---
+
+def _unfinished(festival):
+    """Опись архива этого фестиваля, удаление которого не закончено (прерванная задача)."""
+    return FestivalArchive.query.filter_by(festival_id=festival.id, name=festival.name,
+                                           start_date=festival.start_date, purged_at=None).first()
+
+
+def archive_festival(festival_id, chunk_size=deletion.CHUNK_SIZE, progress=None):
+    """Выгружает фестиваль в архив и удаляет его из рабочих таблиц. Возвращает (опись, удалено строк)."""
+    progress = progress or (lambda text: None)
+    festival = db.session.get(Festival, festival_id)
+    if festival is None:
+        raise ArchiveError('Фестиваль не найден.')
+    record = _unfinished(festival)
+    if record is None:
+        if festival_id not in archivable_festival_ids():
+            raise ArchiveError(f'В фестивале "{festival.name}" не все конкурсы и награждения завершены.')
+        progress('Выгрузка в архив...')
+        record = export_festival(festival)
+
+    # Список слотов - из файла: при повторе часть слотов уже удалена
+    slot_ids = [row['id'] for row in records(load(record)['tables']['time_slots'])]
+    totals = deletion.purge_festival(
+        festival_id, chunk_size, progress=lambda stage, done, total: progress(f'{stage}: {done} (всего {total})'))
+    totals.update(deletion.purge_score_events(slot_ids, chunk_size))
+    record.purged_at = datetime.now()
+    db.session.commit()
+    return record, totals
+
+
+@job_handler('archive_festival', concurrency=1)
+def archive_festival_job(payload, progress):
+    record, totals = archive_festival(payload['festival_id'], progress=progress)
+    return {'festival_name': record.name, 'archive_id': record.id, 'file': record.file_name,
+            'size_bytes': record.size_bytes, 'deleted': totals}
+
+
+# --- Чтение ---
+
+@functools.lru_cache(maxsize=4)
+def _read(path, mtime):
+    # Файлы архива не меняются; mtime в ключе - на случай, если файл заменили руками
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            document = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArchiveError(f'Не удалось прочитать архив {os.path.basename(path)}: {e}')
+    if document.get('format') != ARCHIVE_FORMAT or document.get('version', 0) > ARCHIVE_VERSION:
+        raise ArchiveError(f'Неизвестный формат архива {os.path.basename(path)}.')
+    return document
+
+
+def archive_path(record):
+    """Путь к файлу архива или None, если файла нет."""
+    path = os.path.join(archive_dir(), record.file_name)
+    return path if os.path.exists(path) else None
+
+
+def load(record):
+    """Содержимое файла архива (кэшируется в процессе)."""
+    path = archive_path(record)
+    if path is None:
+        raise ArchiveError(f'Файл архива {record.file_name} не найден.')
+    return _read(path, os.path.getmtime(path))
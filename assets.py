@@ -0,0 +1,165 @@
+# assets.py
+# Статика с отпечатками содержимого и заранее сжатыми копиями.
+#
+# Каждый файл из static/ копируется в ASSETS_DIR под именем с хэшем
+# содержимого (css/app.css -> css/app.3f2a1b9c0d.css) вместе со сжатыми
+# вариантами .gz и .br (brotli - если установлен). Сборка выполняется при
+# старте воркера (неизменившиеся файлы не перезаписываются) и командой
+# `flask build-assets` при выкладке.
+#
+# Адрес в шаблонах: asset_url('css/app.css') или url_for('assets',
+# filename='css/app.css') - имя подменяется на версию с хэшем. Имя меняется
+# вместе с содержимым, поэтому /assets/... отдается с Cache-Control immutable
+# на год, а браузер выбирает .br/.gz по Accept-Encoding. Файлы не из
+# манифеста отдаются обычным static.
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+import threading
+
+import click
+from flask import abort, current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:  # без brotli отдаем только .gz
+    brotli = None
+
+# Что имеет смысл сжимать (картинки и шрифты уже сжаты)
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# Файлы меньше этого размера не сжимаем: выигрыш меньше накладных расходов
+MIN_COMPRESS_SIZE = 256
+MAX_AGE = 365 * 24 * 3600
+MANIFEST = 'manifest.json'
+
+
+def _hashed_name(filename, digest):
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}.{digest}{ext}'
+
+
+def _write(path, data):
+    """Атомарная запись: воркеры, стартующие одновременно, не видят недописанных файлов."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class Assets:
+    def __init__(self, app=None):
+        self.app = None
+        self.directory = None
+        # исходное имя -> имя с хэшем
+        self.manifest = None
+        # имя с хэшем -> доступные сжатые варианты ('br', 'gzip')
+        self._encodings = {}
+        self._served = frozenset()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['assets'] = self
+        self.directory = app.config['ASSETS_DIR']
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.view)
+        app.url_defaults(self._hashed_filename)
+        app.jinja_env.globals['asset_url'] = asset_url
+        app.cli.add_command(build_assets_command)
+        if not os.environ.get('FLASK_RUN_FROM_CLI'):
+            self.build()
+
+    def build(self):
+        """Собирает файлы с хэшами и сжатые варианты. Возвращает (файлов, записано заново)."""
+        source_dir = self.app.static_folder
+        manifest, encodings, written = {}, {}, 0
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, source_dir).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    data = f.read()
+                hashed = _hashed_name(filename, hashlib.sha256(data).hexdigest()[:10])
+                manifest[filename] = hashed
+                variants = {hashed: data}
+                if filename.endswith(COMPRESSIBLE) and len(data) >= MIN_COMPRESS_SIZE:
+                    variants[hashed + '.gz'] = None
+                    encodings[hashed] = ('gzip',)
+                    if brotli is not None:
+                        variants[hashed + '.br'] = None
+                        encodings[hashed] = ('br', 'gzip')
+                for target, content in variants.items():
+                    target_path = os.path.join(self.directory, target)
+                    if os.path.exists(target_path):
+                        continue  # имя включает хэш содержимого - файл уже актуален
+                    if target.endswith('.gz'):
+                        content = gzip.compress(data, compresslevel=9, mtime=0)
+                    elif target.endswith('.br'):
+                        content = brotli.compress(data, quality=11)
+                    _write(target_path, content)
+                    written += 1
+        _write(os.path.join(self.directory, MANIFEST),
+               json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True).encode())
+        with self._lock:
+            self.manifest, self._encodings, self._served = manifest, encodings, frozenset(manifest.values())
+        return len(manifest), written
+
+    def _ensure_built(self):
+        # Под `flask run` сборки при старте нет - собираем при первом обращении
+        if self.manifest is None:
+            self.build()
+
+    def _hashed_filename(self, endpoint, values):
+        # url_for('assets', filename='css/app.css') -> /assets/css/app.<хэш>.css
+        if endpoint == 'assets' and 'filename' in values:
+            self._ensure_built()
+            values['filename'] = self.manifest.get(values['filename'], values['filename'])
+
+    def view(self, filename):
+        self._ensure_built()
+        if filename not in self._served:
+            abort(404)
+        encodings = self._encodings.get(filename, ())
+        path, encoding = filename, None
+        for name, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if name in encodings and name in request.accept_encodings:
+                path, encoding = filename + suffix, name
+                break
+        response = send_from_directory(self.directory, path,
+                                       mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = f'public, max-age={MAX_AGE}, immutable'
+        return response
+
+
+def asset_url(filename):
+    """Как url_for('static', filename=...), но для файлов из манифеста - адрес с хэшем содержимого."""
+    assets = current_app.extensions['assets']
+    assets._ensure_built()
+    if filename in assets.manifest:
+        return url_for('assets', filename=filename)
+    return url_for('static', filename=filename)
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Собрать статику с хэшами в именах и сжатые .gz/.br копии."""
+    total, written = current_app.extensions['assets'].build()
+    click.echo(f'Файлов статики: {total}, записано: {written}'
+               + ('' if brotli is not None else ' (brotli не установлен - только .gz)'))
+
+
+assets = Assets()
@@ -0,0 +1,147 @@
+# cache_versions.py
+# Шина инвалидации кэшей для нескольких воркеров gunicorn (без Redis).
+#
+# Каждый процесс держит свои кэши в памяти и помечает их версией пространства
+# имен из таблицы cache_versions ('refdata', 'schedule', 'results', ...).
+# Любая запись через сессию SQLAlchemy (ORM-объекты и массовые insert/update/
+# delete по моделям) увеличивает версии затронутых пространств в той же
+# транзакции - вручную ничего вызывать не нужно. Читатель сравнивает версию
+# своего кэша с текущей; все версии читаются одним запросом не чаще раза
+# за запрос (или за контекст приложения в фоновых задачах).
+
+import threading
+
+from flask import g, has_app_context
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+
+from extensions import db
+import metrics
+from models import CacheVersion
+
+# Какие пространства имен кэшей устаревают при изменении таблицы
+TABLE_NAMESPACES = {
+    'criteria': ('refdata', 'results'),
+    'nomination_templates': ('refdata', 'schedule', 'results'),
+    'nomination_template_criteria': ('refdata', 'results'),
+    'festivals': ('schedule',),
+    'event_days': ('schedule',),
+    'time_slots': ('schedule', 'results'),
+    'judge_nominations': ('schedule', 'results'),
+    'participations': ('schedule', 'results'),
+    'users': ('schedule', 'results'),
+    'score': ('results',),
+    'winners': ('results',),
+}
+
+NAMESPACES = tuple(sorted({ns for namespaces in TABLE_NAMESPACES.values() for ns in namespaces}))
+
+_PENDING_KEY = '_cache_namespaces'
+
+
+def current_versions():
+    """Все версии одним запросом; в рамках запроса результат берется из g."""
+    versions = g.get('_cache_versions')
+    if versions is None:
+        versions = g._cache_versions = dict(
+            db.session.query(CacheVersion.namespace, CacheVersion.version).all())
+    return versions
+
+
+def current_version(namespace):
+    return current_versions().get(namespace, 0)
+
+
+def bump(*namespaces):
+    """Явно помечает пространства имен измененными (в текущей транзакции сессии)."""
+    db.session.info.setdefault(_PENDING_KEY, set()).update(namespaces)
+
+
+def _apply(session, namespaces):
+    connection = session.connection()
+    result = connection.execute(
+        update(CacheVersion).where(CacheVersion.namespace.in_(namespaces))
+        .values(version=CacheVersion.version + 1)
+    )
+    if result.rowcount < len(namespaces):
+        # Строки версий создает миграция; сюда попадаем только на БД из db.create_all()
+        existing = {row.namespace for row in connection.execute(
+            db.select(CacheVersion.namespace).where(CacheVersion.namespace.in_(namespaces)))}
+        missing = [{'namespace': ns, 'version': 1} for ns in namespaces if ns not in existing]
+        if missing:
+            connection.execute(insert(CacheVersion), missing)
+
+
+# --- Автоматический сбор измененных таблиц ---
+
+def _collect(session, table_name):
+    namespaces = TABLE_NAMESPACES.get(table_name)
+    if namespaces:
+        session.info.setdefault(_PENDING_KEY, set()).update(namespaces)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            _collect(session, table.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk(orm_execute_state):
+    # Массовые insert(Model)/update(Model)/delete(Model) идут мимо flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _collect(orm_execute_state.session, mapper.local_table.name)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_on_commit(session):
+    if session.info.get(_PENDING_KEY) or session.new or session.dirty or session.deleted:
+        session.flush()
+    namespaces = session.info.pop(_PENDING_KEY, None)
+    if namespaces:
+        _apply(session, sorted(namespaces))
+        if has_app_context():
+            g.pop('_cache_versions', None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+class VersionedCache:
+    """
+    Процессный кэш «ключ -> значение», который целиком сбрасывается, когда
+    меняется версия его пространства имен (т.е. после записи в любом воркере).
+    """
+
+    def __init__(self, namespace, maxsize=1024):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self._version = None
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        version = current_version(self.namespace)
+        with self._lock:
+            if version != self._version:
+                self._data.clear()
+                self._version = version
+            if key in self._data:
+                metrics.CACHE_HITS.inc((self.namespace,))
+                return self._data[key]
+
+        metrics.CACHE_MISSES.inc((self.namespace,))
+        value = loader()
+        with self._lock:
+            # Если пока мы загружали, кэш успел перейти на новую версию, не пишем старое значение
+            if self._version == version:
+                if len(self._data) >= self.maxsize:
+                    self._data.pop(next(iter(self._data)))
+                self._data[key] = value
+        return value
@@ -0,0 +1,134 @@
+# calendar_feed.py
+# Личные календари (iCalendar / ICS) участников и судей.
+#
+# Адрес ленты содержит случайный токен пользователя (User.calendar_token),
+# вход не нужен - так ее может опрашивать календарь телефона. В ленте тот же
+# набор слотов, что на dashboard(): свои конкурсы и награждения того же дня и
+# категории (logic.personal_schedule_slot_ids).
+#
+# Готовая лента хранится в процессном кэше пространства 'schedule': он
+# сбрасывается при любом изменении расписания, заявок и назначений судей.
+# ETag считается по содержимому событий, поэтому одинаков во всех воркерах,
+# и клиенты, опрашивающие ленту раз в 15 минут, почти всегда получают 304.
+
+import hashlib
+import secrets
+from datetime import datetime, timezone
+
+from models import TimeSlot
+from logic import personal_schedule_slot_ids
+from refdata import CATEGORY_MAP
+import cache_versions
+import loaders
+
+PRODID = '-//TattooFest//Schedule//RU'
+# Подсказка клиентам, как часто обновлять ленту
+REFRESH_INTERVAL = 'PT15M'
+
+_cache = cache_versions.VersionedCache('schedule', maxsize=2048)
+
+
+def ensure_token(user):
+    """Токен ленты пользователя; создается при первом обращении (коммит делает вызывающий)."""
+    if not user.calendar_token:
+        user.calendar_token = secrets.token_urlsafe(24)
+    return user.calendar_token
+
+
+def reset_token(user):
+    """Новый токен: старая ссылка перестает работать (коммит делает вызывающий)."""
+    user.calendar_token = secrets.token_urlsafe(24)
+    return user.calendar_token
+
+
+def _escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Переносит строки длиннее 75 байт (RFC 5545, 3.1), не разрывая символы UTF-8."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts, current, size = [], '', 0
+    for char in line:
+        char_size = len(char.encode())
+        if size + char_size > (75 if not parts else 74):
+            parts.append(current)
+            current, size = '', 0
+        current += char
+        size += char_size
+    parts.append(current)
+    return '\r\n '.join(parts)
+
+
+def _local(value):
+    # Время слотов хранится локальным (без часового пояса) - в ленте оно «плавающее»
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def _summary(slot, role):
+    category = CATEGORY_MAP.get(slot.category, slot.category) if slot.category else None
+    if slot.type == 'judging':
+        title = slot.nomination_template.name if slot.nomination_template else 'Конкурс'
+        prefix = 'Судейство' if role == 'judge' else 'Конкурс'
+        return f'{prefix}: {title}' + (f' ({category})' if category else '')
+    if slot.type == 'award':
+        return slot.award_title or ('Награждение' + (f': {category}' if category else ''))
+    return slot.event_title or 'Событие'
+
+
+def _events(user):
+    _, slot_ids = personal_schedule_slot_ids(user)
+    if not slot_ids:
+        return []
+    slots = TimeSlot.query.filter(TimeSlot.id.in_(slot_ids)).options(
+        *loaders.SLOT_SUMMARY
+    ).order_by(TimeSlot.start_time, TimeSlot.id).all()
+    return [(slot.id, _local(slot.start_time), _local(slot.end_time), _summary(slot, user.role),
+             f'Зона {slot.zone}' if slot.zone else None)
+            for slot in slots]
+
+
+def _render(user, events, stamp):
+    name = user.nickname or user.code
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape("TattooFest: " + name)}',
+        f'REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}',
+        f'X-PUBLISHED-TTL:{REFRESH_INTERVAL}',
+    ]
+    for slot_id, start, end, summary, location in events:
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:slot-{slot_id}-user-{user.id}@tattoofest',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART:{start}',
+            f'DTEND:{end}',
+            f'SUMMARY:{_escape(summary)}',
+        ]
+        if location:
+            lines.append(f'LOCATION:{_escape(location)}')
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return ('\r\n'.join(_fold(line) for line in lines) + '\r\n').encode()
+
+
+def feed(user):
+    """
+    Лента пользователя: (тело ICS, ETag, время генерации).
+    Берется из кэша, пока не изменилось расписание.
+    """
+    def build():
+        events = _events(user)
+        # ETag - по событиям, без DTSTAMP: одинаковая лента в разных воркерах дает один ETag
+        etag = hashlib.sha1(repr((user.id, user.nickname, user.code, events)).encode()).hexdigest()[:20]
+        generated = datetime.now(timezone.utc).replace(microsecond=0)
+        return _render(user, events, generated.strftime('%Y%m%dT%H%M%SZ')), etag, generated
+
+    return _cache.get(user.id, build)
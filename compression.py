@@ -0,0 +1,107 @@
+# compression.py
+# Сжатие ответов (gzip / brotli) по Accept-Encoding.
+#
+# Подключается одним after_request: сжимаются текстовые ответы со статусом 200
+# не меньше COMPRESS_MIN_SIZE байт. Потоковые ответы (stream_page) сжимаются
+# по частям: после каждой части компрессор сбрасывается (sync flush), и браузер
+# может рисовать начало страницы, пока сервер рендерит остальное - такие ответы
+# порог размера не проверяют, длина заранее неизвестна.
+#
+# Не трогаем: файлы (send_file / статика /assets/ - у них свои .gz/.br), ответы
+# с уже заданным Content-Encoding и с Cache-Control: no-transform. Сильный ETag
+# сжатого ответа становится слабым: байты другие, смысл тот же.
+
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # без brotli сжимаем только gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = frozenset((
+    'text/html', 'text/css', 'text/plain', 'text/calendar', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+))
+
+
+def _encoding():
+    for name in (('br',) if brotli is not None else ()) + ('gzip',):
+        if name in request.accept_encodings:
+            return name
+    return None
+
+
+class Compression:
+    def __init__(self, app=None):
+        self.min_size = 500
+        self.level = 6
+        self.brotli_quality = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['compression'] = self
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', self.min_size)
+        self.level = app.config.get('COMPRESS_LEVEL', self.level)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', self.brotli_quality)
+        app.after_request(self._after_request)
+
+    def _after_request(self, response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES or response.direct_passthrough:
+            return response
+        # Ответ зависит от Accept-Encoding, даже если этот конкретный не сжат
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200 or 'Content-Encoding' in response.headers
+                or response.cache_control.no_transform):
+            return response
+        encoding = _encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self._compress(data, encoding))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.level)
+
+    def _stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            # wbits=31 - формат gzip (заголовок и контрольная сумма), а не голый deflate
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            compress, finish = compressor.compress, compressor.flush
+            flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                data = compress(chunk) + flush()
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            # Клиент мог оборвать соединение - закрываем исходный поток (и его контекст запроса)
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+
+compression = Compression()
@@ -8,4 +8,67 @@ class Config:
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(BASE_DIR, "instance", "festival.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SECRET_KEY = 'your-secret-key-change-me'  # Замени на случайный ключ в продакшене
\ No newline at end of file
+    SECRET_KEY = 'your-secret-key-change-me'  # Замени на случайный ключ в продакшене
+
+    # Фоновые задачи (jobs.py)
+    JOBS_ENABLED = True
+    JOBS_MAX_WORKERS = 2        # потоков-исполнителей на процесс
+    JOBS_POLL_INTERVAL = 5      # секунд между проверками очереди
+    JOBS_LEASE = 60             # секунд без heartbeat, после которых задача считается осиротевшей
+    JOBS_ORPHAN_CHECK_EVERY = 6  # поиск осиротевших задач - раз в столько проверок очереди
+
+    # Статусы слотов по времени (sweeper.py); при SWEEPER_ENABLED = False - `flask sweep-slots` из cron
+    SWEEPER_ENABLED = True
+    SWEEPER_INTERVAL = 30       # секунд между проходами
+
+    # Профилирование запросов (profiling.py); включается на странице /admin/profiling
+    PROFILES_DIR = os.path.join(BASE_DIR, 'instance', 'profiles')
+    PROFILING_SAMPLE_INTERVAL = 0.005   # секунд между снимками стека
+    PROFILING_MAX_FILES = 300           # старые профили удаляются
+
+    # Журнал медленных SQL-запросов (slow_queries.py); None - выключен
+    SLOW_QUERY_THRESHOLD_MS = 200
+    SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'instance', 'slow_queries.log')
+    SLOW_QUERY_LOG_MAX_BYTES = 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS = 3
+    SLOW_QUERY_EXPLAIN_ANALYZE = False  # PostgreSQL: EXPLAIN ANALYZE повторно выполняет запрос
+
+    # Прогрев воркера при старте (warmup.py): шаблоны компилируются заранее, байткод-кэш Jinja на диске
+    WARMUP_ON_START = True
+    JINJA_BYTECODE_CACHE_DIR = os.path.join(BASE_DIR, 'instance', 'jinja_cache')  # None - без байткод-кэша
+
+    # Метрики Prometheus на /metrics (metrics.py): доступны с localhost, администратору или по токену
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')   # Authorization: Bearer <токен>
+    METRICS_DIR = os.path.join(BASE_DIR, 'instance', 'metrics')  # снимки воркеров для суммирования
+    METRICS_DUMP_INTERVAL = 5       # секунд между снимками воркера
+    METRICS_STALE_AFTER = 300       # снимки старше считаются оставшимися от завершенных воркеров
+
+    # Публичное табло зон /board/<зона> (leaderboard.py): короткий кэш, телефоны опрашивают его часто
+    LEADERBOARD_MAX_AGE = 3         # Cache-Control: max-age ответа с данными, секунд
+    LEADERBOARD_CACHE_SECONDS = 2   # сколько воркер отдает ответ из памяти, не спрашивая БД
+    # Табло «сейчас / далее» (timeline.py): метки изменения расписания по датам, общие для воркеров
+    TIMELINE_DIR = os.path.join(BASE_DIR, 'instance', 'timeline')
+    # Статика с хэшами в именах и сжатыми .gz/.br копиями (assets.py), отдается по /assets/ с кэшем на год
+    ASSETS_DIR = os.path.join(BASE_DIR, 'instance', 'assets')
+    # Сжатие ответов (compression.py) и потоковый рендер больших страниц админки (streaming.py)
+    COMPRESS_MIN_SIZE = 500          # ответы меньше этого (байт) не сжимаем
+    COMPRESS_LEVEL = 6               # gzip
+    COMPRESS_BROTLI_QUALITY = 5      # brotli на лету (статика /assets/ сжата заранее с максимальным качеством)
+    STREAM_CHUNK_SIZE = 8192         # сколько HTML копить перед отправкой очередной части
+    # Холодный архив завершенных фестивалей (archive.py): сжатые файлы с графом данных и итогами
+    ARCHIVE_DIR = os.path.join(BASE_DIR, 'instance', 'archive')
+
+    # Telegram WebApp: токен бота для проверки подписи initData и срок ее годности
+    TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
+    TELEGRAM_INIT_DATA_MAX_AGE = 24 * 3600  # секунд
+
+    # Уведомления в Telegram (notifications.py); отправитель работает, только если задан токен бота
+    NOTIFIER_ENABLED = True
+    TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')  # можно указать локальную заглушку
+    NOTIFIER_BATCH_SIZE = 50        # сообщений за одну выборку из outbox
+    NOTIFIER_GLOBAL_RATE = 25       # сообщений в секунду (лимит Bot API ~30)
+    NOTIFIER_CHAT_INTERVAL = 1.0    # секунд между сообщениями в один чат
+    NOTIFIER_CONCURRENCY = 8        # одновременных запросов к Bot API
+    NOTIFIER_MAX_ATTEMPTS = 5
+    NOTIFIER_RETRY_DELAY = 10       # секунд, удваивается с каждой попыткой
+    NOTIFIER_POLL_INTERVAL = 5      # секунд между проверками outbox
\ No newline at end of file
@@ -0,0 +1,146 @@
+# deletion.py
+# Массовое удаление фестивалей, дней, слотов и пользователей.
+#
+# Вместо загрузки всего графа объектов в ORM удаляем строки пачками снизу вверх
+# (оценки -> победители -> заявки -> судьи -> слоты -> дни -> фестиваль).
+# Каждая пачка - отдельная короткая транзакция, поэтому запись в SQLite не
+# блокируется на минуты. Если удаление прервется, оставшееся дочистит каскад
+# ondelete='CASCADE' (внешние ключи включены в extensions.py) или повторный запуск.
+
+from sqlalchemy import delete, select, or_
+
+from extensions import db
+from jobs import job_handler
+from models import Festival, EventDay, TimeSlot, JudgeNomination, Participation, Score, Winner, User, Notification, ScoreCube, ScoreEvent
+import leaderboard
+import score_cube
+import score_events
+from timeline import timeline
+
+CHUNK_SIZE = 500
+
+
+def _delete_in_chunks(model, condition, chunk_size, on_chunk):
+    """Удаляет строки model по условию пачками по chunk_size, коммитя каждую пачку."""
+    deleted = 0
+    while True:
+        ids = select(model.id).where(condition).limit(chunk_size)
+        if model is Score:
+            # Удаление оценок - тоже событие журнала (score_events.py), в той же транзакции
+            ids = list(db.session.scalars(ids))
+            score_events.log_deleted(Score.id.in_(ids))
+        result = db.session.execute(delete(model).where(model.id.in_(ids)),
+                                    execution_options={'synchronize_session': False})
+        db.session.commit()
+        if not result.rowcount:
+            return deleted
+        deleted += result.rowcount
+        on_chunk(result.rowcount)
+
+
+def _run(stages, chunk_size, progress):
+    """
+    Выполняет этапы удаления по порядку.
+    progress(stage, done, total_done) вызывается после каждой пачки.
+    Возвращает {имя таблицы: удалено строк}.
+    """
+    totals = {}
+    total_done = 0
+    for model, condition in stages:
+        stage = model.__tablename__
+
+        def on_chunk(count, stage=stage):
+            nonlocal total_done
+            total_done += count
+            totals[stage] = totals.get(stage, 0) + count
+            if progress:
+                progress(stage, totals[stage], total_done)
+
+        _delete_in_chunks(model, condition, chunk_size, on_chunk)
+    return totals
+
+
+def _slot_stages(slot_ids):
+    """Этапы удаления всего, что висит на слотах из подзапроса slot_ids, и самих слотов."""
+    participation_ids = select(Participation.id).where(Participation.time_slot_id.in_(slot_ids))
+    return [
+        (ScoreCube, ScoreCube.time_slot_id.in_(slot_ids)),
+        (Score, Score.participation_id.in_(participation_ids)),
+        (Winner, Winner.time_slot_id.in_(slot_ids)),
+        (Participation, Participation.time_slot_id.in_(slot_ids)),
+        (JudgeNomination, JudgeNomination.time_slot_id.in_(slot_ids)),
+        (Notification, Notification.time_slot_id.in_(slot_ids)),
+        (TimeSlot, TimeSlot.id.in_(slot_ids)),
+    ]
+
+
+def purge_festival(festival_id, chunk_size=CHUNK_SIZE, progress=None):
+    dates = timeline.festival_dates(festival_id)
+    day_ids = select(EventDay.id).where(EventDay.festival_id == festival_id)
+    slot_ids = select(TimeSlot.id).where(TimeSlot.day_id.in_(day_ids))
+    totals = _run(_slot_stages(slot_ids) + [
+        (EventDay, EventDay.festival_id == festival_id),
+        (Festival, Festival.id == festival_id),
+    ], chunk_size, progress)
+    # Табло зон этих дат перестроится уже без фестиваля (и после архивации тоже)
+    timeline.invalidate_dates(dates)
+    return totals
+
+
+def purge_day(day_id, chunk_size=CHUNK_SIZE, progress=None):
+    dates = set(db.session.scalars(select(EventDay.date).where(EventDay.id == day_id)))
+    slot_ids = select(TimeSlot.id).where(TimeSlot.day_id == day_id)
+    totals = _run(_slot_stages(slot_ids) + [
+        (EventDay, EventDay.id == day_id),
+    ], chunk_size, progress)
+    timeline.invalidate_dates(dates)
+    return totals
+
+
+def purge_slot(slot_id, chunk_size=CHUNK_SIZE, progress=None):
+    slot_ids = select(TimeSlot.id).where(TimeSlot.id == slot_id)
+    return _run(_slot_stages(slot_ids), chunk_size, progress)
+
+
+def purge_score_events(slot_ids, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Удаляет события журнала оценок конкурсов (список id) - только при архивации
+    (archive.py): события уходят в архив вместе с конкурсами.
+    """
+    return _run([(ScoreEvent, ScoreEvent.time_slot_id.in_(list(slot_ids)))], chunk_size, progress)
+
+
+def purge_user(user_id, chunk_size=CHUNK_SIZE, progress=None):
+    participation_ids = select(Participation.id).where(Participation.user_id == user_id)
+    # Конкурсы, где пользователь участвовал: их куб оценок пересчитаем после удаления
+    slot_ids = list(db.session.scalars(
+        select(Participation.time_slot_id).where(Participation.user_id == user_id).distinct()))
+    # Конкурсы, где он судил: без его оценок меняются места на публичном табло
+    judged_ids = list(db.session.scalars(
+        select(JudgeNomination.time_slot_id).where(JudgeNomination.judge_id == user_id).distinct()))
+    dates = timeline.user_dates(user_id)
+    totals = _run([
+        (ScoreCube, ScoreCube.judge_id == user_id),
+        (Score, or_(Score.judge_id == user_id, Score.participation_id.in_(participation_ids))),
+        (Winner, Winner.participation_id.in_(participation_ids)),
+        (Participation, Participation.user_id == user_id),
+        (JudgeNomination, JudgeNomination.judge_id == user_id),
+        (Notification, Notification.user_id == user_id),
+        (User, User.id == user_id),
+    ], chunk_size, progress)
+    if slot_ids:
+        score_cube.rebuild_contests(slot_ids)
+    if slot_ids or judged_ids:
+        leaderboard.mark_contests(slot_ids + judged_ids)
+        db.session.commit()
+    timeline.invalidate_dates(dates)
+    return totals
+
+
+# --- Фоновые задачи (jobs.py) ---
+
+@job_handler('purge_festival', concurrency=1)
+def purge_festival_job(payload, progress):
+    totals = purge_festival(payload['festival_id'],
+                            progress=lambda stage, done, total: progress(f'{stage}: {done} (всего {total})'))
+    return {'festival_name': payload.get('festival_name'), 'deleted': totals}
@@ -1,8 +1,22 @@
 # extensions.py
 # Файл для хранения экземпляров расширений Flask
 
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
-migrate = Migrate()
\ No newline at end of file
+migrate = Migrate()
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite по умолчанию игнорирует внешние ключи, а значит и ondelete='CASCADE'.
+    # Включаем их на каждом соединении, чтобы каскадное удаление делала сама БД.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
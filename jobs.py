@@ -0,0 +1,291 @@
+# jobs.py
+# Локальный исполнитель фоновых задач без внешних сервисов.
+#
+# Очередь хранится в таблице jobs (models/job.py), поэтому задачи переживают
+# перезапуск и видны всем воркерам gunicorn. В каждом процессе работает
+# диспетчер, который забирает задачи из очереди атомарным UPDATE и отдает их
+# в пул потоков. Лимит параллельности задается для каждого типа задач и
+# соблюдается по всей БД, а не только внутри процесса.
+#
+# Пока задача выполняется, диспетчер ее процесса продлевает Job.heartbeat_at.
+# Задачу без продления дольше JOBS_LEASE (процесс убит, хост пропал) любой
+# диспетчер периодически возвращает в очередь.
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, select, update
+
+from extensions import db
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+# Зарегистрированные обработчики: {тип задачи: JobSpec}
+_handlers = {}
+
+
+class JobSpec:
+    def __init__(self, func, concurrency, max_attempts, retry_delay):
+        self.func = func
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay  # секунды, удваивается с каждой попыткой
+
+
+def job_handler(job_type, concurrency=1, max_attempts=3, retry_delay=5):
+    """
+    Регистрирует функцию как обработчик задач типа job_type.
+    Обработчик вызывается как func(payload, progress) внутри контекста приложения;
+    progress(text) сохраняет текущий прогресс задачи. Возвращаемое значение
+    (JSON-сериализуемое) сохраняется в Job.result.
+    """
+    def decorator(func):
+        _handlers[job_type] = JobSpec(func, concurrency, max_attempts, retry_delay)
+        return func
+    return decorator
+
+
+class JobRunner:
+    def __init__(self, app=None):
+        self.app = None
+        self.worker_name = f'{socket.gethostname()}:{os.getpid()}'
+        self._executor = None
+        self._max_workers = 2
+        self._busy = 0
+        self._running = set()  # id задач, выполняемых этим процессом
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._started = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self._max_workers = app.config.get('JOBS_MAX_WORKERS', 2)
+        app.extensions['jobs'] = self
+        if app.config.get('JOBS_ENABLED', True):
+            # Стартуем лениво, на первом запросе: так CLI-команды (flask db upgrade,
+            # seed_data.py) не поднимают лишних потоков
+            app.before_request(self._ensure_started)
+
+    # --- Публичный API ---
+
+    def submit(self, job_type, payload=None):
+        """Ставит задачу в очередь и сразу возвращает Job (со статусом 'queued')."""
+        spec = _handlers[job_type]
+        job = Job(type=job_type, payload=json.dumps(payload), max_attempts=spec.max_attempts)
+        db.session.add(job)
+        db.session.commit()
+        self._ensure_started()
+        self._wakeup.set()
+        return job
+
+    def retry(self, job):
+        """Повторно ставит в очередь упавшую задачу."""
+        job.status = 'queued'
+        job.attempts = 0
+        job.run_after = None
+        job.error = None
+        db.session.commit()
+        self._wakeup.set()
+
+    # --- Внутреннее устройство ---
+
+    def _ensure_started(self):
+        if self._started or not self.app.config.get('JOBS_ENABLED', True):
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='job')
+            threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True).start()
+
+    def _dispatch_loop(self):
+        poll_interval = self.app.config.get('JOBS_POLL_INTERVAL', 5)
+        orphan_check_every = self.app.config.get('JOBS_ORPHAN_CHECK_EVERY', 6)
+        polls = 0
+        while True:
+            try:
+                with self.app.app_context():
+                    self._heartbeat()
+                    if polls % orphan_check_every == 0:
+                        self._requeue_orphans()
+                    self._dispatch()
+            except Exception:
+                logger.exception('Ошибка диспетчера фоновых задач')
+            polls += 1
+            self._wakeup.wait(poll_interval)
+            self._wakeup.clear()
+
+    def _heartbeat(self):
+        """Продлевает аренду задач, которые выполняет этот процесс."""
+        with self._lock:
+            job_ids = list(self._running)
+        if not job_ids:
+            return
+        db.session.execute(update(Job).where(Job.id.in_(job_ids), Job.status == 'running',
+                                             Job.worker == self.worker_name)
+                           .values(heartbeat_at=datetime.utcnow()),
+                           execution_options={'synchronize_session': False})
+        db.session.commit()
+
+    def _requeue_orphans(self):
+        """
+        Возвращает в очередь осиротевшие задачи: с любого хоста - если аренда
+        (heartbeat_at) не продлевалась дольше JOBS_LEASE, с этого хоста - сразу,
+        как только процесса-исполнителя больше нет.
+        """
+        host = socket.gethostname()
+        expired = datetime.utcnow() - timedelta(seconds=self.app.config.get('JOBS_LEASE', 60))
+        try:
+            orphan_ids = [job_id for job_id, in db.session.query(Job.id).filter(
+                Job.status == 'running',
+                func.coalesce(Job.heartbeat_at, Job.started_at) < expired
+            )]
+            for job_id, worker in db.session.query(Job.id, Job.worker).filter(
+                    Job.status == 'running', Job.worker.like(f'{host}:%')):
+                pid = int(worker.rsplit(':', 1)[1])
+                if pid != os.getpid() and not _pid_alive(pid):
+                    orphan_ids.append(job_id)
+            with self._lock:
+                orphan_ids = [job_id for job_id in orphan_ids if job_id not in self._running]
+            if orphan_ids:
+                # Условие на статус: задачу мог уже подобрать диспетчер другого процесса
+                result = db.session.execute(
+                    update(Job)
+                    .where(Job.id.in_(orphan_ids), Job.status == 'running')
+                    .values(status='queued', worker=None, heartbeat_at=None),
+                    execution_options={'synchronize_session': False}
+                )
+                if result.rowcount:
+                    logger.warning('Возвращено в очередь осиротевших задач: %s', result.rowcount)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception('Не удалось вернуть в очередь осиротевшие задачи')
+
+    def _dispatch(self):
+        with self._lock:
+            free = self._max_workers - self._busy
+        if free <= 0:
+            return
+        now = datetime.utcnow()
+        candidates = db.session.query(Job.id, Job.type).filter(
+            Job.status == 'queued',
+            Job.type.in_(list(_handlers)),
+            or_(Job.run_after.is_(None), Job.run_after <= now)
+        ).order_by(Job.id).limit(free * 4).all()
+        db.session.rollback()  # не держим транзакцию чтения
+
+        for job_id, job_type in candidates:
+            if free <= 0:
+                break
+            if self._claim(job_id, job_type, _handlers[job_type].concurrency):
+                free -= 1
+                with self._lock:
+                    self._busy += 1
+                    self._running.add(job_id)
+                self._executor.submit(self._execute, job_id)
+
+    def _claim(self, job_id, job_type, concurrency):
+        """Атомарно переводит задачу в 'running', если не превышен лимит для ее типа."""
+        running = select(func.count(Job.id)).where(Job.type == job_type, Job.status == 'running').scalar_subquery()
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == 'queued', running < concurrency)
+            .values(status='running', worker=self.worker_name, started_at=datetime.utcnow(),
+                    heartbeat_at=datetime.utcnow(), attempts=Job.attempts + 1),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _execute(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(Job, job_id)
+            spec = _handlers[job.type]
+            payload = json.loads(job.payload) if job.payload else None
+            started = time.perf_counter()
+            wait_ms = int((job.started_at - job.created_at).total_seconds() * 1000)
+            db.session.rollback()
+            try:
+                result = spec.func(payload, lambda text: _save_progress(job_id, text))
+                db.session.commit()
+                _finish(job_id, status='done', result=json.dumps(result, default=str),
+                        wait_ms=wait_ms, duration_ms=_elapsed_ms(started))
+            except Exception as e:
+                db.session.rollback()
+                logger.exception('Фоновая задача %s (%s) завершилась с ошибкой', job_id, job.type)
+                job = db.session.get(Job, job_id)
+                if job.attempts < job.max_attempts:
+                    delay = spec.retry_delay * 2 ** (job.attempts - 1)
+                    _finish(job_id, status='queued', error=str(e), worker=None,
+                            run_after=datetime.utcnow() + timedelta(seconds=delay),
+                            wait_ms=wait_ms, duration_ms=_elapsed_ms(started), finished_at=None)
+                else:
+                    _finish(job_id, status='failed', error=str(e),
+                            wait_ms=wait_ms, duration_ms=_elapsed_ms(started))
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._busy -= 1
+                    self._running.discard(job_id)
+                self._wakeup.set()
+
+
+def _elapsed_ms(started):
+    return int((time.perf_counter() - started) * 1000)
+
+
+def _finish(job_id, **values):
+    values.setdefault('finished_at', datetime.utcnow())
+    db.session.execute(update(Job).where(Job.id == job_id).values(**values),
+                       execution_options={'synchronize_session': False})
+    db.session.commit()
+
+
+def _save_progress(job_id, text):
+    # Отдельное соединение: прогресс не должен коммитить незавершенную работу обработчика
+    with db.engine.begin() as connection:
+        connection.execute(update(Job).where(Job.id == job_id).values(progress=str(text)[:200]))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def job_stats():
+    """Метрики по типам задач: количество по статусам и время ожидания/выполнения."""
+    rows = db.session.query(
+        Job.type, Job.status, func.count(Job.id),
+        func.avg(Job.wait_ms), func.avg(Job.duration_ms), func.max(Job.duration_ms)
+    ).group_by(Job.type, Job.status).all()
+
+    stats = {}
+    for job_type, status, count, avg_wait, avg_duration, max_duration in rows:
+        entry = stats.setdefault(job_type, {'counts': {}, 'avg_wait_ms': None,
+                                            'avg_duration_ms': None, 'max_duration_ms': None,
+                                            'concurrency': _handlers[job_type].concurrency if job_type in _handlers else None})
+        entry['counts'][status] = count
+        if status == 'done':
+            entry['avg_wait_ms'] = round(avg_wait) if avg_wait is not None else None
+            entry['avg_duration_ms'] = round(avg_duration) if avg_duration is not None else None
+            entry['max_duration_ms'] = max_duration
+    return stats
+
+
+job_runner = JobRunner()
@@ -0,0 +1,303 @@
+# leaderboard.py
+# Публичное табло (большой экран в зоне и телефоны зрителей) из готовых снимков.
+#
+# На каждый конкурс хранится компактный снимок (таблица leaderboard_snapshots):
+# места по категориям, победители и сведения о конкурсе. Снимок пересобирается
+# при записи, в той же транзакции: хук after_flush собирает затронутые конкурсы
+# (заявки, судьи, победители, слоты, изменения участников; оценки - из событий
+# журнала, score_events.py), а
+# before_commit пересчитывает только их - по одному конкурсу, а не всю
+# страницу результатов. Массовые записи мимо flush (sweeper, итоги дня,
+# планирование расписания, удаление пользователя) помечают конкурсы явно:
+# mark_contests() / mark_days(). Полный пересчет - `flask rebuild-leaderboard`.
+#
+# Публичные запросы читают только снимки: сначала крошечная выборка
+# (id, версия) для ETag, сами снимки - только если ETag изменился.
+
+import json
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import (LeaderboardSnapshot, TimeSlot, Participation, JudgeNomination, Winner, User,
+                    NominationTemplate)
+from refdata import CATEGORY_MAP
+import score_events
+import winners
+
+# Сколько мест каждой категории показывать на табло
+TOP = 10
+# Сколько последних награжденных конкурсов зоны показывать с победителями
+RECENT_WINNERS = 3
+REBUILD_CHUNK = 200
+
+_PENDING_KEY = '_leaderboard_pending'
+
+
+# --- Сбор затронутых конкурсов ---
+
+def _pending(session):
+    return session.info.setdefault(_PENDING_KEY, {'slots': set(), 'days': set(), 'users': set()})
+
+
+def mark_contests(slot_ids, session=None):
+    """Пересобрать табло конкурсов при коммите (для массовых записей мимо flush)."""
+    if slot_ids:
+        _pending(session or db.session)['slots'].update(slot_ids)
+
+
+def mark_days(day_ids, session=None):
+    """Пересобрать табло всех конкурсов дней при коммите (изменилось расписание)."""
+    if day_ids:
+        _pending(session or db.session)['days'].update(day_ids)
+
+
+def _values(obj, key):
+    """Текущее и (для измененных объектов) прежнее значение атрибута."""
+    history = inspect(obj).attrs[key].history
+    return {value for value in (getattr(obj, key), *history.deleted) if value is not None}
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect(session, flush_context):
+    pending = None
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, (Participation, JudgeNomination, Winner)):
+            target, values = 'slots', _values(obj, 'time_slot_id')
+        elif isinstance(obj, TimeSlot):
+            # Награждение определяет, когда показывать победителей конкурсов своего дня
+            if 'award' in _values(obj, 'type'):
+                target, values = 'days', _values(obj, 'day_id')
+            else:
+                target, values = 'slots', {obj.id}
+        elif isinstance(obj, User) and obj not in session.new:
+            target, values = 'users', {obj.id}
+        else:
+            continue
+        if pending is None:
+            pending = _pending(session)
+        pending[target].update(values)
+
+
+@score_events.subscribe
+def _collect_scores(session, events):
+    # В событиях уже есть конкурс - искать его по заявке не нужно
+    mark_contests({e['time_slot_id'] for e in events if e['time_slot_id'] is not None}, session)
+
+
+@event.listens_for(Session, 'before_commit')
+def _rebuild_on_commit(session):
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    connection = session.connection()
+    slot_ids = set(pending['slots'])
+    if pending['users']:
+        slot_ids.update(connection.scalars(select(Participation.time_slot_id).where(
+            Participation.user_id.in_(pending['users']))))
+    if pending['days']:
+        slot_ids.update(connection.scalars(select(TimeSlot.id).where(
+            TimeSlot.day_id.in_(pending['days']), TimeSlot.type == 'judging')))
+    if slot_ids:
+        rebuild(connection, slot_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# --- Сборка снимков ---
+
+def _time(value):
+    return value.strftime('%H:%M')
+
+
+def _standings(entries):
+    """entries: [(заявка, балл или None)]. Места с общим местом при равенстве баллов."""
+    entries = sorted(entries, key=lambda e: (e[1] is None, -(e[1] or 0), e[0]['entry'] or 0))
+    rows, place, previous = [], 0, object()
+    for index, (entry, score) in enumerate(entries, start=1):
+        if score is None:
+            place = None
+        elif score != previous:
+            place, previous = index, score
+        rows.append(dict(entry, place=place, score=score))
+    return rows[:TOP]
+
+
+def rebuild(connection, slot_ids):
+    """Пересобирает снимки конкурсов (в текущей транзакции). Возвращает число измененных."""
+    slot_ids = list(slot_ids)
+    contests = connection.execute(
+        select(TimeSlot.id, TimeSlot.day_id, TimeSlot.zone, TimeSlot.start_time, TimeSlot.end_time,
+               TimeSlot.status, TimeSlot.category, NominationTemplate.name)
+        .outerjoin(NominationTemplate, NominationTemplate.id == TimeSlot.nomination_template_id)
+        .where(TimeSlot.id.in_(slot_ids), TimeSlot.type == 'judging')).all()
+    contest_ids = [c.id for c in contests]
+
+    # Слот удален или перестал быть конкурсом - снимок больше не нужен
+    gone = set(slot_ids) - set(contest_ids)
+    if gone:
+        connection.execute(delete(LeaderboardSnapshot).where(LeaderboardSnapshot.time_slot_id.in_(gone)))
+    if not contests:
+        return 0
+
+    # Как и sweeper: победителей показываем после первого закончившегося награждения дня и категории
+    award_end = dict(((row.day_id, row.category), row.end) for row in connection.execute(
+        select(TimeSlot.day_id, TimeSlot.category, func.min(TimeSlot.end_time).label('end'))
+        .where(TimeSlot.type == 'award', TimeSlot.day_id.in_({c.day_id for c in contests}))
+        .group_by(TimeSlot.day_id, TimeSlot.category)))
+
+    entries = {}
+    for row in connection.execute(
+            select(Participation.id, Participation.time_slot_id, Participation.entry_number,
+                   func.coalesce(User.nickname, User.code).label('name'),
+                   func.coalesce(User.experience_category, 'junior').label('experience_category'))
+            .join(User, User.id == Participation.user_id)
+            .where(Participation.time_slot_id.in_(contest_ids))):
+        entries[row.id] = (row.time_slot_id, row.experience_category,
+                           {'entry': row.entry_number, 'name': row.name})
+
+    scores = {participation_id: round(score, 2) for _, _, participation_id, score in connection.execute(
+        winners.final_scores_query(TimeSlot.id.in_(contest_ids)))}
+
+    standings = {}
+    for participation_id, (slot_id, category, entry) in entries.items():
+        standings.setdefault((slot_id, category), []).append((entry, scores.get(participation_id)))
+
+    places = {}
+    for row in connection.execute(
+            select(Winner.time_slot_id, Winner.experience_category, Winner.place, Winner.participation_id)
+            .where(Winner.time_slot_id.in_(contest_ids)).order_by(Winner.place)):
+        entry = entries.get(row.participation_id)
+        if entry:
+            places.setdefault((row.time_slot_id, row.experience_category), []).append(
+                dict(entry[2], place=row.place))
+
+    existing = dict(connection.execute(
+        select(LeaderboardSnapshot.time_slot_id, LeaderboardSnapshot.payload)
+        .where(LeaderboardSnapshot.time_slot_id.in_(contest_ids))).all())
+
+    now = datetime.now()
+    changed = 0
+    for c in contests:
+        ends = award_end.get((c.day_id, c.category))
+        payload = json.dumps({
+            'id': c.id,
+            'title': c.name or 'Конкурс',
+            'category': CATEGORY_MAP.get(c.category, c.category),
+            'zone': c.zone,
+            'date': c.start_time.strftime('%d.%m'),
+            'start': _time(c.start_time),
+            'end': _time(c.end_time),
+            'award': _time(ends) if ends else None,
+            'status': c.status or 'pending',
+            'standings': {category: _standings(standings.get((c.id, category), []))
+                          for category in winners.EXPERIENCE_CATEGORIES},
+            'winners': {category: places.get((c.id, category), [])
+                        for category in winners.EXPERIENCE_CATEGORIES},
+        }, ensure_ascii=False, separators=(',', ':'))
+        values = {
+            'zone': c.zone,
+            'start_time': c.start_time,
+            'end_time': c.end_time,
+            'award_end': ends,
+            'has_winners': any(key[0] == c.id for key in places),
+            'payload': payload,
+            'updated_at': now,
+        }
+        if c.id not in existing:
+            connection.execute(insert(LeaderboardSnapshot).values(time_slot_id=c.id, version=1, **values))
+        elif existing[c.id] != payload:
+            connection.execute(update(LeaderboardSnapshot).where(LeaderboardSnapshot.time_slot_id == c.id)
+                               .values(version=LeaderboardSnapshot.version + 1, **values))
+        else:
+            # Содержимое не изменилось - версия (и ETag у зрителей) остается прежней
+            continue
+        changed += 1
+    return changed
+
+
+def rebuild_all():
+    """Пересобирает снимки всех конкурсов пачками. Возвращает число конкурсов."""
+    connection = db.session.connection()
+    slot_ids = list(connection.scalars(select(TimeSlot.id).where(TimeSlot.type == 'judging')))
+    connection.execute(delete(LeaderboardSnapshot).where(LeaderboardSnapshot.time_slot_id.notin_(
+        select(TimeSlot.id).where(TimeSlot.type == 'judging'))))
+    for start in range(0, len(slot_ids), REBUILD_CHUNK):
+        rebuild(connection, slot_ids[start:start + REBUILD_CHUNK])
+    db.session.commit()
+    return len(slot_ids)
+
+
+@click.command('rebuild-leaderboard')
+@with_appcontext
+def rebuild_leaderboard_command():
+    """Пересобрать снимки публичного табло по всем конкурсам."""
+    click.echo(f'Конкурсов на табло: {rebuild_all()}')
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_leaderboard_command)
+
+
+# --- Чтение для публичного табло ---
+
+def zone_index(zone, now=None):
+    """
+    Что сейчас показывает табло зоны - без чтения самих снимков:
+    (текущий конкурс (id, версия, победители видны) или None,
+     [(id, версия) последних награжденных конкурсов]).
+    Текущий - последний начавшийся конкурс зоны, а если таких нет - ближайший.
+    """
+    now = now or datetime.now()
+    columns = (LeaderboardSnapshot.time_slot_id, LeaderboardSnapshot.version, LeaderboardSnapshot.award_end)
+    current = db.session.execute(
+        select(*columns).where(LeaderboardSnapshot.zone == zone, LeaderboardSnapshot.start_time <= now)
+        .order_by(LeaderboardSnapshot.start_time.desc()).limit(1)).first()
+    if current is None:
+        current = db.session.execute(
+            select(*columns).where(LeaderboardSnapshot.zone == zone, LeaderboardSnapshot.start_time > now)
+            .order_by(LeaderboardSnapshot.start_time).limit(1)).first()
+    awarded = db.session.execute(
+        select(LeaderboardSnapshot.time_slot_id, LeaderboardSnapshot.version)
+        .where(LeaderboardSnapshot.zone == zone, LeaderboardSnapshot.has_winners,
+               LeaderboardSnapshot.award_end <= now)
+        .order_by(LeaderboardSnapshot.award_end.desc(), LeaderboardSnapshot.start_time.desc())
+        .limit(RECENT_WINNERS)).all()
+    if current is not None:
+        visible = current.award_end is not None and current.award_end <= now
+        current = (current.time_slot_id, current.version, visible)
+    return current, [tuple(row) for row in awarded]
+
+
+def zone_board(zone, current, awarded):
+    """Собирает ответ табло по результату zone_index() - одним запросом к снимкам."""
+    ids = [slot_id for slot_id, _ in awarded]
+    if current:
+        ids.append(current[0])
+    payloads = dict(db.session.execute(
+        select(LeaderboardSnapshot.time_slot_id, LeaderboardSnapshot.payload)
+        .where(LeaderboardSnapshot.time_slot_id.in_(ids))).all()) if ids else {}
+
+    current_board = None
+    if current and current[0] in payloads:
+        current_board = json.loads(payloads[current[0]])
+        if not current[2]:
+            # Победители не объявлены, пока не закончилось награждение
+            current_board['winners'] = None
+    return {
+        'zone': zone,
+        'current': current_board,
+        'winners': [json.loads(payloads[slot_id]) for slot_id, _ in awarded
+                    if slot_id in payloads and (not current or slot_id != current[0])],
+    }
@@ -0,0 +1,91 @@
+# loaders.py
+# Именованные наборы стратегий загрузки связей для страниц и API.
+#
+# Все связи моделей объявлены с lazy='raise_on_sql': обращение к незагруженной
+# связи, которое потребовало бы отдельного запроса, падает с ошибкой, а не
+# тихо превращается в N+1 запросов при рендеринге шаблона. Поэтому каждый
+# маршрут берет здесь набор под свою страницу:
+#
+#     TimeSlot.query.options(*loaders.CONTEST_WITH_PARTICIPANTS).get_or_404(id)
+#
+# Связи «многие к одному» (шаблон, день, пользователь) грузятся joinedload -
+# JOIN не увеличивает число строк. Коллекции (заявки, судьи, оценки) грузятся
+# selectinload отдельным запросом по IN: две коллекции в одном JOIN дали бы
+# «заявки x судьи» строк. Критерии шаблонов берутся из кэша справочников
+# (refdata.py), а не из связи NominationTemplate.criteria.
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import EventDay, Festival, JudgeNomination, NominationTemplate, Participation, Score, TimeSlot
+
+# --- Слоты и конкурсы ---
+
+# Строка расписания: шаблон номинации и день
+SLOT_SUMMARY = (
+    joinedload(TimeSlot.nomination_template),
+    joinedload(TimeSlot.day),
+)
+
+# Конкурс с заявками и участниками (страница судейства, участники конкурса)
+CONTEST_WITH_PARTICIPANTS = SLOT_SUMMARY + (
+    selectinload(TimeSlot.participants).joinedload(Participation.user),
+)
+
+# Конкурс с назначенными судьями
+CONTEST_WITH_JUDGES = SLOT_SUMMARY + (
+    selectinload(TimeSlot.judge_assignments).joinedload(JudgeNomination.judge),
+)
+
+# Итоги конкурса: и участники, и судьи
+CONTEST_RESULTS = SLOT_SUMMARY + (
+    selectinload(TimeSlot.participants).joinedload(Participation.user),
+    selectinload(TimeSlot.judge_assignments).joinedload(JudgeNomination.judge),
+)
+
+# Конкурсы судьи на dashboard и в API: нужны только id заявок, без пользователей
+JUDGE_CONTESTS = SLOT_SUMMARY + (
+    selectinload(TimeSlot.participants),
+)
+
+# Расписание дня в админке: число заявок и судей в каждом слоте
+DAY_SCHEDULE = (
+    joinedload(TimeSlot.nomination_template),
+    selectinload(TimeSlot.participants),
+    selectinload(TimeSlot.judge_assignments),
+)
+
+# Слот для редактирования: нужен только день (дата для времени начала и конца)
+SLOT_WITH_DAY = (
+    joinedload(TimeSlot.day),
+)
+
+# --- Заявки ---
+
+# Заявка участника со своим конкурсом
+PARTICIPATION_WITH_CONTEST = (
+    joinedload(Participation.contest_slot).joinedload(TimeSlot.nomination_template),
+    joinedload(Participation.contest_slot).joinedload(TimeSlot.day),
+)
+
+# Карточка оценок участника: конкурс, место и все оценки с критериями и судьями
+PARTICIPATION_SCORE_CARD = PARTICIPATION_WITH_CONTEST + (
+    joinedload(Participation.winner),
+    selectinload(Participation.scores).options(
+        joinedload(Score.criterion),
+        joinedload(Score.judge),
+    ),
+)
+
+# --- Фестивали и справочники ---
+
+FESTIVAL_WITH_DAYS = (
+    selectinload(Festival.days),
+)
+
+DAY_WITH_FESTIVAL = (
+    joinedload(EventDay.festival),
+)
+
+TEMPLATE_WITH_CRITERIA = (
+    selectinload(NominationTemplate.criteria),
+)
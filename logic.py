@@ -1,6 +1,11 @@
+from datetime import datetime
 from flask import flash
+from sqlalchemy import and_, or_, func
 from extensions import db
-from models import NominationTemplate, TimeSlot, Participation, Criterion, Score
+from models import NominationTemplate, TimeSlot, Participation, Criterion, Score, JudgeNomination
+import loaders
+import notifications
+import refdata
 
 def check_and_update_nomination_status(nomination_id):
     """
@@ -48,4 +53,133 @@ def check_and_update_nomination_status(nomination_id):
             nomination.status = 'judging'
             print(f"INFO: Судейство по номинации '{nomination.name}' НАЧАЛОСЬ. Статус обновлен на 'judging'.")
 
-    db.session.commit()
\ No newline at end of file
+    db.session.commit()
+
+
+def update_contest_status(contest):
+    """
+    Переводит идущий конкурс в 'completed', когда все назначенные судьи оценили
+    всех участников по всем критериям шаблона (переходы по времени делает sweeper.py).
+    Уведомление ставится в очередь в той же транзакции, коммит делает вызывающий
+    (оценки к этому моменту должны быть сброшены flush-ем).
+    Возвращает True, если статус изменился.
+    """
+    if contest.type != 'judging' or contest.status != 'judging':
+        return False
+
+    criteria_ids = [c.id for c in refdata.get_reference_data().template_criteria(contest.nomination_template_id)]
+    criteria_count = len(criteria_ids)
+    participants_count = db.session.query(func.count(Participation.id)).filter_by(time_slot_id=contest.id).scalar()
+    judge_ids = db.session.query(JudgeNomination.judge_id).filter_by(time_slot_id=contest.id)
+    judges_count = judge_ids.count()
+    if not (criteria_count and participants_count and judges_count):
+        return False
+
+    # Считаем сами оценки, а не куб аналитики: расхождение куба не должно
+    # задерживать завершение конкурса и награждение
+    scores_count = db.session.query(func.count(Score.id)).join(
+        Participation, Participation.id == Score.participation_id
+    ).filter(Participation.time_slot_id == contest.id,
+             Score.judge_id.in_(judge_ids.scalar_subquery()),
+             Score.criterion_id.in_(criteria_ids)).scalar()
+    if scores_count >= criteria_count * participants_count * judges_count:
+        contest.status = 'completed'
+        notifications.enqueue_judging_done([contest.id])
+        return True
+    return False
+
+
+def relevant_award_slot_ids(contest_slots):
+    """
+    ID слотов-награждений, относящихся к переданным конкурсам:
+    награждение того же дня и той же категории.
+    """
+    keys = {(slot.day_id, slot.category) for slot in contest_slots}
+    if not keys:
+        return set()
+    conditions = [and_(TimeSlot.day_id == day_id, TimeSlot.category == category) for day_id, category in keys]
+    return {row.id for row in db.session.query(TimeSlot.id).filter(TimeSlot.type == 'award', or_(*conditions))}
+
+
+def personal_schedule_slot_ids(user):
+    """
+    Слоты личного расписания пользователя - тот же набор, что показывает dashboard():
+    его конкурсы (как участника или судьи) и соответствующие награждения.
+    Возвращает (ID конкурсов, ID всех слотов расписания); для админа - (None, None).
+    """
+    if user.role == 'participant':
+        contests = db.session.query(TimeSlot.id, TimeSlot.day_id, TimeSlot.category).join(
+            Participation, Participation.time_slot_id == TimeSlot.id
+        ).filter(Participation.user_id == user.id).all()
+    elif user.role == 'judge':
+        contests = db.session.query(TimeSlot.id, TimeSlot.day_id, TimeSlot.category).join(
+            JudgeNomination, JudgeNomination.time_slot_id == TimeSlot.id
+        ).filter(JudgeNomination.judge_id == user.id).all()
+    else:
+        return None, None
+
+    contest_ids = {c.id for c in contests}
+    return contest_ids, contest_ids | relevant_award_slot_ids(contests)
+
+
+def participant_score_cards(user):
+    """
+    Карточки оценок участника (по одной на заявку): оценки каждого судьи по критериям,
+    средние и место, если награждение уже прошло. Используется в my_scores и в API.
+    """
+    participations = Participation.query.options(
+        *loaders.PARTICIPATION_SCORE_CARD
+    ).filter_by(user_id=user.id).all()
+
+    # Загружаем все слоты награждений одним запросом
+    award_slots = TimeSlot.query.filter_by(type='award').all()
+    # Создаем карту для быстрого поиска: {(day_id, category): end_time}
+    award_map = {(slot.day_id, slot.category): slot.end_time for slot in award_slots}
+
+    results = []
+    now = datetime.now()
+
+    for p in participations:
+        slot = p.contest_slot
+
+        # Статус победителя показываем только после окончания соответствующего награждения
+        is_winner = False
+        winner_place = None
+        if p.winner:
+            award_end_time = award_map.get((slot.day_id, slot.category))
+            if award_end_time and now > award_end_time:
+                is_winner = True
+                winner_place = p.winner.place
+
+        judge_scores = {}
+        for s in p.scores:
+            if s.criterion:
+                judge_id = s.judge_id
+                if judge_id not in judge_scores:
+                    judge_scores[judge_id] = {'judge': s.judge, 'criteria': {}, 'total': 0, 'count': 0}
+
+                judge_scores[judge_id]['criteria'][s.criterion.name] = s.score
+                judge_scores[judge_id]['total'] += s.score
+                judge_scores[judge_id]['count'] += 1
+
+        for j in judge_scores.values():
+            j['avg'] = round(j['total'] / j['count'], 2) if j['count'] else None
+
+        overall_scores = [j['avg'] for j in judge_scores.values() if j['avg'] is not None]
+        overall_avg = round(sum(overall_scores) / len(overall_scores), 2) if overall_scores else None
+
+        results.append({
+            'participation_id': p.id,
+            'nomination': slot.nomination_template.name,
+            'category': slot.category,
+            'date': slot.day.date,
+            'start_time': slot.start_time,
+            'end_time': slot.end_time,
+            'judge_scores': judge_scores,
+            'overall_avg': overall_avg,
+            'is_winner': is_winner,
+            'winner_place': winner_place
+        })
+
+    results.sort(key=lambda r: r['date'], reverse=True)
+    return results
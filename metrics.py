@@ -0,0 +1,369 @@
+# metrics.py
+# Метрики в формате Prometheus без внешних агентов.
+#
+# Счетчики и гистограммы живут в памяти процесса (словарь + блокировка).
+# Фоновый поток каждого воркера gunicorn раз в METRICS_DUMP_INTERVAL секунд
+# сбрасывает свой снимок в instance/metrics/<pid>.json (и без запросов: иначе
+# простаивающий воркер выглядел бы завершенным), а /metrics
+# складывает свежий снимок текущего процесса со снимками остальных - так
+# Prometheus видит сумму по всем воркерам, какой бы из них ни ответил.
+# Снимок завершенного воркера перед удалением прибавляется к retired.json,
+# иначе сумма счетчиков уменьшалась бы и выглядела бы для Prometheus сбросом.
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, has_request_context, request, session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+try:
+    import fcntl
+except ImportError:  # Windows: там работает один процесс dev-сервера, блокировка не нужна
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+WRITE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+RETIRED_FILE = 'retired.json'  # накопленные значения завершенных воркеров
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        _metrics[name] = self
+
+    def inc(self, labels=(), amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def snapshot(self):
+        return [[list(labels), value] for labels, value in self.values.items()]
+
+    @staticmethod
+    def merge(into, value):
+        return (into or 0) + value
+
+    def lines(self, values):
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.values = {}  # labels -> [счетчики по корзинам..., сумма, количество]
+        _metrics[name] = self
+
+    def observe(self, labels, value):
+        with _lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self):
+        return [[list(labels), list(state)] for labels, state in self.values.items()]
+
+    @staticmethod
+    def merge(into, value):
+        return value if into is None else [a + b for a, b in zip(into, value)]
+
+    def lines(self, values):
+        for labels, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(self.labelnames + ("le",), labels + (_number(bound),))} {cumulative}'
+            yield f'{self.name}_bucket{_labels(self.labelnames + ("le",), labels + ("+Inf",))} {state[-1]}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(state[-2])}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {state[-1]}'
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(n, str(v).replace('\\', '\\\\').replace('"', '\\"')) for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# --- Метрики приложения ---
+
+REQUESTS = Counter('http_requests_total', 'Запросы по endpoint-ам и кодам ответа',
+                   ('blueprint', 'endpoint', 'method', 'status'))
+LATENCY = Histogram('http_request_duration_seconds', 'Время обработки запроса',
+                    ('blueprint', 'endpoint'))
+QUERIES_PER_REQUEST = Histogram('db_queries_per_request', 'SQL-запросов на один HTTP-запрос',
+                                ('blueprint', 'endpoint'), buckets=QUERY_COUNT_BUCKETS)
+QUERIES = Counter('db_queries_total', 'Выполненные SQL-запросы')
+WRITE_DURATION = Histogram('db_write_duration_seconds',
+                           'Время INSERT/UPDATE/DELETE (в SQLite включает ожидание блокировки записи)',
+                           buckets=WRITE_BUCKETS)
+LOCKED = Counter('db_locked_errors_total', 'Ошибки "database is locked" (не дождались блокировки SQLite)')
+CACHE_HITS = Counter('cache_hits_total', 'Попадания в процессные кэши', ('namespace',))
+CACHE_MISSES = Counter('cache_misses_total', 'Промахи процессных кэшей', ('namespace',))
+SCORES_WRITTEN = Counter('scores_written_total', 'Сохраненные (закоммиченные) оценки судей')
+
+
+# --- Хуки SQLAlchemy (на все движки и сессии) ---
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    QUERIES.inc()
+    if has_request_context() and '_metrics_queries' in g:
+        g._metrics_queries += 1
+    if statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.info['_metrics_write_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _time_write(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('_metrics_write_started', None)
+    if started is not None:
+        WRITE_DURATION.observe((), time.perf_counter() - started)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _count_locked(context):
+    if context.connection is not None:
+        context.connection.info.pop('_metrics_write_started', None)
+    if 'database is locked' in str(context.original_exception):
+        LOCKED.inc()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_scores(session, flush_context):
+    count = sum(1 for obj in list(session.new) + list(session.dirty)
+                if getattr(obj, '__tablename__', None) == 'score')
+    if count:
+        session.info['_metrics_scores'] = session.info.get('_metrics_scores', 0) + count
+
+
+@event.listens_for(Session, 'after_commit')
+def _count_scores(session):
+    count = session.info.pop('_metrics_scores', 0)
+    if count:
+        SCORES_WRITTEN.inc(amount=count)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_scores(session):
+    session.info.pop('_metrics_scores', None)
+
+
+def _snapshot():
+    with _lock:
+        return {name: metric.snapshot() for name, metric in _metrics.items()}
+
+
+def _merge(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, values in snapshot.items():
+            metric = _metrics.get(name)
+            if metric is None:
+                continue
+            target = merged.setdefault(name, {})
+            for labels, value in values:
+                labels = tuple(labels)
+                target[labels] = metric.merge(target.get(labels), value)
+    return merged
+
+
+def _to_snapshot(merged):
+    return {name: [[list(labels), value] for labels, value in values.items()] for name, values in merged.items()}
+
+
+def render(merged):
+    lines = []
+    for name, metric in _metrics.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        lines.extend(metric.lines(merged.get(name, {})))
+
+    # Доля попаданий в кэш - сразу готовым числом, для дашборда
+    hits, misses = merged.get(CACHE_HITS.name, {}), merged.get(CACHE_MISSES.name, {})
+    lines.append('# HELP cache_hit_ratio Доля попаданий в процессные кэши')
+    lines.append('# TYPE cache_hit_ratio gauge')
+    for labels in sorted(set(hits) | set(misses)):
+        total = hits.get(labels, 0) + misses.get(labels, 0)
+        if total:
+            lines.append(f'cache_hit_ratio{_labels(("namespace",), labels)} {hits.get(labels, 0) / total:.4f}')
+    return '\n'.join(lines) + '\n'
+
+
+def _observe(labels, status, started, request_globals):
+    LATENCY.observe(labels, time.perf_counter() - started)
+    QUERIES_PER_REQUEST.observe(labels, request_globals.pop('_metrics_queries', 0))
+    REQUESTS.inc(labels + status)
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self.app = None
+        self.directory = None
+        self._started = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config.get('METRICS_DIR') or os.path.join(app.instance_path, 'metrics')
+        app.extensions['metrics'] = self
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    # --- Хуки запроса ---
+
+    def _before_request(self):
+        self._ensure_started()
+        g._metrics_started = time.perf_counter()
+        g._metrics_queries = 0
+
+    def _after_request(self, response):
+        started = g.pop('_metrics_started', None)
+        if started is None or not request.endpoint:
+            return response
+        labels = (request.blueprint or '', request.endpoint)
+        status = (request.method, str(response.status_code))
+        request_globals = g._get_current_object()
+        if response.is_streamed:
+            # Тело потокового ответа (streaming.py) рендерится уже после этого хука:
+            # время и SQL-запросы учитываем, когда ответ отдан целиком
+            response.call_on_close(lambda: _observe(labels, status, started, request_globals))
+        else:
+            _observe(labels, status, started, request_globals)
+        return response
+
+    # --- Снимки воркеров ---
+
+    def _ensure_started(self):
+        # Как и jobs.py, стартуем на первом запросе: в CLI снимки не нужны
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            threading.Thread(target=self._dump_loop, name='metrics-dump', daemon=True).start()
+
+    def _dump_loop(self):
+        interval = self.app.config.get('METRICS_DUMP_INTERVAL', 5)
+        while True:
+            self._dump()
+            time.sleep(interval)
+
+    def _dump(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{os.getpid()}.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(_snapshot(), f)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            self.app.logger.exception('Не удалось сохранить снимок метрик')
+
+    def collect(self):
+        """
+        Текущий снимок этого процесса + свежие снимки остальных воркеров +
+        накопленное от завершенных воркеров, сложенные вместе.
+        """
+        snapshots = [_snapshot()]
+        stale_after = self.app.config.get('METRICS_STALE_AFTER', 300)
+        own = f'{os.getpid()}.json'
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith('.json') or name in (own, RETIRED_FILE):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if time.time() - os.path.getmtime(path) > stale_after:
+                    self._retire(path)  # воркер давно молчит - скорее всего, его уже нет
+                    continue
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        try:
+            with open(os.path.join(self.directory, RETIRED_FILE)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return _merge(snapshots)
+
+    def _retire(self, path):
+        """Прибавляет снимок завершенного воркера к retired.json и удаляет снимок."""
+        retired_path = os.path.join(self.directory, RETIRED_FILE)
+        with self._retired_lock():
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except FileNotFoundError:
+                return  # уже перенесен другим воркером
+            except ValueError:
+                snapshot = {}  # оборванная запись - переносить нечего
+            try:
+                with open(retired_path) as f:
+                    retired = json.load(f)
+            except FileNotFoundError:
+                retired = {}
+            with open(retired_path + '.tmp', 'w') as f:
+                json.dump(_to_snapshot(_merge([retired, snapshot])), f)
+            os.replace(retired_path + '.tmp', retired_path)
+            os.remove(path)
+
+    @contextmanager
+    def _retired_lock(self):
+        # Снимки переносят все воркеры, а retired.json один: читать-складывать-писать по очереди
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, 'retired.lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def view(self):
+        # Доступ: с localhost, по токену (Authorization: Bearer ...) или администратору.
+        # Запрос, пришедший через прокси (есть X-Forwarded-For), локальным не считается.
+        token = self.app.config.get('METRICS_TOKEN')
+        local = request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+        allowed = (local
+                   or (token and request.headers.get('Authorization') == f'Bearer {token}')
+                   or session.get('user_role') == 'admin')
+        if not allowed:
+            abort(403)
+        return Response(render(self.collect()), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+metrics = Metrics()
@@ -97,6 +97,14 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # extensions.py включает внешние ключи SQLite на каждом соединении. Пересборка
+        # таблицы в batch-миграции делает DROP TABLE, и каскад ondelete='CASCADE'
+        # стер бы все дочерние строки - на время миграций внешние ключи выключаем.
+        # PRAGMA действует только вне транзакции, поэтому сразу фиксируем.
+        if connection.dialect.name == 'sqlite':
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -0,0 +1,34 @@
+"""Seed cache version namespaces for the invalidation bus
+
+Revision ID: 6f3005d819d2
+Revises: 1ee0bafa7b06
+Create Date: 2026-10-19 15:02:11.408512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f3005d819d2'
+down_revision = '1ee0bafa7b06'
+branch_labels = None
+depends_on = None
+
+
+cache_versions = sa.table('cache_versions',
+    sa.column('namespace', sa.String),
+    sa.column('version', sa.Integer),
+)
+
+
+def upgrade():
+    # Строка 'refdata' создана предыдущей миграцией
+    op.bulk_insert(cache_versions, [
+        {'namespace': 'schedule', 'version': 0},
+        {'namespace': 'results', 'version': 0},
+    ])
+
+
+def downgrade():
+    op.execute(cache_versions.delete().where(cache_versions.c.namespace.in_(['schedule', 'results'])))
@@ -10,4 +10,12 @@ from .judge_nomination import JudgeNomination
 from .criterion import Criterion
 from .score import Score
 from .winner import Winner
-from .participation import Participation
\ No newline at end of file
+from .participation import Participation
+from .job import Job
+from .cache_version import CacheVersion
+from .notification import Notification
+from .score_cube import ScoreCube
+from .leaderboard_snapshot import LeaderboardSnapshot
+from .score_sync_op import ScoreSyncOp
+from .score_event import ScoreEvent
+from .festival_archive import FestivalArchive
@@ -0,0 +1,9 @@
+# models/cache_version.py
+
+from extensions import db
+
+class CacheVersion(db.Model):
+    """Версия пространства имен кэша. Увеличивается при изменении данных (см. cache_versions.py)."""
+    __tablename__ = 'cache_versions'
+    namespace = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
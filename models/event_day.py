@@ -13,7 +13,7 @@ class EventDay(db.Model):
     date = db.Column(db.Date, nullable=False)
     day_order = db.Column(db.Integer, nullable=False)
 
-    time_slots = db.relationship('TimeSlot', backref='day', lazy=True, cascade="all, delete-orphan")
+    time_slots = db.relationship('TimeSlot', backref=db.backref('day', lazy='raise_on_sql'), lazy='raise_on_sql', cascade="all, delete-orphan", passive_deletes=True)
 
 
     __table_args__ = (
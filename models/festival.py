@@ -9,5 +9,5 @@ class Festival(db.Model):
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date, nullable=False)
 
-    # ИЗМЕНЕНИЕ: Добавляем каскадное удаление на уровне ORM
-    days = db.relationship('EventDay', backref='festival', lazy=True, cascade="all, delete-orphan")
\ No newline at end of file
+    # Каскадное удаление выполняет БД (ondelete='CASCADE'), ORM не загружает дни перед удалением
+    days = db.relationship('EventDay', backref=db.backref('festival', lazy='raise_on_sql'), lazy='raise_on_sql', cascade="all, delete-orphan", passive_deletes=True)
\ No newline at end of file
@@ -0,0 +1,26 @@
+# models/festival_archive.py
+
+from datetime import datetime
+from extensions import db
+
+class FestivalArchive(db.Model):
+    """
+    Фестиваль, выгруженный в холодный архив (см. archive.py): сам граф данных и
+    замороженные итоги лежат в сжатом файле в ARCHIVE_DIR, здесь - только опись
+    для списка архивов. Без внешнего ключа: фестиваля в рабочих таблицах уже нет.
+    """
+    __tablename__ = 'festival_archives'
+    id = db.Column(db.Integer, primary_key=True)
+    festival_id = db.Column(db.Integer, nullable=False, index=True)  # id фестиваля до архивации
+    name = db.Column(db.String, nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+
+    file_name = db.Column(db.String(200), nullable=False, unique=True)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    row_counts = db.Column(db.Text, nullable=False)  # JSON {таблица: строк в архиве}
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    # Когда строки удалены из рабочих таблиц; None - удаление еще не закончено
+    purged_at = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,35 @@
+# models/job.py
+
+from datetime import datetime
+from extensions import db
+from sqlalchemy import CheckConstraint
+
+class Job(db.Model):
+    """Фоновая задача (см. jobs.py). Таблица служит и очередью, и журналом выполнения."""
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=True)  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'done', 'failed'
+
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=True)  # для повторов с задержкой
+
+    progress = db.Column(db.String(200), nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON
+    error = db.Column(db.Text, nullable=True)
+    worker = db.Column(db.String(100), nullable=True)  # host:pid процесса-исполнителя
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # исполнитель жив, пока продлевает (см. JOBS_LEASE)
+
+    # --- Метрики времени ---
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    wait_ms = db.Column(db.Integer, nullable=True)  # от постановки в очередь до старта
+    duration_ms = db.Column(db.Integer, nullable=True)  # время выполнения последней попытки
+
+    __table_args__ = (
+        CheckConstraint("status IN ('queued', 'running', 'done', 'failed')", name="check_job_status"),
+        db.Index('ix_jobs_status_type', 'status', 'type'),
+    )
@@ -8,7 +8,7 @@ class JudgeNomination(db.Model):
     # ГЛАВНОЕ ИЗМЕНЕНИЕ: Ссылка теперь на TimeSlot (конкурс)
     time_slot_id = db.Column(db.Integer, db.ForeignKey('time_slots.id', ondelete='CASCADE'), nullable=False)
 
-    judge = db.relationship('User')
+    judge = db.relationship('User', lazy='raise_on_sql')
 
     __table_args__ = (
         db.UniqueConstraint('judge_id', 'time_slot_id', name='unique_judge_slot'),
@@ -0,0 +1,29 @@
+# models/leaderboard_snapshot.py
+
+from datetime import datetime
+from extensions import db
+
+class LeaderboardSnapshot(db.Model):
+    """
+    Готовое табло конкурса для публичного экрана (см. leaderboard.py): компактный
+    JSON с текущими местами, победителями и сведениями о конкурсе. Публичные
+    страницы читают только эту таблицу.
+    """
+    __tablename__ = 'leaderboard_snapshots'
+    time_slot_id = db.Column(db.Integer, db.ForeignKey('time_slots.id', ondelete='CASCADE'), primary_key=True)
+    zone = db.Column(db.String(10), nullable=True)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    # Конец награждения того же дня и категории: до него победители на табло не показываются
+    award_end = db.Column(db.DateTime, nullable=True)
+    has_winners = db.Column(db.Boolean, nullable=False, default=False)
+
+    # Растет при каждом изменении payload - из версий собирается ETag табло
+    version = db.Column(db.Integer, nullable=False, default=1)
+    payload = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_leaderboard_snapshots_zone_start_time', 'zone', 'start_time'),
+        db.Index('ix_leaderboard_snapshots_zone_award_end', 'zone', 'award_end'),
+    )
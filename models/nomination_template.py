@@ -21,11 +21,13 @@ class NominationTemplate(db.Model):
     # Убираем lazy='dynamic', чтобы можно было использовать joinedload.
     # Теперь 'criteria' будет обычным списком, а не объектом запроса.
     criteria = db.relationship(
-        'Criterion', 
+        'Criterion',
         secondary=nomination_template_criteria,
-        # 'backref' также больше не нуждается в lazy='dynamic'
-        backref=db.backref('nomination_templates', lazy=True), 
-        lazy='select' # 'select' - это поведение по умолчанию, можно даже не указывать
+        # Строки связующей таблицы при удалении шаблона или критерия удаляет БД (ondelete='CASCADE'),
+        # ORM не загружает для этого коллекции
+        backref=db.backref('nomination_templates', lazy='raise_on_sql', passive_deletes=True),
+        lazy='raise_on_sql',  # загружается явно, см. loaders.TEMPLATE_WITH_CRITERIA
+        passive_deletes=True,
     )
 
     __table_args__ = (
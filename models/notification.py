@@ -0,0 +1,38 @@
+# models/notification.py
+
+from datetime import datetime
+from extensions import db
+from sqlalchemy import CheckConstraint
+
+class Notification(db.Model):
+    """
+    Исходящее сообщение в Telegram (outbox, см. notifications.py).
+    Строка пишется в той же транзакции, что и событие, а доставляет ее фоновый отправитель.
+    """
+    __tablename__ = 'notifications'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    time_slot_id = db.Column(db.Integer, db.ForeignKey('time_slots.id', ondelete='CASCADE'), nullable=True)
+    chat_id = db.Column(db.String, nullable=False)
+    kind = db.Column(db.String(30), nullable=False)  # 'contest_start', 'judging_done', 'award_result'
+    text = db.Column(db.Text, nullable=False)
+    # Ключ идемпотентности: одно и то же событие не ставится в очередь дважды
+    dedup_key = db.Column(db.String(100), nullable=False, unique=True)
+
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Не отправлять раньше (локальное время, как у слотов): для результатов - конец награждения,
+    # для повторов - время следующей попытки
+    send_after = db.Column(db.DateTime, nullable=True)
+    claimed_by = db.Column(db.String(100), nullable=True)  # host:pid отправителя
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        CheckConstraint("status IN ('pending', 'sending', 'sent', 'failed')", name="check_notification_status"),
+        CheckConstraint("kind IN ('contest_start', 'judging_done', 'award_result')", name="check_notification_kind"),
+        db.Index('ix_notifications_status_send_after', 'status', 'send_after'),
+    )
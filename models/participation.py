@@ -13,10 +13,10 @@ class Participation(db.Model):
     entry_number = db.Column(db.Integer, nullable=False, default=1)
     registered_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    scores = db.relationship('Score', backref='participation', lazy=True, cascade="all, delete-orphan")
+    scores = db.relationship('Score', backref=db.backref('participation', lazy='raise_on_sql'), lazy='raise_on_sql', cascade="all, delete-orphan", passive_deletes=True)
     
     # Эта связь является главной. Она создает winner.participation
-    winner = db.relationship('Winner', backref='participation', uselist=False, cascade="all, delete-orphan")
+    winner = db.relationship('Winner', backref=db.backref('participation', lazy='raise_on_sql'), uselist=False, lazy='raise_on_sql', cascade="all, delete-orphan", passive_deletes=True)
 
     __table_args__ = (
         UniqueConstraint('user_id', 'time_slot_id', 'entry_number', name='unique_user_slot_entry'),
@@ -1,3 +1,4 @@
+from datetime import datetime
 from extensions import db
 from sqlalchemy import CheckConstraint
 
@@ -8,11 +9,13 @@ class Score(db.Model):
     participation_id = db.Column(db.Integer, db.ForeignKey('participations.id', ondelete='CASCADE'), nullable=False)
     criterion_id = db.Column(db.Integer, db.ForeignKey('criteria.id', ondelete='CASCADE'), nullable=False)
     score = db.Column(db.Integer, nullable=False)
-    scored_at = db.Column(db.DateTime, server_default=db.func.current_timestamp())
+    # Локальное время последнего изменения, как у слотов; по нему офлайн-синхронизация
+    # решает, чья правка новее (score_sync.py)
+    scored_at = db.Column(db.DateTime, default=datetime.now, server_default=db.func.current_timestamp())
 
     # 🔧 Связи для joinedload()
-    judge = db.relationship('User')
-    criterion = db.relationship('Criterion')
+    judge = db.relationship('User', lazy='raise_on_sql')
+    criterion = db.relationship('Criterion', lazy='raise_on_sql')
 
     __table_args__ = (
         db.UniqueConstraint('judge_id', 'participation_id', 'criterion_id', name='unique_score'),
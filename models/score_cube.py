@@ -0,0 +1,26 @@
+# models/score_cube.py
+
+from extensions import db
+
+class ScoreCube(db.Model):
+    """
+    Предагрегированные оценки (см. score_cube.py): одна строка на
+    конкурс x судью x критерий x категорию участников - число оценок, их сумма
+    и сумма квадратов. Аналитика читает только эту таблицу, а не score.
+    """
+    __tablename__ = 'score_cube'
+    id = db.Column(db.Integer, primary_key=True)
+    festival_id = db.Column(db.Integer, db.ForeignKey('festivals.id', ondelete='CASCADE'), nullable=False, index=True)
+    day_id = db.Column(db.Integer, db.ForeignKey('event_days.id', ondelete='CASCADE'), nullable=False)
+    time_slot_id = db.Column(db.Integer, db.ForeignKey('time_slots.id', ondelete='CASCADE'), nullable=False)
+    judge_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    criterion_id = db.Column(db.Integer, db.ForeignKey('criteria.id', ondelete='CASCADE'), nullable=False)
+    experience_category = db.Column(db.String, nullable=False)  # 'pro' / 'junior'
+
+    n = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    total_sq = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('time_slot_id', 'judge_id', 'criterion_id', 'experience_category', name='unique_score_cube_cell'),
+    )
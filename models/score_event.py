@@ -0,0 +1,21 @@
+# models/score_event.py
+
+from extensions import db
+
+class ScoreEvent(db.Model):
+    """
+    Журнал изменений оценок (см. score_events.py): только добавление, одна строка
+    на изменение одной оценки. id - смещение события в журнале. Только целые
+    числа и без внешних ключей: журнал компактный и переживает удаление заявок
+    и пользователей.
+    """
+    __tablename__ = 'score_events'
+    id = db.Column(db.Integer, primary_key=True)
+    judge_id = db.Column(db.Integer, nullable=False)
+    participation_id = db.Column(db.Integer, nullable=False)
+    criterion_id = db.Column(db.Integer, nullable=False)
+    # Конкурс на момент события: пересчет по конкурсу не зависит от того, жива ли заявка
+    time_slot_id = db.Column(db.Integer, nullable=True, index=True)
+    old_score = db.Column(db.SmallInteger, nullable=True)  # None - оценка появилась
+    new_score = db.Column(db.SmallInteger, nullable=True)  # None - оценка удалена
+    at = db.Column(db.Integer, nullable=False)  # Unix-время, секунды
@@ -0,0 +1,21 @@
+# models/score_sync_op.py
+
+from datetime import datetime
+from extensions import db
+from sqlalchemy import CheckConstraint
+
+class ScoreSyncOp(db.Model):
+    """
+    Обработанная операция офлайн-синхронизации оценок (см. score_sync.py).
+    op_id генерирует браузер судьи; повтор той же операции получает сохраненный
+    результат и ничего не пишет в оценки.
+    """
+    __tablename__ = 'score_sync_ops'
+    judge_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    op_id = db.Column(db.String(64), primary_key=True)
+    status = db.Column(db.String(20), nullable=False)  # 'applied', 'stale', 'rejected'
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+    __table_args__ = (
+        CheckConstraint("status IN ('applied', 'stale', 'rejected')", name="check_score_sync_op_status"),
+    )
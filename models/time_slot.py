@@ -26,15 +26,19 @@ class TimeSlot(db.Model):
     event_title = db.Column(db.String(100), nullable=True) 
     
     # --- Новые связи ---
+    # Все связи моделей - lazy='raise_on_sql': неявная догрузка в шаблоне падает с ошибкой,
+    # загружать их нужно явно наборами из loaders.py
     # Этот слот судейства связан с одним шаблоном номинации
-    nomination_template = db.relationship('NominationTemplate')
+    nomination_template = db.relationship('NominationTemplate', lazy='raise_on_sql')
     
     # В этом слоте-конкурсе есть много участников и много судей
-    participants = db.relationship('Participation', backref='contest_slot', cascade="all, delete-orphan")
-    judge_assignments = db.relationship('JudgeNomination', backref='contest_slot', cascade="all, delete-orphan")
+    participants = db.relationship('Participation', backref=db.backref('contest_slot', lazy='raise_on_sql'), lazy='raise_on_sql', cascade="all, delete-orphan", passive_deletes=True)
+    judge_assignments = db.relationship('JudgeNomination', backref=db.backref('contest_slot', lazy='raise_on_sql'), lazy='raise_on_sql', cascade="all, delete-orphan", passive_deletes=True)
     
     __table_args__ = (
         UniqueConstraint('day_id', 'slot_order', name='unique_day_slot_order'),
         CheckConstraint("category IN ('healed', 'fresh')", name="check_timeslot_category"),
-        CheckConstraint("status IN ('pending', 'judging', 'completed', 'awarded')", name="check_timeslot_status")
+        CheckConstraint("status IN ('pending', 'judging', 'completed', 'awarded')", name="check_timeslot_status"),
+        # Выборка слотов, которым пора сменить статус (sweeper.py)
+        db.Index('ix_time_slots_status_start_time', 'status', 'start_time'),
     )
\ No newline at end of file
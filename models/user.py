@@ -6,12 +6,14 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.String(6), unique=True, nullable=False)
     nickname = db.Column(db.String(100), nullable=True, index=True)  # Новое поле
-    telegram_id = db.Column(db.String, nullable=True)
+    telegram_id = db.Column(db.String, nullable=True, index=True)
     role = db.Column(db.String, nullable=False)
     experience_category = db.Column(db.String, nullable=True)
+    # Секрет в адресе личного календаря (ICS, см. calendar_feed.py); создается при первом показе ссылки
+    calendar_token = db.Column(db.String(64), nullable=True, unique=True, index=True)
     created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp())
 
-    participations = db.relationship('Participation', backref='user', cascade="all, delete-orphan")
+    participations = db.relationship('Participation', backref=db.backref('user', lazy='raise_on_sql'), lazy='raise_on_sql', cascade="all, delete-orphan", passive_deletes=True)
 
     __table_args__ = (
         CheckConstraint("role IN ('participant', 'judge', 'admin')", name="check_role"),
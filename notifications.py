@@ -0,0 +1,409 @@
+# notifications.py
+# Уведомления участникам и судьям в Telegram через outbox.
+#
+# События (начало конкурса, завершение судейства, результаты) записываются
+# строками в таблицу notifications в той же транзакции, что и само изменение:
+# откатилась транзакция - сообщение не уйдет, закоммитилась - не потеряется.
+# Доставляет их отправитель на asyncio (отдельный поток в процессе, как у
+# jobs.py): забирает пачку атомарным UPDATE, шлет в Bot API с ограничением
+# скорости (общим и на каждый чат) и повторяет неудачные отправки с
+# нарастающей задержкой.
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, event, insert, or_, select, update
+from sqlalchemy.orm import Session, aliased
+
+from extensions import db
+from models import Notification, TimeSlot, Participation, JudgeNomination, User, NominationTemplate, Winner
+from refdata import CATEGORY_MAP
+
+logger = logging.getLogger(__name__)
+
+_QUEUED_KEY = '_notifications_queued'
+
+# Сколько времени строка может провисеть в 'sending', прежде чем ее вернут в очередь
+STALE_CLAIM = timedelta(minutes=10)
+
+
+# --- Постановка в очередь (в транзакции вызывающего) ---
+
+def _queue(rows):
+    """Добавляет строки outbox в текущую транзакцию; уже поставленные (по dedup_key) пропускаются."""
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        dialect_insert = None
+
+    if dialect_insert is not None:
+        stmt = dialect_insert(Notification).on_conflict_do_nothing(index_elements=['dedup_key'])
+    else:
+        existing = set(db.session.scalars(select(Notification.dedup_key).where(
+            Notification.dedup_key.in_([r['dedup_key'] for r in rows]))))
+        rows = [r for r in rows if r['dedup_key'] not in existing]
+        stmt = insert(Notification)
+    if rows:
+        db.session.execute(stmt, rows)
+        db.session.info[_QUEUED_KEY] = True
+
+
+def _slot_label(title, category):
+    label = f'«{title}»'
+    if category:
+        label += f' ({CATEGORY_MAP.get(category, category)})'
+    return label
+
+
+def _contest_recipients(slot_ids, with_judges):
+    """(слот, пользователь, роль) для участников и, при необходимости, судей конкурсов с привязанным Telegram."""
+    columns = (TimeSlot.id, TimeSlot.start_time, TimeSlot.zone, TimeSlot.category, TimeSlot.day_id,
+               NominationTemplate.name, User.id, User.telegram_id)
+    has_telegram = (User.telegram_id.isnot(None), User.telegram_id != '')
+
+    participants = db.session.query(*columns).select_from(TimeSlot).join(
+        NominationTemplate, NominationTemplate.id == TimeSlot.nomination_template_id
+    ).join(Participation, Participation.time_slot_id == TimeSlot.id).join(
+        User, User.id == Participation.user_id
+    ).filter(TimeSlot.id.in_(slot_ids), *has_telegram).distinct()
+    rows = [(row, 'participant') for row in participants]
+
+    if with_judges:
+        judges = db.session.query(*columns).select_from(TimeSlot).join(
+            NominationTemplate, NominationTemplate.id == TimeSlot.nomination_template_id
+        ).join(JudgeNomination, JudgeNomination.time_slot_id == TimeSlot.id).join(
+            User, User.id == JudgeNomination.judge_id
+        ).filter(TimeSlot.id.in_(slot_ids), *has_telegram)
+        rows += [(row, 'judge') for row in judges]
+    return rows
+
+
+def _award_end_times(day_category_pairs):
+    """{(day_id, category): конец награждения} - результаты объявляются по его окончании."""
+    if not day_category_pairs:
+        return {}
+    day_ids = {day_id for day_id, _ in day_category_pairs}
+    return {(s.day_id, s.category): s.end_time for s in db.session.query(
+        TimeSlot.day_id, TimeSlot.category, TimeSlot.end_time
+    ).filter(TimeSlot.type == 'award', TimeSlot.day_id.in_(day_ids))}
+
+
+def enqueue_contest_start(slot_ids):
+    """Конкурс начался: участникам и судьям."""
+    rows = []
+    for row, role in _contest_recipients(slot_ids, with_judges=True):
+        slot_id, start_time, zone, category, _, title, user_id, chat_id = row
+        where = f', зона {zone}' if zone else ''
+        if role == 'judge':
+            text = f'Начинается судейство конкурса {_slot_label(title, category)} в {start_time:%H:%M}{where}.'
+        else:
+            text = f'Начинается ваш конкурс {_slot_label(title, category)} в {start_time:%H:%M}{where}. Удачи!'
+        rows.append({'user_id': user_id, 'time_slot_id': slot_id, 'chat_id': chat_id,
+                     'kind': 'contest_start', 'text': text,
+                     'dedup_key': f'contest_start:{slot_id}:{user_id}'})
+    _queue(rows)
+
+
+def enqueue_judging_done(slot_ids):
+    """Судьи выставили все оценки: участникам - когда ждать результатов."""
+    recipients = _contest_recipients(slot_ids, with_judges=False)
+    award_ends = _award_end_times({(row[4], row[3]) for row, _ in recipients})
+    rows = []
+    for row, _ in recipients:
+        slot_id, _, _, category, day_id, title, user_id, chat_id = row
+        text = f'Судейство конкурса {_slot_label(title, category)} завершено.'
+        award_end = award_ends.get((day_id, category))
+        if award_end:
+            text += f' Итоги объявят на награждении до {award_end:%H:%M}.'
+        rows.append({'user_id': user_id, 'time_slot_id': slot_id, 'chat_id': chat_id,
+                     'kind': 'judging_done', 'text': text,
+                     'dedup_key': f'judging_done:{slot_id}:{user_id}'})
+    _queue(rows)
+
+
+def enqueue_award_results(contest_id, experience_category):
+    """
+    Победители конкурса в категории участников. Сообщение уходит после окончания
+    награждения (как и на странице «Мои оценки»); если победителя переназначили
+    до этого, неотправленное сообщение прежнему победителю отменяется.
+    """
+    key_prefix = f'award_result:{contest_id}:{experience_category}:'
+    db.session.execute(delete(Notification).where(
+        Notification.status == 'pending', Notification.dedup_key.startswith(key_prefix)
+    ), execution_options={'synchronize_session': False})
+
+    winners = db.session.query(
+        Winner.place, Winner.participation_id, TimeSlot.day_id, TimeSlot.category,
+        NominationTemplate.name, User.id, User.telegram_id
+    ).join(Participation, Participation.id == Winner.participation_id).join(
+        TimeSlot, TimeSlot.id == Winner.time_slot_id
+    ).join(NominationTemplate, NominationTemplate.id == TimeSlot.nomination_template_id).join(
+        User, User.id == Participation.user_id
+    ).filter(Winner.time_slot_id == contest_id, Winner.experience_category == experience_category,
+             User.telegram_id.isnot(None), User.telegram_id != '').all()
+    if not winners:
+        return
+
+    award_ends = _award_end_times({(w.day_id, w.category) for w in winners})
+    rows = []
+    for place, participation_id, day_id, category, title, user_id, chat_id in winners:
+        award_end = award_ends.get((day_id, category))
+        if award_end is None:
+            # Без награждения результат участнику не показывается - не сообщаем и здесь
+            continue
+        rows.append({'user_id': user_id, 'time_slot_id': contest_id, 'chat_id': chat_id,
+                     'kind': 'award_result', 'send_after': award_end,
+                     'text': f'Поздравляем! {place} место в конкурсе {_slot_label(title, category)}.',
+                     'dedup_key': f'{key_prefix}{participation_id}:{place}'})
+    _queue(rows)
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_after_commit(session):
+    # Новые сообщения закоммичены - будим отправителя, не дожидаясь опроса
+    if session.info.pop(_QUEUED_KEY, False):
+        notifier.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop(_QUEUED_KEY, None)
+
+
+# --- Доставка ---
+
+class RateLimiter:
+    """
+    Общий лимит сообщений в секунду и минимальный интервал между сообщениями в один чат
+    (ограничения Bot API: ~30 сообщений в секунду, ~1 в секунду на чат).
+    Каждый вызов wait() резервирует ближайшее свободное время и спит до него.
+    """
+
+    def __init__(self, global_rate, chat_interval):
+        self.global_interval = 1.0 / global_rate
+        self.chat_interval = chat_interval
+        self._next_global = 0.0
+        self._next_chat = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, chat_id):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            at = max(now, self._next_global, self._next_chat.get(chat_id, 0.0))
+            self._next_global = at + self.global_interval
+            self._next_chat[chat_id] = at + self.chat_interval
+            if len(self._next_chat) > 10000:
+                self._next_chat = {k: v for k, v in self._next_chat.items() if v > now}
+        if at > now:
+            await asyncio.sleep(at - now)
+
+    def pause(self, seconds):
+        """Flood control (HTTP 429): не отправлять ничего в течение seconds."""
+        resume = asyncio.get_running_loop().time() + seconds
+        self._next_global = max(self._next_global, resume)
+
+
+class TelegramNotifier:
+    def __init__(self, app=None):
+        self.app = None
+        self.worker_name = f'{socket.gethostname()}:{os.getpid()}'
+        self._loop = None
+        self._wakeup = None
+        self._started = False
+        self._lock = threading.Lock()
+        self._batch_numbers = itertools.count(1)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['notifier'] = self
+        if self._enabled():
+            # Как и jobs.py, стартуем на первом запросе, а не при импорте/в CLI
+            app.before_request(self._ensure_started)
+
+    def _enabled(self):
+        return bool(self.app.config.get('NOTIFIER_ENABLED', True) and self.app.config.get('TELEGRAM_BOT_TOKEN'))
+
+    def wake(self):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _ensure_started(self):
+        if self._started or not self._enabled():
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            threading.Thread(target=lambda: asyncio.run(self._run()), name='telegram-notifier', daemon=True).start()
+
+    # --- Цикл отправителя ---
+
+    def _setup(self):
+        """Состояние отправителя в текущем цикле событий."""
+        config = self.app.config
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._limiter = RateLimiter(config.get('NOTIFIER_GLOBAL_RATE', 25), config.get('NOTIFIER_CHAT_INTERVAL', 1.0))
+        self._http_slots = asyncio.Semaphore(config.get('NOTIFIER_CONCURRENCY', 8))
+
+    async def _process_batch(self):
+        """Забирает пачку, отправляет ее и сохраняет итоги. False - отправлять нечего."""
+        batch = await asyncio.to_thread(self._in_app, self._claim_batch)
+        if not batch:
+            return False
+        by_chat = {}
+        for message in batch:
+            by_chat.setdefault(message['chat_id'], []).append(message)
+        outcomes = await asyncio.gather(*(self._deliver_chat(messages) for messages in by_chat.values()))
+        await asyncio.to_thread(self._in_app, self._save_outcomes,
+                                [o for chat_outcomes in outcomes for o in chat_outcomes])
+        return True
+
+    async def _run(self):
+        self._setup()
+        poll_interval = self.app.config.get('NOTIFIER_POLL_INTERVAL', 5)
+
+        while True:
+            try:
+                if await self._process_batch():
+                    continue  # пачка была - сразу пробуем следующую
+            except Exception:
+                logger.exception('Ошибка отправителя уведомлений')
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _in_app(self, func, *args):
+        with self.app.app_context():
+            try:
+                return func(*args)
+            finally:
+                db.session.remove()
+
+    def _claim_batch(self):
+        """Атомарно забирает пачку готовых к отправке сообщений; другие процессы ее уже не возьмут."""
+        now = datetime.now()
+        # Сообщения процесса, упавшего посреди отправки, возвращаем в очередь
+        db.session.execute(update(Notification).where(
+            Notification.status == 'sending', Notification.claimed_at < now - STALE_CLAIM
+        ).values(status='pending', claimed_by=None), execution_options={'synchronize_session': False})
+
+        token = f'{self.worker_name}#{next(self._batch_numbers)}'
+        # Порядок в чате: пока более раннее сообщение того же чата отправляется
+        # или ждет повтора после сбоя, следующие не берем
+        earlier = aliased(Notification)
+        blocked = select(earlier.id).where(
+            earlier.chat_id == Notification.chat_id,
+            earlier.id < Notification.id,
+            or_(earlier.status == 'sending', and_(earlier.status == 'pending', earlier.error.isnot(None)))
+        ).exists()
+        ready = select(Notification.id).where(
+            Notification.status == 'pending',
+            or_(Notification.send_after.is_(None), Notification.send_after <= now),
+            ~blocked
+        ).order_by(Notification.id).limit(self.app.config.get('NOTIFIER_BATCH_SIZE', 50))
+        db.session.execute(update(Notification).where(
+            Notification.id.in_(ready.scalar_subquery()), Notification.status == 'pending'
+        ).values(status='sending', claimed_by=token, claimed_at=now),
+            execution_options={'synchronize_session': False})
+        db.session.commit()
+
+        return [row._asdict() for row in db.session.query(
+            Notification.id, Notification.chat_id, Notification.text, Notification.attempts
+        ).filter(Notification.claimed_by == token, Notification.status == 'sending').order_by(Notification.id)]
+
+    async def _deliver_chat(self, messages):
+        """Сообщения одного чата уходят по порядку; при сбое остальные откладываются вместе с ним."""
+        outcomes = []
+        for i, message in enumerate(messages):
+            await self._limiter.wait(message['chat_id'])
+            async with self._http_slots:
+                outcome = await self._send(message)
+            outcomes.append(outcome)
+            if outcome['status'] == 'pending':
+                for rest in messages[i + 1:]:
+                    outcomes.append({'id': rest['id'], 'status': 'pending', 'claimed_by': None,
+                                     'attempts': rest['attempts'], 'send_after': outcome['send_after'],
+                                     'error': 'отложено вслед за предыдущим сообщением чата'})
+                break
+        return outcomes
+
+    async def _send(self, message):
+        config = self.app.config
+        attempts = message['attempts'] + 1
+        try:
+            status_code, body = await asyncio.to_thread(
+                self._post, 'sendMessage', {'chat_id': message['chat_id'], 'text': message['text']})
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            status_code, body = None, {'description': str(e)}
+
+        if status_code == 200 and body.get('ok'):
+            return {'id': message['id'], 'status': 'sent', 'claimed_by': None, 'attempts': attempts,
+                    'sent_at': datetime.now(), 'error': None}
+
+        error = f'{status_code or "network"}: {body.get("description", "")}'[:500]
+        if status_code == 429:
+            # Flood control не считаем неудачной попыткой: ждем, сколько сказал Telegram
+            retry_after = (body.get('parameters') or {}).get('retry_after', 5)
+            self._limiter.pause(retry_after)
+            return {'id': message['id'], 'status': 'pending', 'claimed_by': None, 'attempts': message['attempts'],
+                    'send_after': datetime.now() + timedelta(seconds=retry_after), 'error': error}
+        if status_code is not None and 400 <= status_code < 500:
+            # Чат не найден, бот заблокирован и т.п. - повтор не поможет
+            return {'id': message['id'], 'status': 'failed', 'claimed_by': None, 'attempts': attempts, 'error': error}
+        if attempts >= config.get('NOTIFIER_MAX_ATTEMPTS', 5):
+            return {'id': message['id'], 'status': 'failed', 'claimed_by': None, 'attempts': attempts, 'error': error}
+        delay = config.get('NOTIFIER_RETRY_DELAY', 10) * 2 ** (attempts - 1)
+        return {'id': message['id'], 'status': 'pending', 'claimed_by': None, 'attempts': attempts,
+                'send_after': datetime.now() + timedelta(seconds=delay), 'error': error}
+
+    def _post(self, method, payload):
+        config = self.app.config
+        url = f"{config.get('TELEGRAM_API_URL', 'https://api.telegram.org')}/bot{config['TELEGRAM_BOT_TOKEN']}/{method}"
+        request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, json.loads(response.read() or b'{}')
+        except urllib.error.HTTPError as e:
+            try:
+                return e.code, json.loads(e.read() or b'{}')
+            except ValueError:
+                return e.code, {}
+
+    def _save_outcomes(self, outcomes):
+        # Значения у строк разные, поэтому обновляем по первичному ключу через executemany
+        # (executemany требует одинакового набора полей, поэтому группируем по нему)
+        def fields(outcome):
+            return tuple(sorted(outcome))
+        for _, group in itertools.groupby(sorted(outcomes, key=fields), key=fields):
+            db.session.execute(update(Notification), list(group))
+        db.session.commit()
+
+
+def outbox_stats():
+    """Количество сообщений outbox по статусам."""
+    return dict(db.session.query(Notification.status, db.func.count(Notification.id))
+                .group_by(Notification.status).all())
+
+
+notifier = TelegramNotifier()
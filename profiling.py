@@ -0,0 +1,298 @@
+# profiling.py
+# Выборочный профилировщик запросов, включается администратором.
+#
+# Для доли запросов (по выбранным endpoint-ам) отдельный поток каждые
+# несколько миллисекунд снимает стек потока, обрабатывающего запрос
+# (sys._current_frames), и считает одинаковые стеки. По окончании запроса
+# профиль пишется на диск в формате collapsed stacks ("a;b;c 12") - его
+# понимают flamegraph.pl и speedscope; в speedscope JSON он конвертируется
+# при скачивании. Настройки лежат в файле рядом с профилями, поэтому
+# переключатель действует на все воркеры. Выключенный профилировщик - это
+# одно сравнение времени на запрос.
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+
+DEFAULT_SETTINGS = {'enabled': False, 'sample_rate': 0.1, 'endpoints': []}
+SETTINGS_FILE = 'settings.json'
+PROFILE_SUFFIX = '.folded'
+
+# Куда уходит время: первый (от вершины стека) кадр из этих пакетов
+CATEGORIES = (
+    ('sql', ('sqlalchemy/engine', 'sqlalchemy/pool', 'sqlalchemy/dialects', 'sqlite3')),
+    ('orm', ('sqlalchemy/orm',)),
+    ('templates', ('jinja2', 'templates/')),
+)
+
+
+class StackSampler:
+    """Поток-сэмплер: снимает стеки только зарегистрированных потоков и спит, когда их нет."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._targets = {}  # thread_id -> Counter стеков
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._names = {}  # кэш подписей кадров по объекту кода
+
+    def start(self, thread_id):
+        with self._lock:
+            self._targets[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            if not self._targets:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, counter in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own_id:
+                        counter[self._stack(frame)] += 1
+
+    def _stack(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            name = self._names.get(code)
+            if name is None:
+                name = self._names[code] = f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})'
+            names.append(name)
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+
+def _short_path(filename):
+    for marker in ('site-packages' + os.sep, 'dist-packages' + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return os.path.relpath(filename) if os.path.isabs(filename) else filename
+
+
+class Profiler:
+    def __init__(self, app=None):
+        self.app = None
+        self.directory = None
+        self._sampler = None
+        self._settings = dict(DEFAULT_SETTINGS)
+        self._settings_mtime = None
+        self._next_check = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config.get('PROFILES_DIR') or os.path.join(app.instance_path, 'profiles')
+        self._sampler = StackSampler(app.config.get('PROFILING_SAMPLE_INTERVAL', 0.005))
+        app.extensions['profiler'] = self
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    # --- Настройки (общие для всех воркеров через файл) ---
+
+    def settings(self):
+        # Файл проверяем не чаще раза в 2 секунды: выключенный профилировщик почти ничего не стоит
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + 2
+            try:
+                mtime = os.stat(os.path.join(self.directory, SETTINGS_FILE)).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._settings_mtime:
+                self._settings_mtime = mtime
+                self._settings = self._read_settings()
+        return self._settings
+
+    def _read_settings(self):
+        try:
+            with open(os.path.join(self.directory, SETTINGS_FILE), encoding='utf-8') as f:
+                return dict(DEFAULT_SETTINGS, **json.load(f))
+        except (OSError, ValueError):
+            return dict(DEFAULT_SETTINGS)
+
+    def save_settings(self, enabled, sample_rate, endpoints):
+        os.makedirs(self.directory, exist_ok=True)
+        settings = {'enabled': bool(enabled), 'sample_rate': min(max(float(sample_rate), 0.0), 1.0),
+                    'endpoints': sorted(set(endpoints))}
+        path = os.path.join(self.directory, SETTINGS_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(settings, f)
+        os.replace(path + '.tmp', path)
+        self._next_check = 0.0
+        return settings
+
+    # --- Хуки запроса ---
+
+    def _before_request(self):
+        settings = self.settings()
+        if not settings['enabled'] or request.endpoint is None or request.endpoint == 'static':
+            return
+        if settings['endpoints'] and request.endpoint not in settings['endpoints']:
+            return
+        if random.random() >= settings['sample_rate']:
+            return
+        g._profile_started = time.perf_counter()
+        self._sampler.start(threading.get_ident())
+
+    def _teardown_request(self, exc):
+        started = g.pop('_profile_started', None)
+        if started is None:
+            return
+        samples = self._sampler.stop(threading.get_ident())
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        if samples:
+            try:
+                self._write(request.endpoint, duration_ms, samples)
+            except OSError:
+                self.app.logger.exception('Не удалось сохранить профиль запроса')
+
+    # --- Файлы профилей ---
+
+    def _write(self, endpoint, duration_ms, samples):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        name = f'{endpoint}__{stamp}__{duration_ms}ms__{os.getpid()}{PROFILE_SUFFIX}'
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        self._prune()
+
+    def _prune(self):
+        max_files = self.app.config.get('PROFILING_MAX_FILES', 300)
+        names = self._profile_names()
+        for name in names[max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _profile_names(self):
+        """Имена файлов профилей, новые первыми."""
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(PROFILE_SUFFIX)]
+        except OSError:
+            return []
+        return sorted(names, key=lambda n: n.split('__')[1] if n.count('__') >= 3 else '', reverse=True)
+
+    def path_of(self, name):
+        """Путь к профилю по имени файла или None, если такого профиля нет."""
+        if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def list_profiles(self, limit=100):
+        profiles = []
+        for name in self._profile_names()[:limit]:
+            parts = name[:-len(PROFILE_SUFFIX)].split('__')
+            if len(parts) != 4:
+                continue
+            endpoint, stamp, duration, pid = parts
+            samples = read_folded(os.path.join(self.directory, name))
+            profiles.append({
+                'name': name,
+                'endpoint': endpoint,
+                'created_at': datetime.strptime(stamp, '%Y%m%d-%H%M%S-%f'),
+                'duration_ms': int(duration[:-2]),
+                'pid': pid,
+                'samples': sum(samples.values()),
+                'breakdown': breakdown(samples),
+            })
+        return profiles
+
+    def clear(self):
+        for name in self._profile_names():
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def merged(self, endpoint):
+        """Все профили endpoint-а, сложенные в один (общий flamegraph по выборке запросов)."""
+        total = Counter()
+        for name in self._profile_names():
+            if name.split('__', 1)[0] == endpoint:
+                total.update(read_folded(os.path.join(self.directory, name)))
+        return total
+
+
+def read_folded(path):
+    samples = Counter()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                samples[stack] += int(count)
+    return samples
+
+
+def to_folded(samples):
+    return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+
+
+def breakdown(samples):
+    """Доля сэмплов (в процентах) по категориям: SQL, ORM (гидратация объектов), шаблоны, прочее."""
+    totals = Counter()
+    for stack, count in samples.items():
+        frames = stack.split(';')
+        category = 'other'
+        for frame in reversed(frames):
+            location = frame.rsplit('(', 1)[-1]
+            found = next((cat for cat, markers in CATEGORIES if any(m in location for m in markers)), None)
+            if found:
+                category = found
+                break
+        totals[category] += count
+    total = sum(totals.values()) or 1
+    return {category: round(100 * count / total) for category, count in totals.items()}
+
+
+def to_speedscope(samples, name):
+    """Профиль в формате speedscope (https://www.speedscope.app), тип 'sampled'."""
+    frames, index = [], {}
+    profile_samples, weights = [], []
+    for stack, count in samples.items():
+        ids = []
+        for frame in stack.split(';'):
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({'name': frame})
+            ids.append(index[frame])
+        profile_samples.append(ids)
+        weights.append(count)
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled', 'name': name, 'unit': 'none',
+            'startValue': 0, 'endValue': sum(weights),
+            'samples': profile_samples, 'weights': weights,
+        }],
+        'name': name,
+        'exporter': 'tattoo-fest',
+    }
+
+
+profiler = Profiler()
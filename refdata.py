@@ -0,0 +1,90 @@
+# refdata.py
+# Кэш редко меняющихся справочных данных: критерии, шаблоны номинаций
+# и словарь отображения категорий.
+#
+# Снимок неизменяемый (кортежи, namedtuple, MappingProxyType), поэтому его
+# можно безопасно отдавать в шаблоны и между потоками. Перестраивается, когда
+# в cache_versions меняется версия 'refdata' (после изменения критериев или
+# шаблонов в любом воркере).
+
+from collections import namedtuple
+from types import MappingProxyType
+
+from extensions import db
+from models import Criterion, NominationTemplate
+from models.nomination_template import nomination_template_criteria
+import cache_versions
+
+NAMESPACE = 'refdata'
+
+CATEGORY_MAP = MappingProxyType({
+    'healed': 'Зажившая',
+    'fresh': 'Битва',
+    'both': 'ПЮ',
+    'pro': 'Про',
+    'junior': 'Юниор',
+    'participant': 'Участник',
+    'judge': 'Судья',
+    'admin': 'Администратор'
+})
+
+CriterionInfo = namedtuple('CriterionInfo', 'id name max_score order')
+TemplateInfo = namedtuple('TemplateInfo', 'id name description participant_type criteria')
+
+
+class ReferenceData:
+    """Неизменяемый снимок справочников."""
+
+    __slots__ = ('version', 'criteria', 'criteria_by_id', 'templates', 'templates_by_id')
+
+    def __init__(self, version, criteria, templates):
+        self.version = version
+        self.criteria = criteria  # кортеж CriterionInfo, отсортирован по order
+        self.criteria_by_id = MappingProxyType({c.id: c for c in criteria})
+        self.templates = templates  # кортеж TemplateInfo, отсортирован по имени
+        self.templates_by_id = MappingProxyType({t.id: t for t in templates})
+
+    def template_criteria(self, template_id):
+        """Критерии шаблона номинации, отсортированные по order."""
+        template = self.templates_by_id.get(template_id)
+        return template.criteria if template else ()
+
+
+_cache = cache_versions.VersionedCache(NAMESPACE, maxsize=1)
+
+
+def _load(version):
+    criteria = tuple(
+        CriterionInfo(c.id, c.name, c.max_score, c.order)
+        for c in Criterion.query.order_by(Criterion.order).all()
+    )
+    criteria_by_id = {c.id: c for c in criteria}
+
+    links = {}
+    for template_id, criterion_id in db.session.execute(
+            db.select(nomination_template_criteria.c.nomination_template_id,
+                      nomination_template_criteria.c.criterion_id)):
+        if criterion_id in criteria_by_id:
+            links.setdefault(template_id, []).append(criteria_by_id[criterion_id])
+
+    templates = tuple(
+        TemplateInfo(t.id, t.name, t.description, t.participant_type,
+                     tuple(sorted(links.get(t.id, ()), key=lambda c: c.order)))
+        for t in db.session.query(NominationTemplate.id, NominationTemplate.name,
+                                  NominationTemplate.description, NominationTemplate.participant_type)
+        .order_by(NominationTemplate.name)
+    )
+    return ReferenceData(version, criteria, templates)
+
+
+def get_reference_data():
+    """Актуальный снимок справочников (перестраивается только после изменений в любом воркере)."""
+    return _cache.get('snapshot', lambda: _load(cache_versions.current_version(NAMESPACE)))
+
+
+def invalidate():
+    """
+    Явно помечает справочники измененными. Обычно не нужно: записи через сессию
+    увеличивают версию автоматически (см. cache_versions.py).
+    """
+    cache_versions.bump(NAMESPACE)
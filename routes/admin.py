@@ -1,16 +1,33 @@
 # routes/admin.py
 
 from sqlalchemy import and_
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, abort, current_app, Response, send_file
 from functools import wraps
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta 
+import json
 from extensions import db
-from models import User, Festival, EventDay, NominationTemplate, TimeSlot, JudgeNomination, Participation, Criterion, Score, Winner
+from models import User, Festival, EventDay, NominationTemplate, TimeSlot, JudgeNomination, Participation, Criterion, Score, Winner, Job, FestivalArchive
 from sqlalchemy import func
-from sqlalchemy.orm import joinedload
 from itertools import groupby
 from collections import defaultdict
+import scheduler
+import deletion
+import archive
+import winners
+from jobs import job_runner, job_stats
+import notifications
+import loaders
+import refdata
+import profiling
+from profiling import profiler
+from slow_queries import slow_query_log
+from analytics import analytics
+import score_cube
+import score_events
+import leaderboard
+from timeline import timeline
+from streaming import stream_page
 
 
 
@@ -99,6 +116,8 @@ def edit_user(user_id):
 
         try:
             db.session.commit()
+            # Ник виден на табло зон - в днях, где пользователь участвует или судит
+            timeline.invalidate_dates(timeline.user_dates(user_id))
             flash('Данные пользователя успешно обновлены.', 'success')
         except Exception as e:
             db.session.rollback()
@@ -116,10 +135,11 @@ def delete_user(user_id):
         flash('Вы не можете удалить свою собственную учетную запись.', 'error')
         return redirect(url_for('admin.manage_users'))
 
-    user_to_delete = User.query.get_or_404(user_id)
+    User.query.get_or_404(user_id)
     try:
-        db.session.delete(user_to_delete)
-        db.session.commit()
+        # Удаляем заявки, оценки и назначения пользователя массовыми запросами,
+        # не загружая их в память
+        deletion.purge_user(user_id)
         flash('Пользователь успешно удален.', 'success')
     except IntegrityError:
         db.session.rollback()
@@ -193,7 +213,8 @@ def manage_festivals():
 
     # Логика для GET запроса остается без изменений
     festivals = Festival.query.order_by(Festival.start_date.desc()).all()
-    return render_template('admin/festivals.html', festivals=festivals)
+    return render_template('admin/festivals.html', festivals=festivals,
+                           archivable_ids=archive.archivable_festival_ids())
 
 @admin_bp.route('/festivals/<int:festival_id>', methods=['GET'])
 @admin_required
@@ -204,15 +225,49 @@ def manage_festival_details(festival_id):
     """
     festival = Festival.query.get_or_404(festival_id)
     days = EventDay.query.filter_by(festival_id=festival.id).order_by(EventDay.day_order).all()
+    # Дни, в которые можно скопировать расписание (в том числе других фестивалей)
+    clone_targets = EventDay.query.options(*loaders.DAY_WITH_FESTIVAL).order_by(EventDay.date).all()
     
-    return render_template('admin/festival_details.html', festival=festival, days=days)
+    return render_template('admin/festival_details.html', festival=festival, days=days, clone_targets=clone_targets)
+
+
+@admin_bp.route('/festivals/clone', methods=['POST'])
+@admin_required
+def clone_festival():
+    """
+    Создает новый фестиваль по образцу существующего: те же дни (со сдвигом дат)
+    и та же структура расписания, при желании - с назначениями судей.
+    Работа выполняется фоновой задачей.
+    """
+    source = Festival.query.get_or_404(request.form.get('source_festival_id', type=int))
+    name = request.form.get('name')
+    start_date_str = request.form.get('start_date')
+
+    if not name or not start_date_str:
+        flash('Название и дата начала нового фестиваля обязательны.', 'error')
+        return redirect(url_for('admin.manage_festivals'))
+
+    try:
+        datetime.strptime(start_date_str, '%Y-%m-%d')
+    except ValueError:
+        flash('Неверный формат даты.', 'error')
+        return redirect(url_for('admin.manage_festivals'))
+
+    job = job_runner.submit('clone_festival', {
+        'source_festival_id': source.id,
+        'name': name,
+        'start_date': start_date_str,
+        'with_judges': bool(request.form.get('with_judges')),
+    })
+    flash(f'Создание фестиваля "{name}" по образцу "{source.name}" запущено в фоне (задача #{job.id}).', 'info')
+    return redirect(url_for('admin.manage_jobs'))
 
 
 @admin_bp.route('/festival/<int:festival_id>/edit', methods=['GET', 'POST'])
 @admin_required
 def edit_festival(festival_id):
     # Загружаем фестиваль и его текущие дни
-    festival = Festival.query.options(joinedload(Festival.days)).get_or_404(festival_id)
+    festival = Festival.query.options(*loaders.FESTIVAL_WITH_DAYS).get_or_404(festival_id)
     
     if request.method == 'POST':
         try:
@@ -326,18 +381,16 @@ def manage_nomination_templates():
                 flash(f'Шаблон номинации с названием "{name}" уже существует.', 'error')
         return redirect(url_for('admin.manage_nomination_templates'))
 
-    # Для GET-запроса передаем в шаблон все шаблоны и все критерии
-    templates = NominationTemplate.query.options(joinedload(NominationTemplate.criteria)).order_by(NominationTemplate.name).all()
-    all_criteria = Criterion.query.order_by(Criterion.order).all()
-    return render_template('admin/nominations.html', templates=templates, all_criteria=all_criteria)
+    # Для GET-запроса передаем в шаблон все шаблоны и все критерии (из кэша справочников)
+    reference = refdata.get_reference_data()
+    return render_template('admin/nominations.html', templates=reference.templates, all_criteria=reference.criteria)
 
 
 @admin_bp.route('/nomination_template/<int:template_id>/edit', methods=['GET', 'POST'])
 @admin_required
 def edit_nomination_template(template_id):
-    template = NominationTemplate.query.options(joinedload(NominationTemplate.criteria)).get_or_404(template_id)
-    
     if request.method == 'POST':
+        template = NominationTemplate.query.options(*loaders.TEMPLATE_WITH_CRITERIA).get_or_404(template_id)
         template.name = request.form.get('name')
         template.description = request.form.get('description')
         template.participant_type = request.form.get('participant_type')
@@ -357,8 +410,11 @@ def edit_nomination_template(template_id):
             return redirect(url_for('admin.edit_nomination_template', template_id=template.id))
 
     # Для GET-запроса передаем шаблон и все критерии для формы
-    all_criteria = Criterion.query.order_by(Criterion.order).all()
-    return render_template('admin/edit_nomination.html', template=template, all_criteria=all_criteria)
+    reference = refdata.get_reference_data()
+    template = reference.templates_by_id.get(template_id)
+    if template is None:
+        abort(404)
+    return render_template('admin/edit_nomination.html', template=template, all_criteria=reference.criteria)
 
 @admin_bp.route('/nomination_template/<int:template_id>/delete', methods=['POST'])
 @admin_required
@@ -379,8 +435,8 @@ def delete_nomination_template(template_id):
 def manage_day_schedule(day_id):
     day = EventDay.query.get_or_404(day_id)
     
-    # Для формы нам нужен список всех шаблонов номинаций
-    nomination_templates = NominationTemplate.query.order_by(NominationTemplate.name).all()
+    # Для формы нам нужен список всех шаблонов номинаций (из кэша справочников)
+    nomination_templates = refdata.get_reference_data().templates
 
     if request.method == 'POST':
         try:
@@ -417,6 +473,8 @@ def manage_day_schedule(day_id):
 
             db.session.add(new_slot)
             db.session.commit()
+            # Табло зон «сейчас / далее» перестроит индекс этого дня
+            timeline.invalidate(day.date)
             flash('Слот в расписании успешно создан!', 'success')
 
         except ValueError as e:
@@ -429,9 +487,7 @@ def manage_day_schedule(day_id):
 
     # GET-логика
     time_slots = TimeSlot.query.filter_by(day_id=day.id).options(
-        joinedload(TimeSlot.nomination_template),
-        joinedload(TimeSlot.participants),
-        joinedload(TimeSlot.judge_assignments)
+        *loaders.DAY_SCHEDULE
     ).order_by(TimeSlot.start_time, TimeSlot.slot_order).all()
     
     grouped_slots = []
@@ -439,18 +495,126 @@ def manage_day_schedule(day_id):
         for time, group in groupby(time_slots, key=lambda s: s.start_time.strftime('%H:%M') + ' - ' + s.end_time.strftime('%H:%M')):
             grouped_slots.append((time, list(group)))
     
-    return render_template('admin/day_schedule.html', 
+    return stream_page('admin/day_schedule.html', 
                            day=day, 
                            grouped_slots=grouped_slots,
                            nomination_templates=nomination_templates, # Передаем шаблоны в форму
                            ZONES=ZONES) # Константа ZONES у тебя уже должна быть
 
 
+@admin_bp.route('/day/<int:day_id>/auto_schedule', methods=['GET', 'POST'])
+@admin_required
+def auto_schedule_day(day_id):
+    """
+    Автоматическое составление расписания дня.
+    action=preview - только показать план (dry-run), action=apply - записать его в БД.
+    """
+    day = EventDay.query.get_or_404(day_id)
+    reference = refdata.get_reference_data()
+    nomination_templates = reference.templates
+    form = request.form if request.method == 'POST' else {}
+
+    plan, unplaced, dropped_awards = None, [], []
+    if request.method == 'POST':
+        try:
+            day_start = _minutes_of(request.form.get('day_start', '10:00'))
+            day_end = _minutes_of(request.form.get('day_end', '20:00'))
+            if day_start >= day_end:
+                raise ValueError('Начало дня должно быть раньше его окончания.')
+
+            # Заявки на новые конкурсы: количество по каждому шаблону и категории
+            requests = []
+            for template in nomination_templates:
+                duration = request.form.get(f'duration_{template.id}', type=int) or 60
+                for category in ('fresh', 'healed'):
+                    count = request.form.get(f'count_{template.id}_{category}', type=int) or 0
+                    requests.extend({'nomination_template_id': template.id,
+                                     'category': category,
+                                     'duration': duration} for _ in range(count))
+
+            award_rules = None
+            if request.form.get('with_awards'):
+                award_rules = {
+                    'duration': request.form.get('award_duration', type=int) or 30,
+                    'zone': request.form.get('award_zone') or None,
+                    'gap': request.form.get('award_gap', type=int) or 0,
+                }
+
+            replan = bool(request.form.get('replan'))
+            if not requests and not replan:
+                raise ValueError('Укажите хотя бы один конкурс для планирования.')
+
+            plan, unplaced, dropped_awards = scheduler.plan_day(
+                day, requests, ZONES, day_start, day_end, award_rules=award_rules, replan=replan)
+
+            if request.form.get('action') == 'apply':
+                created, moved = scheduler.apply_plan(day, plan, dropped_awards)
+                db.session.commit()
+                timeline.invalidate(day.date)
+                flash(f'Расписание составлено: создано слотов - {created}, перенесено - {moved}.', 'success')
+                if unplaced:
+                    flash(f'Не поместились в границы дня: {len(unplaced)}. Увеличьте время работы или сократите программу.', 'error')
+                return redirect(url_for('admin.manage_day_schedule', day_id=day.id))
+
+        except ValueError as e:
+            flash(str(e), 'error')
+            plan = None
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Произошла непредвиденная ошибка: {e}', 'error')
+            plan = None
+
+    return render_template('admin/auto_schedule.html',
+                           day=day,
+                           form=form,
+                           nomination_templates=nomination_templates,
+                           templates_by_id=reference.templates_by_id,
+                           plan=plan,
+                           unplaced=unplaced,
+                           dropped_awards=dropped_awards,
+                           to_time=lambda minutes: f'{minutes // 60:02d}:{minutes % 60:02d}',
+                           ZONES=ZONES)
+
+
+@admin_bp.route('/day/<int:day_id>/clone', methods=['POST'])
+@admin_required
+def clone_day_schedule(day_id):
+    """Копирует структуру расписания дня в другой день (со сдвигом времени)."""
+    source_day = EventDay.query.get_or_404(day_id)
+    target_day = EventDay.query.get(request.form.get('target_day_id', type=int) or 0)
+
+    if not target_day or target_day.id == source_day.id:
+        flash('Выберите другой день, в который нужно скопировать расписание.', 'error')
+        return redirect(url_for('admin.manage_festival_details', festival_id=source_day.festival_id))
+
+    try:
+        slots_count, judges_count = scheduler.clone_days(
+            [(source_day, target_day)], with_judges=bool(request.form.get('with_judges')))
+        db.session.commit()
+        timeline.invalidate(target_day.date)
+        flash(f'Скопировано слотов: {slots_count}, назначений судей: {judges_count}.', 'success')
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'error')
+        return redirect(url_for('admin.manage_festival_details', festival_id=source_day.festival_id))
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Произошла ошибка при копировании расписания: {e}', 'error')
+        return redirect(url_for('admin.manage_festival_details', festival_id=source_day.festival_id))
+
+    return redirect(url_for('admin.manage_day_schedule', day_id=target_day.id))
+
+
+def _minutes_of(hhmm):
+    t = datetime.strptime(hhmm, '%H:%M')
+    return t.hour * 60 + t.minute
+
+
 @admin_bp.route('/slot/<int:slot_id>/edit', methods=['GET', 'POST'])
 @admin_required
 def edit_slot(slot_id):
     # Загружаем слот и связанные данные дня
-    slot = TimeSlot.query.options(joinedload(TimeSlot.day)).get_or_404(slot_id)
+    slot = TimeSlot.query.options(*loaders.SLOT_WITH_DAY).get_or_404(slot_id)
 
     if request.method == 'POST':
         try:
@@ -492,6 +656,7 @@ def edit_slot(slot_id):
                 slot.award_title = None
 
             db.session.commit()
+            timeline.invalidate_slot(slot.id)
             flash('Слот успешно обновлен!', 'success')
             return redirect(url_for('admin.manage_day_schedule', day_id=slot.day_id))
 
@@ -506,7 +671,7 @@ def edit_slot(slot_id):
 
     # --- Логика для GET-запроса ---
     # Для формы нам нужен список всех шаблонов номинаций и зон
-    nomination_templates = NominationTemplate.query.order_by(NominationTemplate.name).all()
+    nomination_templates = refdata.get_reference_data().templates
     
     return render_template(
         'admin/edit_slot.html', 
@@ -521,9 +686,13 @@ def edit_slot(slot_id):
 def delete_slot(slot_id):
     slot_to_delete = TimeSlot.query.get_or_404(slot_id)
     day_id = slot_to_delete.day_id
-    db.session.delete(slot_to_delete)
-    db.session.commit()
-    flash('Слот успешно удален.', 'success')
+    try:
+        deletion.purge_slot(slot_id)
+        timeline.invalidate_day(day_id)
+        flash('Слот успешно удален.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Произошла ошибка при удалении слота: {e}', 'error')
     return redirect(url_for('admin.manage_day_schedule', day_id=day_id))
 
 # routes/admin.py
@@ -532,11 +701,7 @@ def delete_slot(slot_id):
 @admin_required
 def manage_slot_participants(slot_id):
     # Загружаем слот-конкурс и связанные с ним данные для отображения
-    contest_slot = TimeSlot.query.options(
-        joinedload(TimeSlot.nomination_template),
-        joinedload(TimeSlot.participants).joinedload(Participation.user),
-        joinedload(TimeSlot.day)
-    ).get_or_404(slot_id)
+    contest_slot = TimeSlot.query.options(*loaders.CONTEST_WITH_PARTICIPANTS).get_or_404(slot_id)
 
     # Убеждаемся, что это действительно слот-конкурс
     if contest_slot.type != 'judging':
@@ -563,6 +728,7 @@ def manage_slot_participants(slot_id):
                 )
                 db.session.add(new_participation)
                 db.session.commit()
+                timeline.invalidate_slot(slot_id)
                 
                 user_code = User.query.get(user_id).code
                 flash(f'Заявка #{new_entry_number} от участника {user_code} успешно добавлена.', 'success')
@@ -594,11 +760,7 @@ def manage_slot_participants(slot_id):
 @admin_required
 def manage_slot_judges(slot_id):
     # Загружаем слот-конкурс и связанные с ним данные
-    contest_slot = TimeSlot.query.options(
-        joinedload(TimeSlot.nomination_template),
-        joinedload(TimeSlot.judge_assignments).joinedload(JudgeNomination.judge),
-        joinedload(TimeSlot.day)
-    ).get_or_404(slot_id)
+    contest_slot = TimeSlot.query.options(*loaders.CONTEST_WITH_JUDGES).get_or_404(slot_id)
 
     # Проверка, что это слот-конкурс
     if contest_slot.type != 'judging':
@@ -617,6 +779,7 @@ def manage_slot_judges(slot_id):
             db.session.add(new_assignment)
             try:
                 db.session.commit()
+                timeline.invalidate_slot(slot_id)
                 flash('Судья успешно назначен на конкурс.', 'success')
             except IntegrityError:
                 db.session.rollback()
@@ -640,17 +803,57 @@ def manage_slot_judges(slot_id):
 @admin_required
 def delete_festival(festival_id):
     festival_to_delete = Festival.query.get_or_404(festival_id)
+    # Удаляем все связанные дни, слоты, заявки и оценки фоновой задачей
+    # пачками снизу вверх (см. deletion.py), чтобы не блокировать воркер
+    job = job_runner.submit('purge_festival', {'festival_id': festival_to_delete.id,
+                                               'festival_name': festival_to_delete.name})
+    flash(f'Удаление фестиваля "{festival_to_delete.name}" запущено в фоне (задача #{job.id}).', 'info')
+    return redirect(url_for('admin.manage_jobs'))
+
+
+# --- Холодный архив завершенных фестивалей ---
+@admin_bp.route('/festival/<int:festival_id>/archive', methods=['POST'])
+@admin_required
+def archive_festival(festival_id):
+    festival = Festival.query.get_or_404(festival_id)
+    if festival.id not in archive.archivable_festival_ids():
+        flash(f'Фестиваль "{festival.name}" можно архивировать, только когда все его конкурсы и награждения завершены.', 'error')
+        return redirect(url_for('admin.manage_festivals'))
+    # Выгрузка в файл и удаление из рабочих таблиц пачками - фоновой задачей (см. archive.py)
+    job = job_runner.submit('archive_festival', {'festival_id': festival.id, 'festival_name': festival.name})
+    flash(f'Архивация фестиваля "{festival.name}" запущена в фоне (задача #{job.id}).', 'info')
+    return redirect(url_for('admin.manage_jobs'))
+
+
+@admin_bp.route('/archives')
+@admin_required
+def manage_archives():
+    archives = FestivalArchive.query.order_by(FestivalArchive.start_date.desc()).all()
+    row_counts = {a.id: sum(json.loads(a.row_counts).values()) for a in archives}
+    return render_template('admin/archives.html', archives=archives, row_counts=row_counts)
+
+
+@admin_bp.route('/archives/<int:archive_id>')
+@admin_required
+def view_archive(archive_id):
+    """Итоги архивного фестиваля - только чтение, прямо из файла архива."""
+    record = FestivalArchive.query.get_or_404(archive_id)
     try:
-        # Благодаря 'cascade' в моделях, все связанные дни, слоты, номинации и т.д.
-        # будут удалены автоматически вместе с фестивалем.
-        db.session.delete(festival_to_delete)
-        db.session.commit()
-        flash(f'Фестиваль "{festival_to_delete.name}" и все связанные с ним данные были успешно удалены.', 'success')
-    except Exception as e:
-        db.session.rollback()
-        flash(f'Произошла ошибка при удалении фестиваля: {e}', 'error')
-        
-    return redirect(url_for('admin.manage_festivals'))
+        document = archive.load(record)
+    except archive.ArchiveError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('admin.manage_archives'))
+    return render_template('admin/archive_results.html', record=record, document=document)
+
+
+@admin_bp.route('/archives/<int:archive_id>/download')
+@admin_required
+def download_archive(archive_id):
+    record = FestivalArchive.query.get_or_404(archive_id)
+    path = archive.archive_path(record)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype='application/gzip', as_attachment=True, download_name=record.file_name)
 
 # routes/admin.py
 
@@ -661,8 +864,14 @@ def delete_participation(participation_id):
     # Запоминаем ID слота, чтобы вернуться на нужную страницу
     slot_id = participation_to_delete.time_slot_id
     try:
+        # Оценки заявки удалит БД каскадом, мимо ORM: записываем их удаление в журнал оценок
+        score_events.log_deleted(Score.participation_id == participation_id)
         db.session.delete(participation_to_delete)
+        db.session.flush()
+        # ... и пересчитываем куб аналитики по конкурсу
+        score_cube.rebuild_contests([slot_id])
         db.session.commit()
+        timeline.invalidate_slot(slot_id)
         flash('Заявка участника успешно удалена.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -680,6 +889,7 @@ def delete_judge_assignment(assignment_id):
     try:
         db.session.delete(assignment_to_delete)
         db.session.commit()
+        timeline.invalidate_slot(slot_id)
         flash('Судья успешно снят с конкурса.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -691,10 +901,7 @@ def delete_judge_assignment(assignment_id):
 @admin_required
 def admin_results_view():
     contests = TimeSlot.query.filter_by(type='judging').options(
-        joinedload(TimeSlot.nomination_template).joinedload(NominationTemplate.criteria),
-        joinedload(TimeSlot.day),
-        joinedload(TimeSlot.participants).joinedload(Participation.user),
-        joinedload(TimeSlot.judge_assignments).joinedload(JudgeNomination.judge)
+        *loaders.CONTEST_RESULTS
     ).order_by(TimeSlot.day_id, TimeSlot.start_time).all()
     
     # Оптимизация: загружаем оценки только для участников текущих конкурсов
@@ -707,9 +914,10 @@ def admin_results_view():
     # Создаем удобную структуру для поиска: {participation_id: place}
     winner_map = {w.participation_id: w.place for w in confirmed_winners}
 
-    results_data = []
-    for contest in contests:
-        contest_criteria = sorted(contest.nomination_template.criteria, key=lambda c: c.order)
+    reference = refdata.get_reference_data()
+
+    def contest_results(contest):
+        contest_criteria = reference.template_criteria(contest.nomination_template_id)
         
         pro_participants = []
         junior_participants = []
@@ -749,19 +957,26 @@ def admin_results_view():
         pro_participants.sort(key=lambda x: x['final_score'], reverse=True)
         junior_participants.sort(key=lambda x: x['final_score'], reverse=True)
         
-        results_data.append({
+        return {
             'contest': contest,
             # --- ИЗМЕНЕНИЕ: передаем данные раздельно ---
             'pro_participants_data': pro_participants,
             'junior_participants_data': junior_participants,
             'criteria_list': contest_criteria
-        })
-        
-    results_by_day = defaultdict(list)
-    for result in results_data:
-        results_by_day[result['contest'].day].append(result)
+        }
 
-    return render_template(
+    contests_by_day = defaultdict(list)
+    for contest in contests:
+        contests_by_day[contest.day].append(contest)
+
+    # Страница отдается потоком: итоги конкурса считаются в момент, когда шаблон
+    # до него дошел, и первые дни уже видны в браузере, пока считаются остальные
+    results_by_day = [
+        (day, (contest_results(contest) for contest in day_contests))
+        for day, day_contests in sorted(contests_by_day.items(), key=lambda item: item[0].date)
+    ]
+
+    return stream_page(
         'admin/results.html',
         results_by_day=results_by_day
     )
@@ -792,7 +1007,7 @@ def manage_criteria():
                 flash('Критерий с таким названием уже существует.', 'error')
         return redirect(url_for('admin.manage_criteria'))
 
-    criteria = Criterion.query.order_by(Criterion.order).all()
+    criteria = refdata.get_reference_data().criteria
     return render_template('admin/criteria.html', criteria=criteria)
 
 @admin_bp.route('/criterion/<int:criterion_id>/edit', methods=['GET', 'POST'])
@@ -876,6 +1091,12 @@ def assign_winners():
                     place=place
                 )
                 db.session.add(new_winner)
+
+            # Сообщение победителю уйдет после награждения (outbox, та же транзакция)
+            db.session.flush()
+            notifications.enqueue_award_results(contest_id, experience_category)
+            # Старых победителей удалил массовый DELETE - табло конкурса пересоберется при коммите
+            leaderboard.mark_contests([contest_id])
         
         db.session.commit()
         flash(f'Победитель для категории "{experience_category.capitalize()}" успешно назначен!', 'success')
@@ -887,4 +1108,152 @@ def assign_winners():
         db.session.rollback()
         flash(f'Произошла непредвиденная ошибка при назначении победителей: {e}', 'error')
 
-    return redirect(url_for('admin.admin_results_view'))
\ No newline at end of file
+    return redirect(url_for('admin.admin_results_view'))
+
+
+@admin_bp.route('/day/<int:day_id>/finalize', methods=['GET', 'POST'])
+@admin_required
+def finalize_day(day_id):
+    """Итоги дня: места 1-3 во всех завершенных конкурсах дня с предпросмотром изменений."""
+    day = EventDay.query.get_or_404(day_id)
+    plan, names, scores = winners.plan_day(day_id)
+    fingerprint = winners.plan_fingerprint(plan)
+
+    if request.method == 'POST':
+        if request.form.get('fingerprint') != fingerprint:
+            flash('Оценки или победители изменились после предпросмотра. Проверьте изменения еще раз.', 'error')
+            return redirect(url_for('admin.finalize_day', day_id=day_id))
+        try:
+            updated = winners.apply_plan(plan)
+            db.session.commit()
+            flash(f'Итоги дня подведены: обновлено категорий - {updated}.', 'success')
+        except IntegrityError as e:
+            db.session.rollback()
+            flash(f'Ошибка целостности данных. {e}', 'error')
+        return redirect(url_for('admin.admin_results_view'))
+
+    return render_template('admin/finalize_day.html', day=day, plan=plan, names=names,
+                           scores=scores, fingerprint=fingerprint)
+
+
+# --- Фоновые задачи ---
+@admin_bp.route('/jobs')
+@admin_required
+def manage_jobs():
+    jobs = Job.query.order_by(Job.id.desc()).limit(100).all()
+    return render_template('admin/jobs.html', jobs=jobs, stats=job_stats(),
+                           outbox=notifications.outbox_stats())
+
+
+@admin_bp.route('/jobs/<int:job_id>')
+@admin_required
+def job_status(job_id):
+    """Состояние задачи в JSON - для опроса со страницы."""
+    job = Job.query.get_or_404(job_id)
+    return jsonify({
+        'id': job.id,
+        'type': job.type,
+        'status': job.status,
+        'attempts': job.attempts,
+        'progress': job.progress,
+        'error': job.error,
+        'wait_ms': job.wait_ms,
+        'duration_ms': job.duration_ms,
+    })
+
+
+@admin_bp.route('/jobs/<int:job_id>/retry', methods=['POST'])
+@admin_required
+def retry_job(job_id):
+    job = Job.query.get_or_404(job_id)
+    if job.status != 'failed':
+        flash('Повторить можно только завершившуюся с ошибкой задачу.', 'error')
+    else:
+        job_runner.retry(job)
+        flash(f'Задача #{job.id} снова поставлена в очередь.', 'success')
+    return redirect(url_for('admin.manage_jobs'))
+
+
+# --- Профилирование запросов ---
+@admin_bp.route('/profiling', methods=['GET', 'POST'])
+@admin_required
+def manage_profiling():
+    if request.method == 'POST':
+        try:
+            sample_rate = float(request.form.get('sample_rate', '0').replace(',', '.')) / 100
+        except ValueError:
+            flash('Доля запросов должна быть числом от 0 до 100.', 'error')
+            return redirect(url_for('admin.manage_profiling'))
+        settings = profiler.save_settings(enabled=request.form.get('enabled') == 'on',
+                                          sample_rate=sample_rate,
+                                          endpoints=request.form.getlist('endpoints'))
+        flash('Профилирование включено.' if settings['enabled'] else 'Профилирование выключено.', 'success')
+        return redirect(url_for('admin.manage_profiling'))
+
+    endpoints = sorted(rule.endpoint for rule in current_app.url_map.iter_rules() if rule.endpoint != 'static')
+    return render_template('admin/profiling.html', settings=profiler.settings(),
+                           endpoints=sorted(set(endpoints)), profiles=profiler.list_profiles())
+
+
+@admin_bp.route('/profiling/download/<name>')
+@admin_required
+def download_profile(name):
+    path = profiler.path_of(name)
+    if path is None:
+        abort(404)
+    if request.args.get('format') == 'speedscope':
+        data = profiling.to_speedscope(profiling.read_folded(path), name)
+        return Response(json.dumps(data), mimetype='application/json', headers={
+            'Content-Disposition': f'attachment; filename={name[:-len(profiling.PROFILE_SUFFIX)]}.speedscope.json'})
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=name)
+
+
+@admin_bp.route('/profiling/endpoint/<endpoint_name>')
+@admin_required
+def download_endpoint_profile(endpoint_name):
+    """Все профили endpoint-а одним файлом."""
+    samples = profiler.merged(endpoint_name)
+    if not samples:
+        abort(404)
+    if request.args.get('format') == 'speedscope':
+        return Response(json.dumps(profiling.to_speedscope(samples, endpoint_name)), mimetype='application/json',
+                        headers={'Content-Disposition': f'attachment; filename={endpoint_name}.speedscope.json'})
+    return Response(profiling.to_folded(samples), mimetype='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename={endpoint_name}.folded'})
+
+
+@admin_bp.route('/profiling/clear', methods=['POST'])
+@admin_required
+def clear_profiles():
+    profiler.clear()
+    flash('Профили удалены.', 'success')
+    return redirect(url_for('admin.manage_profiling'))
+
+
+# --- Медленные SQL-запросы ---
+@admin_bp.route('/slow-queries')
+@admin_required
+def slow_queries():
+    entries = slow_query_log.recent()
+    return render_template('admin/slow_queries.html',
+                           enabled=slow_query_log.threshold is not None,
+                           threshold_ms=current_app.config.get('SLOW_QUERY_THRESHOLD_MS'),
+                           groups=slow_query_log.summary(entries),
+                           latest=list(reversed(entries[-50:])))
+
+
+@admin_bp.route('/slow-queries/clear', methods=['POST'])
+@admin_required
+def clear_slow_queries():
+    slow_query_log.clear()
+    flash('Журнал медленных запросов очищен.', 'success')
+    return redirect(url_for('admin.slow_queries'))
+
+
+# --- Аналитика (Dash) ---
+@admin_bp.route('/analytics/', defaults={'path': ''}, methods=['GET', 'POST'])
+@admin_bp.route('/analytics/<path:path>', methods=['GET', 'POST'])
+@admin_required
+def analytics_app(path):
+    # Страница, скрипты и callback-и Dash; само приложение создается при первом запросе
+    return analytics.dispatch(request.environ)
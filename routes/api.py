@@ -0,0 +1,251 @@
+# routes/api.py
+# JSON API для Telegram WebApp.
+#
+# Пользователь определяется по подписанной initData (заголовок
+# X-Telegram-Init-Data или Authorization: tma <initData>) и User.telegram_id.
+# Ответы компактные, с ETag (на основе версий кэшей - 304 отдается без запросов
+# к данным) и gzip для клиентов, которые его принимают.
+
+import gzip
+import hashlib
+import json
+from datetime import datetime
+from functools import wraps
+
+from flask import Blueprint, render_template, request, current_app, g, jsonify, make_response
+from sqlalchemy import func
+
+from extensions import db
+from models import User, TimeSlot, Score, JudgeNomination
+from logic import personal_schedule_slot_ids, participant_score_cards
+from telegram_auth import verify_init_data
+import cache_versions
+import loaders
+import metrics
+import refdata
+
+api_bp = Blueprint('api', __name__)
+
+# Ответы меньше этого размера не сжимаем: выигрыш меньше накладных расходов
+GZIP_MIN_SIZE = 512
+
+
+def telegram_user_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        init_data = request.headers.get('X-Telegram-Init-Data')
+        if not init_data:
+            auth = request.headers.get('Authorization', '')
+            if auth.startswith('tma '):
+                init_data = auth[4:]
+
+        tg_user = verify_init_data(init_data,
+                                   current_app.config.get('TELEGRAM_BOT_TOKEN'),
+                                   current_app.config.get('TELEGRAM_INIT_DATA_MAX_AGE'))
+        if tg_user is None:
+            return jsonify(error='unauthorized'), 401
+
+        user = User.query.filter_by(telegram_id=str(tg_user['id'])).first()
+        if user is None:
+            return jsonify(error='unknown_user'), 403
+
+        g.api_user = user
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def _json_response(etag_parts, build):
+    """
+    Отдает JSON с ETag. Если клиент прислал тот же ETag - сразу 304, build() не вызывается.
+    ETag слабый: сжатое и несжатое представления эквивалентны.
+    """
+    etag = hashlib.sha1(repr(etag_parts).encode()).hexdigest()[:20]
+    if request.if_none_match.contains_weak(etag):
+        metrics.CACHE_HITS.inc(('api_etag',))
+        response = make_response('', 304)
+    else:
+        metrics.CACHE_MISSES.inc(('api_etag',))
+        body = json.dumps(build(), ensure_ascii=False, separators=(',', ':'), default=str).encode()
+        response = make_response(body)
+        response.mimetype = 'application/json'
+        if len(body) >= GZIP_MIN_SIZE and 'gzip' in request.accept_encodings:
+            response.set_data(gzip.compress(body, compresslevel=6))
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag, weak=True)
+    response.headers['Vary'] = 'Accept-Encoding, X-Telegram-Init-Data, Authorization'
+    # Клиент может хранить ответ, но обязан перепроверять его по ETag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _slot_json(slot):
+    data = {
+        'id': slot.id,
+        'type': slot.type,
+        'day': slot.start_time.strftime('%Y-%m-%d'),
+        'start': slot.start_time.strftime('%H:%M'),
+        'end': slot.end_time.strftime('%H:%M'),
+    }
+    if slot.zone:
+        data['zone'] = slot.zone
+    if slot.category:
+        data['cat'] = slot.category
+    if slot.type == 'judging':
+        data['title'] = slot.nomination_template.name
+        data['status'] = slot.status
+    elif slot.type == 'event':
+        data['title'] = slot.event_title
+    return data
+
+
+@api_bp.route('/webapp')
+def webapp():
+    return render_template('webapp.html')
+
+
+@api_bp.route('/api/me')
+@telegram_user_required
+def api_me():
+    user = g.api_user
+    return _json_response(('me', user.id, cache_versions.current_version('schedule')), lambda: {
+        'id': user.id,
+        'role': user.role,
+        'nick': user.nickname or user.code,
+        'cat': user.experience_category,
+    })
+
+
+@api_bp.route('/api/schedule')
+@telegram_user_required
+def api_schedule():
+    """Личное расписание: те же слоты, что на dashboard (конкурсы пользователя и их награждения)."""
+    user = g.api_user
+
+    def build():
+        contest_ids, slot_ids = personal_schedule_slot_ids(user)
+        query = TimeSlot.query.options(*loaders.SLOT_SUMMARY)
+        if slot_ids is not None:
+            if not slot_ids:
+                return {'slots': []}
+            query = query.filter(TimeSlot.id.in_(slot_ids))
+        slots = []
+        for slot in query.order_by(TimeSlot.start_time).all():
+            data = _slot_json(slot)
+            if contest_ids and slot.id in contest_ids:
+                data['mine'] = True
+            slots.append(data)
+        return {'slots': slots}
+
+    return _json_response(('schedule', user.id, cache_versions.current_version('schedule')), build)
+
+
+@api_bp.route('/api/judge/contests')
+@telegram_user_required
+def api_judge_contests():
+    """Конкурсы судьи с прогрессом оценивания: сколько участников он уже оценил полностью."""
+    user = g.api_user
+    if user.role != 'judge':
+        return jsonify(error='forbidden'), 403
+
+    def build():
+        reference = refdata.get_reference_data()
+        contests = TimeSlot.query.join(
+            JudgeNomination, JudgeNomination.time_slot_id == TimeSlot.id
+        ).filter(JudgeNomination.judge_id == user.id).options(
+            *loaders.JUDGE_CONTESTS
+        ).order_by(TimeSlot.start_time).all()
+
+        # Сколько оценок судья выставил каждой заявке - одним агрегирующим запросом
+        participation_ids = [p.id for c in contests for p in c.participants]
+        scored = dict(db.session.query(Score.participation_id, func.count(Score.id)).filter(
+            Score.judge_id == user.id, Score.participation_id.in_(participation_ids)
+        ).group_by(Score.participation_id).all()) if participation_ids else {}
+
+        pending, judged = [], []
+        for contest in contests:
+            criteria_count = len(reference.template_criteria(contest.nomination_template_id))
+            done = sum(1 for p in contest.participants
+                       if criteria_count and scored.get(p.id, 0) >= criteria_count)
+            data = dict(_slot_json(contest), n=len(contest.participants), done=done)
+            if contest.participants and criteria_count and done == len(contest.participants):
+                judged.append(data)
+            else:
+                pending.append(data)
+        return {'pending': pending, 'judged': judged}
+
+    return _json_response(('judge_contests', user.id,
+                           cache_versions.current_version('schedule'),
+                           cache_versions.current_version('results')), build)
+
+
+@api_bp.route('/api/judge/contests/<int:contest_id>')
+@telegram_user_required
+def api_judge_sheet(contest_id):
+    """Лист оценок судьи по конкурсу: критерии и его оценки по каждой заявке."""
+    user = g.api_user
+    is_assigned = db.session.query(JudgeNomination.id).filter_by(
+        judge_id=user.id, time_slot_id=contest_id).first()
+    if not is_assigned:
+        return jsonify(error='forbidden'), 403
+
+    status = db.session.query(TimeSlot.status).filter_by(id=contest_id).scalar()
+    is_open = status not in (None, 'pending')
+
+    def build():
+        contest = TimeSlot.query.options(*loaders.CONTEST_WITH_PARTICIPANTS).get(contest_id)
+        criteria = refdata.get_reference_data().template_criteria(contest.nomination_template_id)
+        participations = sorted(contest.participants, key=lambda p: (p.entry_number, p.user.code))
+
+        scores = {}
+        for s in db.session.query(Score.participation_id, Score.criterion_id, Score.score).filter(
+                Score.judge_id == user.id,
+                Score.participation_id.in_([p.id for p in participations])):
+            scores.setdefault(s.participation_id, {})[s.criterion_id] = s.score
+
+        return dict(_slot_json(contest), open=is_open,
+                    criteria=[[c.id, c.name, c.max_score] for c in criteria],
+                    rows=[{'p': p.id,
+                           'name': p.user.nickname or p.user.code,
+                           'n': p.entry_number,
+                           'cat': p.user.experience_category,
+                           's': scores.get(p.id, {})} for p in participations])
+
+    return _json_response(('judge_sheet', user.id, contest_id,
+                           cache_versions.current_version('schedule'),
+                           cache_versions.current_version('results')), build)
+
+
+@api_bp.route('/api/scores')
+@telegram_user_required
+def api_scores():
+    """Карточки оценок участника (то же, что страница «Мои оценки»)."""
+    user = g.api_user
+    if user.role != 'participant':
+        return jsonify(error='forbidden'), 403
+
+    # Место показывается только после награждения, поэтому ETag зависит и от того,
+    # сколько награждений уже прошло
+    awards_passed = db.session.query(func.count(TimeSlot.id)).filter(
+        TimeSlot.type == 'award', TimeSlot.end_time < datetime.now()).scalar()
+
+    def build():
+        cards = []
+        for r in participant_score_cards(user):
+            card = {
+                'id': r['participation_id'],
+                'title': r['nomination'],
+                'cat': r['category'],
+                'day': r['date'].strftime('%Y-%m-%d'),
+                'start': r['start_time'].strftime('%H:%M'),
+                'avg': r['overall_avg'],
+                'judges': [{'name': j['judge'].nickname or j['judge'].code,
+                            'avg': j['avg'],
+                            's': j['criteria']} for j in r['judge_scores'].values()],
+            }
+            if r['is_winner']:
+                card['place'] = r['winner_place']
+            cards.append(card)
+        return {'cards': cards}
+
+    return _json_response(('scores', user.id, awards_passed,
+                           cache_versions.current_version('results')), build)
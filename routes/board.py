@@ -0,0 +1,107 @@
+# routes/board.py
+# Публичные табло зон (без входа в систему): страницы для больших экранов и
+# телефонов зрителей и их JSON.
+#
+# Итоги (/board/<зона>) - только готовые снимки (leaderboard.py), никаких
+# расчетов результатов в запросе. Ответ JSON кэшируется в процессе на
+# LEADERBOARD_CACHE_SECONDS и отдается с коротким Cache-Control и ETag: сотни
+# телефонов, опрашивающих табло раз в несколько секунд, получают 304 из памяти.
+#
+# «Сейчас / далее» (/board/<зона>/now) - индекс расписания дня в памяти
+# (timeline.py): экраны опрашивают его раз в секунду без обращений к БД.
+
+import hashlib
+import json
+import threading
+import time
+
+from flask import Blueprint, render_template, request, current_app, make_response, abort
+
+import leaderboard
+import metrics
+from routes.admin import ZONES
+from timeline import timeline
+
+board_bp = Blueprint('board', __name__)
+
+ZONE_MAX_LENGTH = 10  # как TimeSlot.zone
+
+# zone -> (когда устареет, ETag, тело ответа)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _board(zone):
+    ttl = current_app.config.get('LEADERBOARD_CACHE_SECONDS', 2)
+    now = time.monotonic()
+    cached = _cache.get(zone)
+    if cached and cached[0] > now:
+        return cached[1], cached[2]
+
+    current, awarded = leaderboard.zone_index(zone)
+    etag = hashlib.sha1(repr((zone, current, awarded)).encode()).hexdigest()[:20]
+    if cached and cached[1] == etag:
+        # Снимки не менялись - тело из памяти, только продлеваем срок
+        body = cached[2]
+    else:
+        body = json.dumps(leaderboard.zone_board(zone, current, awarded),
+                          ensure_ascii=False, separators=(',', ':')).encode()
+    if current or awarded:
+        # Несуществующие зоны не кэшируем, чтобы произвольные адреса не раздували словарь
+        with _cache_lock:
+            _cache[zone] = (now + ttl, etag, body)
+    return etag, body
+
+
+@board_bp.route('/board/<zone>')
+def zone_board_page(zone):
+    if len(zone) > ZONE_MAX_LENGTH:
+        abort(404)
+    response = make_response(render_template('board.html', zone=zone))
+    # Страница - только оболочка, данные она подтягивает сама
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
+
+
+@board_bp.route('/board/<zone>/data')
+def zone_board_data(zone):
+    if len(zone) > ZONE_MAX_LENGTH:
+        abort(404)
+    etag, body = _board(zone)
+    # ETag слабый: сжатое и несжатое представления эквивалентны
+    if request.if_none_match.contains_weak(etag):
+        metrics.CACHE_HITS.inc(('board_etag',))
+        response = make_response('', 304)
+    else:
+        metrics.CACHE_MISSES.inc(('board_etag',))
+        response = make_response(body)
+        response.mimetype = 'application/json'
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config.get('LEADERBOARD_MAX_AGE', 3)}"
+    return response
+
+
+@board_bp.route('/board/<zone>/now')
+def zone_now_page(zone):
+    if zone not in ZONES:
+        abort(404)
+    response = make_response(render_template('zone_now.html', zone=zone))
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
+
+
+@board_bp.route('/board/<zone>/now/data')
+def zone_now_data(zone):
+    if zone not in ZONES:
+        abort(404)
+    stamp, current, upcoming = timeline.now_next(zone)
+    etag = hashlib.sha1(repr((zone, stamp, current and current['id'], upcoming and upcoming['id'])).encode()).hexdigest()[:20]
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(json.dumps({'zone': zone, 'current': current, 'next': upcoming},
+                                            ensure_ascii=False, separators=(',', ':')))
+        response.mimetype = 'application/json'
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'public, max-age=1'
+    return response
@@ -1,10 +1,13 @@
 from functools import wraps
 from datetime import datetime
-from flask import Blueprint, render_template, session, redirect, url_for, flash, request
-from sqlalchemy.orm import joinedload
+from flask import Blueprint, render_template, session, redirect, url_for, flash, request, make_response, abort, jsonify, current_app, send_from_directory
 from models import User, Participation, Score, TimeSlot, Criterion, JudgeNomination, NominationTemplate
 from extensions import db
-from sqlalchemy import or_, and_
+import loaders
+import refdata
+from logic import relevant_award_slot_ids, participant_score_cards, update_contest_status
+import calendar_feed
+import score_sync
 from collections import defaultdict
 
 
@@ -39,35 +42,19 @@ def dashboard():
 
     if user.role == 'participant':
         participations = Participation.query.filter_by(user_id=user.id).options(
-            joinedload(Participation.contest_slot).joinedload(TimeSlot.nomination_template),
-            joinedload(Participation.contest_slot).joinedload(TimeSlot.day)
+            *loaders.PARTICIPATION_WITH_CONTEST
         ).all()
         participant_participations = participations
         highlight_slot_ids = {p.contest_slot.id for p in participations}
 
-        # --- НОВАЯ ЛОГИКА: Выбираем релевантные награждения ---
-        relevant_award_conditions = []
-        for p in participations:
-            # Ищем награждение того же дня и той же категории
-            condition = and_(
-                TimeSlot.day_id == p.contest_slot.day_id,
-                TimeSlot.category == p.contest_slot.category,
-                TimeSlot.type == 'award'
-            )
-            relevant_award_conditions.append(condition)
-        
-        # Собираем ID всех нужных слотов: конкурсы + награждения
-        all_relevant_slot_ids = highlight_slot_ids.copy()
-        if relevant_award_conditions:
-            relevant_awards = TimeSlot.query.filter(or_(*relevant_award_conditions)).all()
-            for award in relevant_awards:
-                all_relevant_slot_ids.add(award.id)
+        # Собираем ID всех нужных слотов: конкурсы + награждения того же дня и категории
+        all_relevant_slot_ids = highlight_slot_ids | relevant_award_slot_ids(
+            [p.contest_slot for p in participations])
         
         # Загружаем только нужные слоты для расписания
         if all_relevant_slot_ids:
             schedule_items = TimeSlot.query.filter(TimeSlot.id.in_(all_relevant_slot_ids)).options(
-                joinedload(TimeSlot.day),
-                joinedload(TimeSlot.nomination_template)
+                *loaders.SLOT_SUMMARY
             ).order_by(TimeSlot.start_time).all()
 
     elif user.role == 'judge':
@@ -78,30 +65,15 @@ def dashboard():
             all_assigned_contests = TimeSlot.query.filter(
                 TimeSlot.id.in_(assigned_slot_ids)
             ).options(
-                joinedload(TimeSlot.participants),
-                joinedload(TimeSlot.nomination_template).joinedload(NominationTemplate.criteria)
+                *loaders.JUDGE_CONTESTS
             ).order_by(TimeSlot.start_time).all()
 
-            # --- НОВАЯ ЛОГИКА: Выбираем релевантные награждения для судьи ---
-            relevant_award_conditions = []
-            for contest in all_assigned_contests:
-                condition = and_(
-                    TimeSlot.day_id == contest.day_id,
-                    TimeSlot.category == contest.category,
-                    TimeSlot.type == 'award'
-                )
-                relevant_award_conditions.append(condition)
-            
-            all_relevant_slot_ids = highlight_slot_ids.copy()
-            if relevant_award_conditions:
-                relevant_awards = TimeSlot.query.filter(or_(*relevant_award_conditions)).all()
-                for award in relevant_awards:
-                    all_relevant_slot_ids.add(award.id)
+            # Выбираем релевантные награждения для судьи (того же дня и категории)
+            all_relevant_slot_ids = highlight_slot_ids | relevant_award_slot_ids(all_assigned_contests)
 
             if all_relevant_slot_ids:
                  schedule_items = TimeSlot.query.filter(TimeSlot.id.in_(all_relevant_slot_ids)).options(
-                    joinedload(TimeSlot.day),
-                    joinedload(TimeSlot.nomination_template)
+                    *loaders.SLOT_SUMMARY
                 ).order_by(TimeSlot.start_time).all()
 
 
@@ -118,8 +90,9 @@ def dashboard():
                 if contest_id:
                     scores_per_contest[contest_id].append(score)
 
+            reference = refdata.get_reference_data()
             for contest in all_assigned_contests:
-                criteria_count = len(contest.nomination_template.criteria)
+                criteria_count = len(reference.template_criteria(contest.nomination_template_id))
                 participants_count = len(contest.participants)
                 if participants_count == 0 or criteria_count == 0:
                     pending_contests.append(contest)
@@ -135,13 +108,18 @@ def dashboard():
     else:
         # --- СТАРАЯ ЛОГИКА ДЛЯ АДМИНА: Показываем все ---
         schedule_items = TimeSlot.query.options(
-            joinedload(TimeSlot.day),
-            joinedload(TimeSlot.nomination_template)
+            *loaders.SLOT_SUMMARY
         ).order_by(TimeSlot.start_time).all()
 
 
+    calendar_url = None
+    if user.role in ('participant', 'judge'):
+        calendar_url = url_for('main.calendar_ics', token=user.calendar_token, _external=True) \
+            if user.calendar_token else None
+
     return render_template('dashboard.html',
                            user=user,
+                           calendar_url=calendar_url,
                            schedule_items=schedule_items,
                            participant_participations=participant_participations,
                            pending_contests=pending_contests,
@@ -151,6 +129,40 @@ def dashboard():
                            role=user.role)
 
 
+@main_bp.route('/calendar/new', methods=['POST'])
+@login_required
+def calendar_link():
+    """Выдает ссылку на личный календарь; повторный вызов заменяет ее (старая перестает работать)."""
+    user = User.query.get(session['user_id'])
+    if user.role not in ('participant', 'judge'):
+        flash('Личный календарь доступен участникам и судьям.', 'error')
+        return redirect(url_for('main.dashboard'))
+    if user.calendar_token:
+        calendar_feed.reset_token(user)
+        message = 'Ссылка на календарь заменена. Старая ссылка больше не работает.'
+    else:
+        calendar_feed.ensure_token(user)
+        message = 'Ссылка на календарь создана. Добавьте ее в календарь телефона как подписку.'
+    db.session.commit()
+    flash(message, 'success')
+    return redirect(url_for('main.dashboard'))
+
+
+@main_bp.route('/calendar/<token>.ics')
+def calendar_ics(token):
+    # Без входа: календарь телефона знает только адрес с токеном
+    user = User.query.filter_by(calendar_token=token).first()
+    if user is None or user.role not in ('participant', 'judge'):
+        abort(404)
+    body, etag, generated = calendar_feed.feed(user)
+    response = make_response(body)
+    response.mimetype = 'text/calendar'
+    response.set_etag(etag, weak=True)
+    response.last_modified = generated
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
 @main_bp.route('/my-scores')
 @login_required
 def my_scores():
@@ -159,76 +171,42 @@ def my_scores():
         flash('Доступ запрещён.', 'error')
         return redirect(url_for('main.dashboard'))
 
-    participations = Participation.query.options(
-        # Важно! Добавляем joinedload для p.winner, чтобы избежать доп. запросов в цикле
-        joinedload(Participation.winner),
-        joinedload(Participation.contest_slot).joinedload(TimeSlot.nomination_template),
-        joinedload(Participation.contest_slot).joinedload(TimeSlot.day),
-        joinedload(Participation.scores).joinedload(Score.criterion),
-        joinedload(Participation.scores).joinedload(Score.judge)
-    ).filter_by(user_id=user.id).all()
-
-    # --- НОВЫЙ БЛОК: Загружаем все слоты награждений одним запросом ---
-    award_slots = TimeSlot.query.filter_by(type='award').all()
-    # Создаем карту для быстрого поиска: {(day_id, category): end_time}
-    award_map = {(slot.day_id, slot.category): slot.end_time for slot in award_slots}
+    results = participant_score_cards(user)
 
-    results = []
+    return render_template('participant_scores.html', results=results, user=user)
 
-    for p in participations:
-        slot = p.contest_slot
-        
-        # Мы больше не скрываем конкурс, если он еще идет.
-        # Мы просто решаем, показывать ли статус победителя.
-        
-        # --- НОВАЯ ЛОГИКА ОПРЕДЕЛЕНИЯ ПОБЕДИТЕЛЯ ---
-        is_winner = False
-        winner_place = None
-        # Проверяем, есть ли запись о победе (p.winner был загружен через joinedload)
-        if p.winner:
-            # Находим время окончания награждения для этого конкурса (по дню и категории)
-            award_end_time = award_map.get((slot.day_id, slot.category))
-            
-            # Показываем статус "Победитель" только если награждение найдено и оно уже прошло
-            if award_end_time and datetime.now() > award_end_time:
-                is_winner = True
-                winner_place = p.winner.place
-        
-        # --- Существующая логика подсчета очков ---
-        judge_scores = {}
-        for s in p.scores:
-            if s.criterion:
-                judge_id = s.judge_id
-                if judge_id not in judge_scores:
-                    judge_scores[judge_id] = {'judge': s.judge, 'criteria': {}, 'total': 0, 'count': 0}
-                
-                judge_scores[judge_id]['criteria'][s.criterion.name] = s.score
-                judge_scores[judge_id]['total'] += s.score
-                judge_scores[judge_id]['count'] += 1
-
-        for j in judge_scores.values():
-            j['avg'] = round(j['total'] / j['count'], 2) if j['count'] else None
-
-        overall_scores = [j['avg'] for j in judge_scores.values() if j['avg'] is not None]
-        overall_avg = round(sum(overall_scores) / len(overall_scores), 2) if overall_scores else None
-
-        results.append({
-            'participation_id': p.id,
-            'nomination': slot.nomination_template.name,
-            'category': slot.category,
-            'date': slot.day.date,
-            'start_time': slot.start_time,
-            'end_time': slot.end_time,
-            'judge_scores': judge_scores,
-            'overall_avg': overall_avg,
-            # --- НОВЫЕ ПОЛЯ для передачи в шаблон ---
-            'is_winner': is_winner,
-            'winner_place': winner_place
-        })
-        
-    results.sort(key=lambda r: r['date'], reverse=True)
 
-    return render_template('participant_scores.html', results=results, user=user)
+def _save_judge_row(contest, judge_id, participation_id, criteria):
+    """
+    Сохраняет оценки судьи одному участнику по всем критериям из request.form
+    (поля scores[<participation_id>][<criterion_id>]) и обновляет статус конкурса.
+    Работа не зависит от размера конкурса: одна строка, один запрос за ее оценками.
+    Коммит делает вызывающий. Возвращает {criterion_id: оценка}.
+    """
+    if not participation_id or not db.session.query(
+            Participation.query.filter_by(id=participation_id, time_slot_id=contest.id).exists()).scalar():
+        raise ValueError('Участник не найден в этом конкурсе.')
+
+    existing = {s.criterion_id: s for s in Score.query.filter_by(judge_id=judge_id, participation_id=participation_id)}
+    row = {}
+    for c in criteria:
+        score_value = request.form.get(f'scores[{participation_id}][{c.id}]', type=int)
+        if score_value is None:
+            raise ValueError(f'Необходимо выставить оценку по критерию "{c.name}".')
+        if not 0 <= score_value <= c.max_score:
+            raise ValueError(f'Оценка по критерию "{c.name}" должна быть от 0 до {c.max_score}.')
+
+        if c.id in existing:
+            existing[c.id].score = score_value
+            existing[c.id].scored_at = datetime.now()
+        else:
+            db.session.add(Score(judge_id=judge_id, participation_id=participation_id, criterion_id=c.id, score=score_value))
+        row[c.id] = score_value
+
+    # Статус конкурса и уведомления о нем - в той же транзакции, что и оценки
+    db.session.flush()
+    update_contest_status(contest)
+    return row
 
 
 @main_bp.route('/judging/<int:contest_id>', methods=['GET', 'POST'])
@@ -240,11 +218,7 @@ def judging_page(contest_id):
     
     judge_id = session['user_id']
 
-    contest = TimeSlot.query.options(
-        joinedload(TimeSlot.participants).joinedload(Participation.user),
-        joinedload(TimeSlot.nomination_template).joinedload(NominationTemplate.criteria),
-        joinedload(TimeSlot.day)
-    ).get_or_404(contest_id)
+    contest = TimeSlot.query.options(*loaders.CONTEST_WITH_PARTICIPANTS).get_or_404(contest_id)
 
     is_assigned = JudgeNomination.query.filter_by(
         judge_id=judge_id, 
@@ -256,12 +230,11 @@ def judging_page(contest_id):
 
     participations = contest.participants
     
-    # --- ИЗМЕНЕНИЕ ЗДЕСЬ ---
-    # Мы больше не можем использовать .order_by(), так как criteria - это список.
-    # Сортируем его с помощью стандартной функции Python sorted().
-    criteria = sorted(contest.nomination_template.criteria, key=lambda c: c.order)
+    # Критерии шаблона берем из кэша справочников (уже отсортированы по order)
+    criteria = refdata.get_reference_data().template_criteria(contest.nomination_template_id)
     
-    is_judging_allowed = datetime.now() >= contest.start_time
+    # Статус по времени начала выставляет sweeper.py
+    is_judging_allowed = contest.status not in (None, 'pending')
 
     if request.method == 'POST':
         if not is_judging_allowed:
@@ -270,17 +243,7 @@ def judging_page(contest_id):
 
         participation_id = request.form.get('participation_id', type=int)
         try:
-            for c in criteria:
-                score_value = request.form.get(f'scores[{participation_id}][{c.id}]', type=int)
-                if score_value is None:
-                    raise ValueError(f'Необходимо выставить оценку по критерию "{c.name}".')
-                
-                existing_score = Score.query.filter_by(judge_id=judge_id, participation_id=participation_id, criterion_id=c.id).first()
-                if existing_score:
-                    existing_score.score = score_value
-                else:
-                    db.session.add(Score(judge_id=judge_id, participation_id=participation_id, criterion_id=c.id, score=score_value))
-            
+            _save_judge_row(contest, judge_id, participation_id, criteria)
             db.session.commit()
             flash('Оценки успешно сохранены!', 'success')
         except Exception as e:
@@ -323,4 +286,44 @@ def judging_page(contest_id):
                            scores_map=scores_map,
                            fully_scored_participation_ids=fully_scored_participation_ids,
                            is_judging_allowed=is_judging_allowed,
-                           avg_scores=avg_scores)
+                           avg_scores=avg_scores,
+                           judge_id=judge_id,
+                           # Офлайн-копия листа в браузере новее этой страницы, если сохранена позже
+                           rendered_at=int(datetime.now().timestamp() * 1000))
+
+
+@main_bp.route('/judging/sync', methods=['POST'])
+def judging_sync():
+    """
+    Пакет правок оценок из очереди браузера (офлайн-судейство, см. score_sync.py).
+    Повтор пакета безопасен: операции с известным op_id второй раз не применяются.
+    Кроме результатов по операциям отдает состояние затронутых строк - те же
+    avg_scores и fully_scored_participation_ids, что считает judging_page().
+    """
+    if session.get('user_role') != 'judge':
+        return jsonify(error='Доступ запрещен.'), 403
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error='Ожидается JSON с операциями.'), 400
+    try:
+        results, rows = score_sync.sync(session['user_id'], payload.get('ops'))
+    except score_sync.SyncError as e:
+        return jsonify(error=str(e)), 400
+
+    return jsonify(
+        results=results,
+        rows={str(p_id): row for p_id, row in rows.items()},
+        avg_scores={str(p_id): row['avg'] for p_id, row in rows.items()},
+        fully_scored_participation_ids=[p_id for p_id, row in rows.items() if row['fully_scored']],
+    )
+
+
+@main_bp.route('/judging/sw.js')
+def judging_service_worker():
+    """Service worker страниц судейства: открывает их без сети (static/js/judging-sw.js)."""
+    # Отдается по пути /judging/, чтобы его областью были страницы судейства;
+    # браузер сам сверяет файл с сервером при каждом открытии страницы
+    response = send_from_directory(current_app.static_folder, 'js/judging-sw.js',
+                                   mimetype='application/javascript', max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,398 @@
+# scheduler.py
+# Автоматическое составление расписания дня фестиваля.
+# Жадная раскладка конкурсов по зонам + локальный поиск (переразмещение),
+# затем расстановка награждений по правилам и массовая вставка в БД.
+
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+
+from extensions import db
+from jobs import job_handler
+from models import Festival, EventDay, TimeSlot, JudgeNomination
+import leaderboard
+
+# Ограничение на время локального поиска, чтобы планировщик всегда отвечал быстро
+LOCAL_SEARCH_BUDGET = 0.5  # секунды
+
+
+class PlanItem:
+    """Один планируемый слот: конкурс (judging) или награждение (award)."""
+
+    __slots__ = ('slot_id', 'type', 'nomination_template_id', 'category', 'duration',
+                 'judge_ids', 'zones', 'start', 'zone')
+
+    def __init__(self, type, duration, nomination_template_id=None, category=None,
+                 judge_ids=(), zones=None, slot_id=None):
+        self.slot_id = slot_id  # None - новый слот, иначе перепланируемый существующий
+        self.type = type
+        self.nomination_template_id = nomination_template_id
+        self.category = category
+        self.duration = duration  # в минутах
+        self.judge_ids = frozenset(judge_ids)
+        self.zones = zones  # допустимые зоны; None - любая
+        self.start = None  # минуты от начала дня
+        self.zone = None
+
+    @property
+    def end(self):
+        return self.start + self.duration
+
+
+class Timeline:
+    """Занятость зон и судей: списки интервалов (start, end) в минутах."""
+
+    def __init__(self, blocked=()):
+        # Интервалы, закрытые для всех зон (например, обеденный перерыв)
+        self.blocked = sorted(blocked)
+        self.zones = {}
+        self.judges = {}
+
+    def occupy(self, item):
+        interval = (item.start, item.end)
+        self.zones.setdefault(item.zone, []).append(interval)
+        for judge_id in item.judge_ids:
+            self.judges.setdefault(judge_id, []).append(interval)
+
+    def release(self, item):
+        interval = (item.start, item.end)
+        self.zones[item.zone].remove(interval)
+        for judge_id in item.judge_ids:
+            self.judges[judge_id].remove(interval)
+
+    def busy_for(self, zone, judge_ids):
+        busy = list(self.blocked)
+        busy.extend(self.zones.get(zone, ()))
+        for judge_id in judge_ids:
+            busy.extend(self.judges.get(judge_id, ()))
+        busy.sort()
+        return busy
+
+    def earliest_fit(self, zone, judge_ids, duration, not_before):
+        """Самое раннее начало >= not_before, при котором слот ни с чем не пересекается."""
+        start = not_before
+        for busy_start, busy_end in self.busy_for(zone, judge_ids):
+            if busy_end <= start:
+                continue
+            if busy_start >= start + duration:
+                break
+            start = busy_end
+        return start
+
+
+def _place(item, timeline, zones, not_before):
+    """Выбирает зону с самым ранним окончанием и фиксирует слот на таймлайне."""
+    best = None
+    for zone in (item.zones or zones):
+        start = timeline.earliest_fit(zone, item.judge_ids, item.duration, not_before)
+        if best is None or start < best[0]:
+            best = (start, zone)
+    item.start, item.zone = best
+    timeline.occupy(item)
+
+
+def _cost(items):
+    # Основной критерий - время окончания дня, дополнительный - сумма окончаний
+    # (чем раньше проходят конкурсы, тем больше запас на поздние изменения)
+    if not items:
+        return (0, 0)
+    ends = [i.end for i in items]
+    return (max(ends), sum(ends))
+
+
+def _local_search(items, timeline, zones, day_start):
+    """Пытается переставить каждый конкурс раньше, пока это улучшает план."""
+    deadline = time.perf_counter() + LOCAL_SEARCH_BUDGET
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        # Начинаем с самых поздних конкурсов - они определяют окончание дня
+        for item in sorted(items, key=lambda i: i.end, reverse=True):
+            if time.perf_counter() >= deadline:
+                break
+            before = _cost(items)
+            old_start, old_zone = item.start, item.zone
+            timeline.release(item)
+            _place(item, timeline, zones, day_start)
+            if _cost(items) < before:
+                improved = True
+            else:
+                timeline.release(item)
+                item.start, item.zone = old_start, old_zone
+                timeline.occupy(item)
+
+
+def build_plan(contests, zones, day_start, day_end, fixed=(), blocked=(),
+               award_rules=None):
+    """
+    Строит бесконфликтный план дня.
+
+    contests    - список PlanItem типа 'judging', которые нужно разместить;
+    zones       - доступные зоны (ZONES);
+    day_start/day_end - границы дня в минутах;
+    fixed       - уже размещенные PlanItem (не двигаются, но занимают зоны и судей);
+    blocked     - интервалы (start, end), закрытые для всех зон;
+    award_rules - {'duration': мин, 'zone': зона, 'gap': мин, 'skip_categories': set}
+                  по одному награждению на категорию после последнего конкурса
+                  этой категории (кроме категорий из skip_categories).
+
+    Возвращает (план, неразмещенные), где план - список PlanItem, отсортированный по времени.
+    """
+    timeline = Timeline(blocked)
+    for item in fixed:
+        timeline.occupy(item)
+
+    # Жадная раскладка: сначала самые «тяжелые» конкурсы (больше судей, дольше)
+    ordered = sorted(contests, key=lambda i: (-len(i.judge_ids), -i.duration))
+    for item in ordered:
+        _place(item, timeline, zones, day_start)
+
+    _local_search(ordered, timeline, zones, day_start)
+
+    plan = list(ordered)
+    if award_rules:
+        award_zone = award_rules.get('zone') or zones[-1]
+        skip = award_rules.get('skip_categories', ())
+        categories = sorted({i.category for i in ordered if i.category} - set(skip))
+        for category in categories:
+            last_end = max(i.end for i in list(ordered) + list(fixed)
+                           if i.type == 'judging' and i.category == category)
+            award = PlanItem('award', award_rules['duration'], category=category, zones=[award_zone])
+            _place(award, timeline, zones, last_end + award_rules.get('gap', 0))
+            plan.append(award)
+
+    placed = [i for i in plan if i.end <= day_end]
+    unplaced = [i for i in plan if i.end > day_end]
+    placed.sort(key=lambda i: (i.start, i.zone or ''))
+    return placed, unplaced
+
+
+def _minutes(dt, day_date):
+    return int((dt - datetime.combine(day_date, datetime.min.time())).total_seconds() // 60)
+
+
+def _datetime(minutes, day_date):
+    return datetime.combine(day_date, datetime.min.time()) + timedelta(minutes=minutes)
+
+
+def plan_day(day, requests, zones, day_start, day_end, award_rules=None, replan=False):
+    """
+    Составляет план для EventDay.
+
+    requests - список словарей {'nomination_template_id', 'category', 'duration'}
+               для новых конкурсов.
+    replan   - если True, уже существующие конкурсы дня в статусе 'pending'
+               тоже перепланируются (с сохранением их судей и участников),
+               а награждения дня пересоздаются. Конкурс, не поместившийся в
+               границы дня, и награждение, замене которого не хватило места,
+               остаются на прежних местах.
+
+    Возвращает (план, неразмещенные, удаляемые_награждения).
+    """
+    existing = TimeSlot.query.filter_by(day_id=day.id).all()
+    judges_by_slot = {}
+    for assignment in JudgeNomination.query.filter(
+            JudgeNomination.time_slot_id.in_([s.id for s in existing])):
+        judges_by_slot.setdefault(assignment.time_slot_id, set()).add(assignment.judge_id)
+
+    contests, fixed, blocked, dropped_awards = [], [], [], []
+    # Где стоят перепланируемые слоты сейчас: {slot_id: (начало, зона)}
+    current = {}
+    for slot in existing:
+        start = _minutes(slot.start_time, day.date)
+        duration = _minutes(slot.end_time, day.date) - start
+        if slot.type == 'event':
+            blocked.append((start, start + duration))
+            continue
+        item = PlanItem(slot.type, duration, slot.nomination_template_id, slot.category,
+                        judges_by_slot.get(slot.id, ()), slot_id=slot.id)
+        current[slot.id] = (start, slot.zone)
+        if slot.type == 'award' and replan and award_rules:
+            dropped_awards.append((slot, item))
+        elif replan and slot.type == 'judging' and slot.status in (None, 'pending'):
+            contests.append(item)
+        else:
+            item.start, item.zone = start, slot.zone
+            fixed.append(item)
+
+    for req in requests:
+        contests.append(PlanItem('judging', req['duration'], req['nomination_template_id'], req['category']))
+
+    while True:
+        # Награждения для категорий, у которых оно уже есть и не пересоздается, не дублируем
+        rules = award_rules and dict(award_rules,
+                                     skip_categories={i.category for i in fixed if i.type == 'award'})
+        plan, unplaced = build_plan(contests, zones, day_start, day_end, fixed, blocked, rules)
+
+        # Существующий конкурс, не поместившийся в новый план, и старое награждение,
+        # замене которого не хватило места, остаются на своих местах: иначе apply_plan
+        # не тронул бы конкурс (и на его время легли бы другие слоты), а награждение
+        # удалил бы без замены. Закрепляем их и строим план заново.
+        stuck = [i for i in unplaced if i.slot_id]
+        lost_categories = {i.category for i in unplaced if i.type == 'award'}
+        kept_awards = [pair for pair in dropped_awards if pair[0].category in lost_categories]
+        if not stuck and not kept_awards:
+            break
+        for item in stuck:
+            contests.remove(item)
+        for pair in kept_awards:
+            dropped_awards.remove(pair)
+        for item in stuck + [item for _, item in kept_awards]:
+            item.start, item.zone = current[item.slot_id]
+            fixed.append(item)
+
+    return plan, unplaced, [slot for slot, _ in dropped_awards]
+
+
+def apply_plan(day, plan, dropped_awards=()):
+    """
+    Записывает план в БД одной транзакцией: новые слоты - массовым INSERT,
+    перепланированные - массовым UPDATE по первичному ключу, затем
+    перенумеровывает slot_order всего дня. Коммит делает вызывающий код.
+    """
+    if dropped_awards:
+        TimeSlot.query.filter(TimeSlot.id.in_([s.id for s in dropped_awards])).delete(synchronize_session=False)
+
+    new_rows, moved_rows = [], []
+    for order, item in enumerate(plan, start=1):
+        values = {
+            'start_time': _datetime(item.start, day.date),
+            'end_time': _datetime(item.end, day.date),
+            'zone': item.zone,
+            # Временный номер вне диапазона существующих, чтобы не нарушить
+            # UNIQUE(day_id, slot_order); окончательный проставит renumber_day
+            'slot_order': 100000 + order,
+        }
+        if item.slot_id:
+            moved_rows.append(dict(values, id=item.slot_id))
+        else:
+            new_rows.append(dict(values, day_id=day.id, type=item.type, category=item.category,
+                                 nomination_template_id=item.nomination_template_id))
+
+    if new_rows:
+        db.session.execute(insert(TimeSlot), new_rows)
+    if moved_rows:
+        db.session.execute(update(TimeSlot), moved_rows)
+
+    renumber_day(day.id)
+    # Массовые insert/update мимо flush - табло конкурсов дня пересоберется при коммите
+    leaderboard.mark_days([day.id])
+    return len(new_rows), len(moved_rows)
+
+
+def renumber_day(day_id):
+    """Перенумеровывает slot_order дня по времени начала (массовый UPDATE по ключу)."""
+    rows = db.session.query(TimeSlot.id).filter_by(day_id=day_id).order_by(
+        TimeSlot.start_time, TimeSlot.zone, TimeSlot.id).all()
+    if not rows:
+        return
+    db.session.execute(
+        update(TimeSlot).where(TimeSlot.day_id == day_id).values(slot_order=-TimeSlot.id)
+    )
+    db.session.execute(update(TimeSlot), [{'id': row.id, 'slot_order': order}
+                                          for order, row in enumerate(rows, start=1)])
+
+
+# Колонки слота, которые переносятся при копировании структуры расписания
+_CLONED_COLUMNS = ('type', 'nomination_template_id', 'category', 'zone', 'award_title', 'event_title')
+
+
+def clone_days(day_pairs, with_judges=False):
+    """
+    Копирует структуру расписания (слоты, при желании - назначения судей)
+    из исходных дней в целевые. day_pairs - список (исходный EventDay, целевой EventDay).
+    Целевые дни должны быть пустыми, иначе ValueError: повторное копирование
+    наложило бы на день второй экземпляр тех же слотов.
+
+    Время слотов сдвигается на разницу дат, участники и оценки не копируются.
+    Всё выполняется набором массовых запросов; коммит делает вызывающий код.
+    Возвращает (число слотов, число назначений судей).
+    """
+    target_by_source = {source.id: target for source, target in day_pairs}
+    if not target_by_source:
+        return 0, 0
+    busy = db.session.query(EventDay.date).join(TimeSlot, TimeSlot.day_id == EventDay.id).filter(
+        EventDay.id.in_([target.id for _, target in day_pairs])
+    ).distinct().order_by(EventDay.date).all()
+    if busy:
+        raise ValueError('В расписании дня уже есть слоты: ' + ', '.join(d.strftime('%d.%m.%Y') for d, in busy)
+                         + '. Копировать можно только в пустой день.')
+
+    columns = [TimeSlot.id, TimeSlot.day_id, TimeSlot.start_time, TimeSlot.end_time] + \
+              [getattr(TimeSlot, name) for name in _CLONED_COLUMNS]
+    source_slots = db.session.query(*columns).filter(
+        TimeSlot.day_id.in_(list(target_by_source))
+    ).order_by(TimeSlot.day_id, TimeSlot.start_time, TimeSlot.slot_order).all()
+    if not source_slots:
+        return 0, 0
+
+    sources_by_id = {source.id: source for source, _ in day_pairs}
+    rows, temp_order_by_source_slot = [], {}
+    for index, slot in enumerate(source_slots, start=1):
+        target = target_by_source[slot.day_id]
+        shift = target.date - sources_by_id[slot.day_id].date
+        # Временный номер вне диапазона существующих; окончательный проставит renumber_day
+        temp_order = 100000 + index
+        temp_order_by_source_slot[slot.id] = (target.id, temp_order)
+        rows.append(dict({name: getattr(slot, name) for name in _CLONED_COLUMNS},
+                         day_id=target.id,
+                         start_time=slot.start_time + shift,
+                         end_time=slot.end_time + shift,
+                         slot_order=temp_order))
+    db.session.execute(insert(TimeSlot), rows)
+
+    judges_count = 0
+    if with_judges:
+        target_ids = {target.id for _, target in day_pairs}
+        new_id_by_order = {
+            (row.day_id, row.slot_order): row.id
+            for row in db.session.query(TimeSlot.id, TimeSlot.day_id, TimeSlot.slot_order).filter(
+                TimeSlot.day_id.in_(target_ids), TimeSlot.slot_order > 100000)
+        }
+        assignments = db.session.query(JudgeNomination.judge_id, JudgeNomination.time_slot_id).filter(
+            JudgeNomination.time_slot_id.in_(list(temp_order_by_source_slot))
+        ).all()
+        judge_rows = [{'judge_id': a.judge_id,
+                       'time_slot_id': new_id_by_order[temp_order_by_source_slot[a.time_slot_id]]}
+                      for a in assignments]
+        if judge_rows:
+            db.session.execute(insert(JudgeNomination), judge_rows)
+        judges_count = len(judge_rows)
+
+    for target_id in {target.id for _, target in day_pairs}:
+        renumber_day(target_id)
+    leaderboard.mark_days([target.id for _, target in day_pairs])
+    return len(rows), judges_count
+
+
+def clone_festival(source_festival_id, name, start_date, with_judges=False):
+    """
+    Создает новый фестиваль по образцу существующего: те же дни (со сдвигом дат)
+    и та же структура расписания. Всё - одной транзакцией.
+    """
+    source = db.session.get(Festival, source_festival_id)
+    shift = start_date - source.start_date
+
+    new_festival = Festival(name=name, start_date=start_date, end_date=source.end_date + shift)
+    db.session.add(new_festival)
+
+    day_pairs = []
+    for source_day in EventDay.query.filter_by(festival_id=source.id).order_by(EventDay.day_order):
+        new_day = EventDay(festival=new_festival, date=source_day.date + shift, day_order=source_day.day_order)
+        db.session.add(new_day)
+        day_pairs.append((source_day, new_day))
+    db.session.flush()  # нужны id новых дней
+
+    slots_count, judges_count = clone_days(day_pairs, with_judges=with_judges)
+    db.session.commit()
+    return {'festival_id': new_festival.id, 'source_name': source.name, 'days': len(day_pairs),
+            'slots': slots_count, 'judge_assignments': judges_count}
+
+
+@job_handler('clone_festival', concurrency=1)
+def clone_festival_job(payload, progress):
+    progress('Копирование расписания...')
+    return clone_festival(payload['source_festival_id'], payload['name'],
+                          datetime.strptime(payload['start_date'], '%Y-%m-%d').date(),
+                          with_judges=payload.get('with_judges', False))
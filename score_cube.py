@@ -0,0 +1,290 @@
+# score_cube.py
+# Куб оценок для аналитики: конкурс x судья x критерий x категория участников
+# (с фестивалем и днем) -> число оценок, сумма и сумма квадратов.
+#
+# Куб обновляется инкрементально в той же транзакции, что и оценки: он читает
+# новые события журнала оценок (score_events.py) и прибавляет разницу к
+# ячейкам одним upsert-ом. Смена категории участника пересчитывает его
+# конкурсы (хук after_flush). Удаления мимо ORM (заявка удалена, оценки снесла БД
+# каскадом; массовое удаление пользователя) требуют пересчета затронутых
+# конкурсов - rebuild_contests(). Полный пересчет -
+# `flask rebuild-score-cube` (по оценкам) или `flask replay-score-events`
+# (по журналу). Страницы аналитики читают только куб.
+
+import math
+from collections import defaultdict
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from extensions import db
+import refdata
+import score_events
+from models import (Score, ScoreCube, Participation, TimeSlot, EventDay, Festival, User, Criterion,
+                    JudgeNomination, NominationTemplate)
+
+CELL_COLUMNS = ('festival_id', 'day_id', 'time_slot_id', 'judge_id', 'criterion_id', 'experience_category')
+
+
+# --- Инкрементальное обновление ---
+
+@score_events.subscribe
+def apply_events(session, events):
+    """Прибавляет к ячейкам куба изменения из событий журнала оценок (score_events.py)."""
+    deltas = {key: value for key, value in fold_events(events).items() if any(value)}
+    if deltas:
+        connection = session.connection()
+        _apply(connection, to_cells(connection, deltas))
+
+
+def fold_events(events, deltas=None):
+    """
+    Складывает события журнала в изменения по оценкам:
+    (participation_id, judge_id, criterion_id) -> [n, сумма, сумма квадратов].
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, 0, 0])
+    for e in events:
+        cell = deltas[(e['participation_id'], e['judge_id'], e['criterion_id'])]
+        for sign, value in ((-1, e['old_score']), (1, e['new_score'])):
+            if value is not None:
+                cell[0] += sign
+                cell[1] += sign * value
+                cell[2] += sign * value * value
+    return deltas
+
+
+def to_cells(connection, deltas):
+    """Раскладывает изменения по оценкам по ячейкам куба: ключ из CELL_COLUMNS -> [n, сумма, сумма квадратов]."""
+    participation_ids = {key[0] for key in deltas}
+    info = {row.id: row for row in connection.execute(
+        select(Participation.id, Participation.time_slot_id, TimeSlot.day_id, EventDay.festival_id,
+               func.coalesce(User.experience_category, 'junior').label('experience_category'))
+        .join(TimeSlot, TimeSlot.id == Participation.time_slot_id)
+        .join(EventDay, EventDay.id == TimeSlot.day_id)
+        .join(User, User.id == Participation.user_id)
+        .where(Participation.id.in_(participation_ids)))}
+
+    result = defaultdict(lambda: [0, 0, 0])
+    for (participation_id, judge_id, criterion_id), (n, total, total_sq) in deltas.items():
+        p = info.get(participation_id)
+        if p is None:
+            continue  # заявку удалили в этой же транзакции - конкурс пересчитает rebuild_contests()
+        cell = result[(p.festival_id, p.day_id, p.time_slot_id, judge_id, criterion_id, p.experience_category)]
+        cell[0] += n
+        cell[1] += total
+        cell[2] += total_sq
+    return result
+
+
+def _apply(connection, cells):
+    if not cells:
+        return
+    rows = [dict(zip(CELL_COLUMNS, key), n=n, total=total, total_sq=total_sq)
+            for key, (n, total, total_sq) in cells.items()]
+    table = ScoreCube.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['time_slot_id', 'judge_id', 'criterion_id', 'experience_category'],
+            set_={'n': table.c.n + stmt.excluded.n,
+                  'total': table.c.total + stmt.excluded.total,
+                  'total_sq': table.c.total_sq + stmt.excluded.total_sq})
+        connection.execute(stmt, rows)
+    else:
+        for row in rows:
+            result = connection.execute(update(table).where(and_(
+                table.c.time_slot_id == row['time_slot_id'], table.c.judge_id == row['judge_id'],
+                table.c.criterion_id == row['criterion_id'],
+                table.c.experience_category == row['experience_category'],
+            )).values(n=table.c.n + row['n'], total=table.c.total + row['total'],
+                      total_sq=table.c.total_sq + row['total_sq']))
+            if result.rowcount == 0:
+                connection.execute(insert(table), row)
+
+    # Ячейки, из которых ушли все оценки, не храним
+    slot_ids = {row['time_slot_id'] for row in rows}
+    connection.execute(delete(table).where(table.c.time_slot_id.in_(slot_ids), table.c.n <= 0))
+
+
+# --- Пересчет по сырым оценкам ---
+
+def _aggregate():
+    return select(
+        EventDay.festival_id, TimeSlot.day_id, Participation.time_slot_id, Score.judge_id, Score.criterion_id,
+        func.coalesce(User.experience_category, 'junior'),
+        func.count(Score.id), func.sum(Score.score), func.sum(Score.score * Score.score),
+    ).join(Participation, Participation.id == Score.participation_id).join(
+        TimeSlot, TimeSlot.id == Participation.time_slot_id
+    ).join(EventDay, EventDay.id == TimeSlot.day_id).join(
+        User, User.id == Participation.user_id
+    ).group_by(Participation.time_slot_id, Score.judge_id, Score.criterion_id,
+               func.coalesce(User.experience_category, 'junior'))
+
+
+def _rebuild(connection, slot_ids):
+    connection.execute(delete(ScoreCube).where(ScoreCube.time_slot_id.in_(slot_ids)))
+    connection.execute(insert(ScoreCube).from_select(
+        list(CELL_COLUMNS) + ['n', 'total', 'total_sq'],
+        _aggregate().where(Participation.time_slot_id.in_(slot_ids))))
+
+
+def rebuild_contests(slot_ids):
+    """Пересчитывает ячейки конкурсов (в текущей транзакции; коммит делает вызывающий)."""
+    slot_ids = list(slot_ids)
+    if not slot_ids:
+        return
+    _rebuild(db.session.connection(), slot_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _rebuild_on_category_change(session, flush_context):
+    # Ячейки куба разбиты по категории участника: при ее смене (edit_user) оценки
+    # участника переезжают в ячейки другой категории - событий оценок при этом нет,
+    # поэтому конкурсы участника пересчитываются целиком. Слушатель зарегистрирован
+    # после score_events (этот модуль его импортирует), так что события оценок того
+    # же flush уже применены и пересчет их не задвоит.
+    user_ids = {obj.id for obj in session.dirty if isinstance(obj, User)
+                and inspect(obj).attrs.experience_category.history.has_changes()}
+    if not user_ids:
+        return
+    connection = session.connection()
+    slot_ids = list(connection.scalars(select(Participation.time_slot_id).where(
+        Participation.user_id.in_(user_ids)).distinct()))
+    if slot_ids:
+        _rebuild(connection, slot_ids)
+
+
+def rebuild_all():
+    db.session.execute(delete(ScoreCube))
+    db.session.execute(insert(ScoreCube).from_select(
+        list(CELL_COLUMNS) + ['n', 'total', 'total_sq'], _aggregate()))
+    db.session.commit()
+    return db.session.scalar(select(func.count(ScoreCube.id)))
+
+
+@click.command('rebuild-score-cube')
+@with_appcontext
+def rebuild_score_cube_command():
+    """Пересчитать куб оценок для аналитики по всем оценкам."""
+    click.echo(f'Ячеек куба: {rebuild_all()}')
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_score_cube_command)
+
+
+# --- Чтение для аналитики ---
+
+def _stats(n, total, total_sq):
+    mean = total / n
+    variance = max(total_sq / n - mean * mean, 0.0)
+    return mean, math.sqrt(variance)
+
+
+def festivals():
+    return db.session.execute(select(Festival.id, Festival.name).order_by(Festival.start_date.desc())).all()
+
+
+def criterion_distribution(festival_id):
+    """По критериям: число оценок, среднее и стандартное отклонение, отдельно для pro и junior."""
+    rows = db.session.execute(
+        select(Criterion.name, Criterion.order, ScoreCube.experience_category,
+               func.sum(ScoreCube.n), func.sum(ScoreCube.total), func.sum(ScoreCube.total_sq))
+        .join(Criterion, Criterion.id == ScoreCube.criterion_id)
+        .where(ScoreCube.festival_id == festival_id)
+        .group_by(Criterion.id, ScoreCube.experience_category)
+        .order_by(Criterion.order)).all()
+    return [{'criterion': name, 'category': category, 'n': n, 'mean': _stats(n, total, total_sq)[0],
+             'std': _stats(n, total, total_sq)[1]} for name, _, category, n, total, total_sq in rows if n]
+
+
+def judge_agreement(festival_id):
+    """
+    Согласованность судей: для каждой пары - средняя абсолютная разница их средних
+    баллов по общим ячейкам (конкурс x критерий x категория). Возвращает (имена, матрица).
+    """
+    rows = db.session.execute(
+        select(ScoreCube.time_slot_id, ScoreCube.criterion_id, ScoreCube.experience_category,
+               ScoreCube.judge_id, func.coalesce(User.nickname, User.code), ScoreCube.n, ScoreCube.total)
+        .join(User, User.id == ScoreCube.judge_id)
+        .where(ScoreCube.festival_id == festival_id, ScoreCube.n > 0)).all()
+    names = {}
+    means = defaultdict(dict)  # ячейка -> {judge_id: среднее}
+    for slot_id, criterion_id, category, judge_id, name, n, total in rows:
+        names[judge_id] = name
+        means[(slot_id, criterion_id, category)][judge_id] = total / n
+
+    judge_ids = sorted(names, key=lambda j: names[j])
+    sums = defaultdict(float)
+    counts = defaultdict(int)
+    for cell in means.values():
+        for a in cell:
+            for b in cell:
+                sums[(a, b)] += abs(cell[a] - cell[b])
+                counts[(a, b)] += 1
+    matrix = [[round(sums[(a, b)] / counts[(a, b)], 2) if counts[(a, b)] else None for b in judge_ids]
+              for a in judge_ids]
+    return [names[j] for j in judge_ids], matrix
+
+
+def category_spread(festival_id):
+    """По конкурсам: среднее и разброс оценок pro и junior."""
+    rows = db.session.execute(
+        select(TimeSlot.id, TimeSlot.start_time, NominationTemplate.name, TimeSlot.category,
+               ScoreCube.experience_category,
+               func.sum(ScoreCube.n), func.sum(ScoreCube.total), func.sum(ScoreCube.total_sq))
+        .join(TimeSlot, TimeSlot.id == ScoreCube.time_slot_id)
+        .join(NominationTemplate, NominationTemplate.id == TimeSlot.nomination_template_id)
+        .where(ScoreCube.festival_id == festival_id)
+        .group_by(TimeSlot.id, ScoreCube.experience_category)
+        .order_by(TimeSlot.start_time)).all()
+    result = []
+    for slot_id, start_time, name, slot_category, category, n, total, total_sq in rows:
+        if n:
+            mean, std = _stats(n, total, total_sq)
+            result.append({'contest': f"{name} ({start_time.strftime('%d.%m %H:%M')})", 'category': category,
+                           'n': n, 'mean': mean, 'std': std})
+    return result
+
+
+def contest_completion(festival_id):
+    """
+    Готовность конкурсов по времени их начала: выставлено оценок (из куба)
+    из ожидаемых (заявки x назначенные судьи x критерии шаблона).
+    """
+    reference = refdata.get_reference_data()
+    contests = db.session.execute(
+        select(TimeSlot.id, TimeSlot.start_time, TimeSlot.nomination_template_id, NominationTemplate.name)
+        .join(EventDay, EventDay.id == TimeSlot.day_id)
+        .join(NominationTemplate, NominationTemplate.id == TimeSlot.nomination_template_id)
+        .where(EventDay.festival_id == festival_id, TimeSlot.type == 'judging')
+        .order_by(TimeSlot.start_time)).all()
+    slot_ids = [c.id for c in contests]
+    if not slot_ids:
+        return []
+    participants = dict(db.session.execute(
+        select(Participation.time_slot_id, func.count(Participation.id))
+        .where(Participation.time_slot_id.in_(slot_ids)).group_by(Participation.time_slot_id)).all())
+    judges = dict(db.session.execute(
+        select(JudgeNomination.time_slot_id, func.count(JudgeNomination.id))
+        .where(JudgeNomination.time_slot_id.in_(slot_ids)).group_by(JudgeNomination.time_slot_id)).all())
+    scored = dict(db.session.execute(
+        select(ScoreCube.time_slot_id, func.sum(ScoreCube.n))
+        .where(ScoreCube.time_slot_id.in_(slot_ids)).group_by(ScoreCube.time_slot_id)).all())
+
+    result = []
+    for slot_id, start_time, template_id, name in contests:
+        expected = participants.get(slot_id, 0) * judges.get(slot_id, 0) * len(reference.template_criteria(template_id))
+        done = scored.get(slot_id, 0) or 0
+        result.append({'contest': f"{name} ({start_time.strftime('%d.%m %H:%M')})", 'start_time': start_time,
+                       'expected': expected, 'done': done,
+                       'percent': round(100 * min(done, expected) / expected, 1) if expected else 0.0})
+    return result
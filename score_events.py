@@ -0,0 +1,228 @@
+# score_events.py
+# Журнал изменений оценок (таблица score_events) и пересчет производных данных по нему.
+#
+# Каждое изменение Score (новая оценка, исправление, удаление) дописывается в
+# журнал в той же транзакции: хук after_flush собирает изменения объектов и
+# вставляет их одним пакетным INSERT на flush. Строка журнала - только целые:
+# судья, заявка, критерий, конкурс, старое и новое значение, время.
+#
+# Инкрементальные потребители (куб оценок для аналитики, табло зон)
+# подписываются через subscribe() и получают новые события того же flush,
+# а не ищут изменения в таблице оценок сами. Удаления мимо ORM (deletion.py,
+# каскад при удалении заявки) пишутся в журнал через log_deleted(); их
+# производные данные пересчитывает вызывающий, потребителям они не рассылаются.
+#
+# `flask replay-score-events` пересчитывает производные данные по журналу:
+# с --from-offset N - только конкурсы, которых касались события после N
+# (например, после исправления ошибки, появившейся на событии N). С
+# --to-offset M команда только печатает куб на момент события M (свертка в
+# памяти) - живой куб и табло всегда отражают журнал целиком.
+
+import time
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, event, func, insert, inspect, literal, null, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Participation, Score, ScoreCube, ScoreEvent
+
+EVENT_COLUMNS = ('judge_id', 'participation_id', 'criterion_id', 'time_slot_id', 'old_score', 'new_score', 'at')
+KEY = ('judge_id', 'participation_id', 'criterion_id')
+REPLAY_CHUNK = 5000
+
+_consumers = []
+
+
+def subscribe(consumer):
+    """consumer(session, events) вызывается после записи событий каждого flush (в той же транзакции)."""
+    _consumers.append(consumer)
+    return consumer
+
+
+# --- Запись ---
+
+def _committed(state, key):
+    """Значение атрибута до изменений в этой транзакции."""
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(state.obj(), key)
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# После коммита атрибуты объектов истекают, и присваивание не знало бы прежнего
+# значения - событие «8 -> 6» выглядело бы как «6 -> 6» и терялось. active_history
+# догружает прежнее значение при присваивании.
+for _attr in (Score.judge_id, Score.participation_id, Score.criterion_id, Score.score):
+    event.listen(_attr, 'set', _load_old_value, active_history=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def _log_changes(session, flush_context):
+    # (judge_id, participation_id, criterion_id, старое значение, новое значение)
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Score):
+            changes.append((obj.judge_id, obj.participation_id, obj.criterion_id, None, obj.score))
+    for obj in session.dirty:
+        if isinstance(obj, Score) and session.is_modified(obj):
+            state = inspect(obj)
+            old_key = tuple(_committed(state, k) for k in KEY)
+            new_key = (obj.judge_id, obj.participation_id, obj.criterion_id)
+            old_score = _committed(state, 'score')
+            if old_key != new_key:
+                changes.append(old_key + (old_score, None))
+                changes.append(new_key + (None, obj.score))
+            elif old_score != obj.score:
+                changes.append(new_key + (old_score, obj.score))
+    for obj in session.deleted:
+        if isinstance(obj, Score):
+            state = inspect(obj)
+            changes.append(tuple(_committed(state, k) for k in KEY) + (_committed(state, 'score'), None))
+    if not changes:
+        return
+
+    connection = session.connection()
+    slot_of = dict(connection.execute(select(Participation.id, Participation.time_slot_id).where(
+        Participation.id.in_({c[1] for c in changes}))).all())
+    now = int(time.time())
+    events = [dict(judge_id=j, participation_id=p, criterion_id=c, time_slot_id=slot_of.get(p),
+                   old_score=old, new_score=new, at=now)
+              for j, p, c, old, new in changes]
+    connection.execute(insert(ScoreEvent), events)
+    for consumer in _consumers:
+        consumer(session, events)
+
+
+def log_deleted(condition):
+    """
+    Записывает удаление оценок по условию на Score - перед удалением мимо ORM
+    (в той же транзакции). Потребителям не рассылается.
+    """
+    db.session.execute(insert(ScoreEvent).from_select(
+        list(EVENT_COLUMNS),
+        select(Score.judge_id, Score.participation_id, Score.criterion_id, Participation.time_slot_id,
+               Score.score, null(), literal(int(time.time())))
+        .outerjoin(Participation, Participation.id == Score.participation_id)
+        .where(condition)))
+
+
+# --- Чтение ---
+
+def head():
+    """Смещение последнего события (0 - журнал пуст)."""
+    return db.session.scalar(select(func.coalesce(func.max(ScoreEvent.id), 0)))
+
+
+def iter_events(start=0, end=None, slot_ids=None):
+    """События после смещения start (до end включительно) по порядку, пачками по REPLAY_CHUNK."""
+    while True:
+        query = select(ScoreEvent).where(ScoreEvent.id > start).order_by(ScoreEvent.id).limit(REPLAY_CHUNK)
+        if end is not None:
+            query = query.where(ScoreEvent.id <= end)
+        if slot_ids is not None:
+            query = query.where(ScoreEvent.time_slot_id.in_(slot_ids))
+        chunk = db.session.scalars(query).all()
+        if not chunk:
+            return
+        yield chunk
+        start = chunk[-1].id
+
+
+# --- Пересчет по журналу ---
+
+def touched_contests(start=0, end=None):
+    """Конкурсы, которых касались события после смещения start."""
+    query = select(ScoreEvent.time_slot_id).where(ScoreEvent.id > start, ScoreEvent.time_slot_id.is_not(None))
+    if end is not None:
+        query = query.where(ScoreEvent.id <= end)
+    return set(db.session.scalars(query.distinct()))
+
+
+def replay_cube(slot_ids=None):
+    """
+    Пересобирает куб оценок конкурсов (None - весь куб) сверткой всего журнала,
+    без чтения таблицы оценок. Коммит делает вызывающий.
+    """
+    import score_cube
+
+    if slot_ids is None:
+        db.session.execute(delete(ScoreCube))
+    else:
+        slot_ids = list(slot_ids)
+        db.session.execute(delete(ScoreCube).where(ScoreCube.time_slot_id.in_(slot_ids)))
+    applied = 0
+    for chunk in iter_events(0, None, slot_ids):
+        score_cube.apply_events(db.session, [{c: getattr(e, c) for c in EVENT_COLUMNS} for e in chunk])
+        applied += len(chunk)
+    return applied
+
+
+def cube_at(end, slot_ids=None):
+    """
+    Куб оценок на момент события end: свертка журнала в памяти, таблица
+    score_cube не меняется. Возвращает {ключ из score_cube.CELL_COLUMNS: [n, сумма, сумма квадратов]}.
+    """
+    import score_cube
+
+    deltas = None
+    for chunk in iter_events(0, end, slot_ids):
+        deltas = score_cube.fold_events([{c: getattr(e, c) for c in EVENT_COLUMNS} for e in chunk], deltas)
+    if not deltas:
+        return {}
+    cells = score_cube.to_cells(db.session.connection(), deltas)
+    return {key: value for key, value in cells.items() if value[0] > 0}
+
+
+def replay(start=0, targets=('cube', 'leaderboard')):
+    """Пересчитывает производные данные по событиям после смещения start. Возвращает отчет."""
+    import leaderboard
+
+    slot_ids = touched_contests(start)
+    report = {'contests': len(slot_ids)}
+    if 'cube' in targets:
+        # С начала журнала - весь куб, иначе только затронутые конкурсы
+        report['cube_events'] = replay_cube(None if start == 0 else slot_ids)
+    if 'leaderboard' in targets and slot_ids:
+        report['leaderboard'] = leaderboard.rebuild(db.session.connection(), slot_ids)
+    db.session.commit()
+    return report
+
+
+@click.command('replay-score-events')
+@click.option('--from-offset', 'start', default=0, show_default=True,
+              help='Пересчитать конкурсы, которых касались события после этого смещения (0 - все).')
+@click.option('--to-offset', 'end', type=int, default=None,
+              help='Только показать куб на момент этого смещения (данные не меняются).')
+@click.option('--target', type=click.Choice(['cube', 'leaderboard', 'all']), default='all', show_default=True)
+@with_appcontext
+def replay_score_events_command(start, end, target):
+    """Пересчитать куб оценок и табло зон по журналу изменений оценок."""
+    if end is not None:
+        # Исторический срез: конкурсы, которых касались события (start, end], по состоянию на end
+        cells = cube_at(end, touched_contests(start, end) if start else None)
+        contests = {}
+        for (_, _, slot_id, _, _, _), (n, total, _) in cells.items():
+            contest = contests.setdefault(slot_id, [0, 0])
+            contest[0] += n
+            contest[1] += total
+        for slot_id, (n, total) in sorted(contests.items()):
+            click.echo(f'Конкурс {slot_id}: оценок {n}, средний балл {total / n:.2f}')
+        click.echo(f'Куб на событие {end}: ячеек {len(cells)}, конкурсов {len(contests)} (данные не изменены)')
+        return
+    targets = ('cube', 'leaderboard') if target == 'all' else (target,)
+    report = replay(start, targets)
+    click.echo(f"Последнее событие журнала: {head()}, конкурсов: {report['contests']}"
+               + (f", событий в кубе: {report['cube_events']}" if 'cube_events' in report else '')
+               + (f", табло обновлено: {report['leaderboard']}" if 'leaderboard' in report else ''))
+
+
+def init_app(app):
+    app.cli.add_command(replay_score_events_command)
@@ -0,0 +1,212 @@
+# score_sync.py
+# Офлайн-судейство: пакетная идемпотентная синхронизация оценок.
+#
+# Страница судейства складывает каждую правку в очередь браузера как операцию
+#     {op_id, participation_id, criterion_id, score, scored_at}
+# (op_id - случайный id от клиента, scored_at - время правки в мс эпохи) и
+# отправляет очередь пакетами, когда есть сеть. Повтор пакета после обрыва
+# ничего не пишет повторно:
+#
+#   1. недавние op_id помнит сам процесс - повтор отвечается без обращения к БД;
+#   2. остальные ищутся одним запросом по IN в score_sync_ops;
+#   3. новые операции проверяются и применяются одной транзакцией, их op_id
+#      записываются туда же. Одновременная вставка того же op_id другим
+#      воркером дает IntegrityError - пакет разбирается заново, уже как повтор.
+#
+# Конфликты (две правки одной оценки, например с телефона и ноутбука) решает
+# scored_at: побеждает более поздняя правка, проигравшая получает 'stale' и
+# текущее значение с сервера. Время клиента не может быть позже времени
+# сервера - иначе телефон с убежавшими часами выигрывал бы всегда.
+#
+# Таблица score_sync_ops чистится командой `flask prune-sync-ops` (cron).
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import JudgeNomination, Participation, Score, ScoreSyncOp, TimeSlot
+from logic import update_contest_status
+import refdata
+
+MAX_BATCH = 200
+OP_ID_MAX_LENGTH = 64
+# Сколько последних результатов операций помнит процесс
+RECENT_SIZE = 20000
+RETENTION_DAYS = 7
+
+_recent = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+class SyncError(ValueError):
+    """Пакет целиком не принят (неверный формат)."""
+
+
+def _remember(judge_id, results):
+    with _recent_lock:
+        for result in results:
+            _recent[(judge_id, result['op_id'])] = result['status']
+            _recent.move_to_end((judge_id, result['op_id']))
+        while len(_recent) > RECENT_SIZE:
+            _recent.popitem(last=False)
+
+
+def _parse(raw_ops):
+    if not isinstance(raw_ops, list):
+        raise SyncError('Ожидается список операций.')
+    if len(raw_ops) > MAX_BATCH:
+        raise SyncError(f'Не больше {MAX_BATCH} операций за раз.')
+    now = datetime.now()
+    ops = []
+    for raw in raw_ops:
+        try:
+            op_id = str(raw['op_id'])
+            op = {
+                'op_id': op_id,
+                'participation_id': int(raw['participation_id']),
+                'criterion_id': int(raw['criterion_id']),
+                'score': int(raw['score']),
+                # Часы клиента могут спешить - правка не может быть «из будущего»
+                'scored_at': min(datetime.fromtimestamp(float(raw['scored_at']) / 1000), now),
+            }
+        except (KeyError, TypeError, ValueError, OverflowError, OSError):
+            raise SyncError('Неверный формат операции.')
+        if not op_id or len(op_id) > OP_ID_MAX_LENGTH:
+            raise SyncError('Неверный id операции.')
+        ops.append(op)
+    return ops
+
+
+def _apply(judge_id, ops):
+    """Проверяет и применяет новые операции. Возвращает (результаты, затронутые строки)."""
+    participation_ids = {op['participation_id'] for op in ops}
+    contest_of = dict(db.session.query(Participation.id, Participation.time_slot_id).filter(
+        Participation.id.in_(participation_ids)))
+    contests = {c.id: c for c in TimeSlot.query.filter(TimeSlot.id.in_(set(contest_of.values())))}
+    assigned = {row.time_slot_id for row in db.session.query(JudgeNomination.time_slot_id).filter(
+        JudgeNomination.judge_id == judge_id, JudgeNomination.time_slot_id.in_(list(contests)))}
+    scores = {(s.participation_id, s.criterion_id): s for s in Score.query.filter(
+        Score.judge_id == judge_id, Score.participation_id.in_(participation_ids))}
+    reference = refdata.get_reference_data()
+
+    results, changed_contests = [], set()
+    # В пакете могут быть несколько правок одной оценки - применяем по порядку времени
+    for op in sorted(ops, key=lambda o: o['scored_at']):
+        contest = contests.get(contest_of.get(op['participation_id']))
+        criteria = {c.id: c for c in reference.template_criteria(contest.nomination_template_id)} if contest else {}
+        criterion = criteria.get(op['criterion_id'])
+        result = {'op_id': op['op_id'], 'participation_id': op['participation_id'],
+                  'criterion_id': op['criterion_id']}
+
+        if contest is None or contest.id not in assigned:
+            result.update(status='rejected', error='Вы не назначены судьей на этот конкурс.')
+        elif contest.status in (None, 'pending'):
+            result.update(status='rejected', error='Судейство для этого конкурса еще не началось.')
+        elif criterion is None:
+            result.update(status='rejected', error='Критерий не относится к этому конкурсу.')
+        elif not 0 <= op['score'] <= criterion.max_score:
+            result.update(status='rejected', error=f'Оценка по критерию "{criterion.name}" должна быть от 0 до {criterion.max_score}.')
+        else:
+            key = (op['participation_id'], op['criterion_id'])
+            existing = scores.get(key)
+            if existing is None:
+                scores[key] = Score(judge_id=judge_id, participation_id=op['participation_id'],
+                                    criterion_id=op['criterion_id'], score=op['score'], scored_at=op['scored_at'])
+                db.session.add(scores[key])
+                result['status'] = 'applied'
+            elif existing.scored_at is None or existing.scored_at <= op['scored_at']:
+                existing.score = op['score']
+                existing.scored_at = op['scored_at']
+                result['status'] = 'applied'
+            else:
+                # На сервере правка новее - клиент получит ее значение в rows
+                result['status'] = 'stale'
+            if result['status'] == 'applied':
+                changed_contests.add(contest.id)
+        results.append(result)
+
+    db.session.add_all(ScoreSyncOp(judge_id=judge_id, op_id=r['op_id'], status=r['status']) for r in results)
+    # Статусы конкурсов и уведомления - в той же транзакции, что и оценки
+    db.session.flush()
+    for contest_id in changed_contests:
+        update_contest_status(contests[contest_id])
+
+    # Состояние затронутых строк в том же виде, что считает judging_page()
+    rows = {}
+    for participation_id in participation_ids:
+        contest = contests.get(contest_of.get(participation_id))
+        if contest is None or contest.id not in assigned:
+            continue
+        criteria = reference.template_criteria(contest.nomination_template_id)
+        row = {c.id: scores[(participation_id, c.id)].score for c in criteria if (participation_id, c.id) in scores}
+        rows[participation_id] = {
+            'scores': {str(c_id): value for c_id, value in row.items()},
+            'avg': round(sum(row.values()) / len(row), 2) if row else None,
+            'fully_scored': bool(criteria) and len(row) == len(criteria),
+            'contest_status': contest.status,
+        }
+    return results, rows
+
+
+def sync(judge_id, raw_ops):
+    """
+    Применяет пакет операций судьи. Возвращает (результаты по op_id, состояние затронутых строк).
+    SyncError - пакет не принят целиком.
+    """
+    ops = _parse(raw_ops)
+    # Повторы внутри пакета и недавние повторы - без обращения к БД
+    unique = OrderedDict()
+    for op in ops:
+        unique.setdefault(op['op_id'], op)
+    with _recent_lock:
+        known = {op_id: _recent[(judge_id, op_id)] for op_id in unique if (judge_id, op_id) in _recent}
+
+    for attempt in range(2):
+        pending = [op for op_id, op in unique.items() if op_id not in known]
+        if pending:
+            known.update(db.session.query(ScoreSyncOp.op_id, ScoreSyncOp.status).filter(
+                ScoreSyncOp.judge_id == judge_id, ScoreSyncOp.op_id.in_([op['op_id'] for op in pending])))
+            pending = [op for op in pending if op['op_id'] not in known]
+        if not pending:
+            results, rows = [], {}
+            break
+        try:
+            results, rows = _apply(judge_id, pending)
+            db.session.commit()
+            break
+        except IntegrityError:
+            # Тот же op_id только что записал другой воркер - разбираем пакет заново
+            db.session.rollback()
+            if attempt:
+                raise
+    applied = {r['op_id']: r for r in results}
+    response = [applied.get(op_id) or {'op_id': op_id, 'status': known[op_id], 'duplicate': True}
+                for op_id in unique]
+    _remember(judge_id, response)
+    return response, rows
+
+
+def prune(older_than_days=RETENTION_DAYS):
+    """Удаляет записи об операциях старше срока: клиенты столько не повторяют."""
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    deleted = db.session.execute(delete(ScoreSyncOp).where(ScoreSyncOp.created_at < cutoff)).rowcount
+    db.session.commit()
+    return deleted
+
+
+@click.command('prune-sync-ops')
+@click.option('--days', default=RETENTION_DAYS, show_default=True, help='Хранить операции столько дней.')
+@with_appcontext
+def prune_sync_ops_command(days):
+    """Удалить старые записи офлайн-синхронизации оценок."""
+    click.echo(f'Удалено операций: {prune(days)}')
+
+
+def init_app(app):
+    app.cli.add_command(prune_sync_ops_command)
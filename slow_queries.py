@@ -0,0 +1,219 @@
+# slow_queries.py
+# Журнал медленных SQL-запросов.
+#
+# Хуки before/after_cursor_execute замеряют каждый запрос. Если он дольше
+# порога SLOW_QUERY_THRESHOLD_MS, в журнал (ротируемый файл JSON-строк)
+# пишутся: текст и параметры, длительность, endpoint запроса, место в нашем
+# коде, откуда запрос ушел (например, .all() после joinedload в
+# routes/admin.py), и план выполнения (EXPLAIN QUERY PLAN в SQLite, EXPLAIN
+# в PostgreSQL). Страница /admin/slow-queries группирует записи по месту
+# вызова и подсвечивает полные просмотры таблиц - кандидатов на индекс.
+
+import json
+import linecache
+import logging
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_THIS_FILE = os.path.abspath(__file__)
+_listening = False
+
+
+class SlowQueryLog:
+    def __init__(self, app=None):
+        self.app = None
+        self.path = None
+        self.root = None
+        self.threshold = None
+        self._logger = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        global _listening
+        self.app = app
+        threshold_ms = app.config.get('SLOW_QUERY_THRESHOLD_MS')
+        self.threshold = threshold_ms / 1000.0 if threshold_ms else None
+        self.path = app.config.get('SLOW_QUERY_LOG') or os.path.join(app.instance_path, 'slow_queries.log')
+        self.root = app.root_path + os.sep
+        app.extensions['slow_queries'] = self
+
+        if self.threshold is not None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            handler = RotatingFileHandler(self.path, encoding='utf-8',
+                                          maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 1024 * 1024),
+                                          backupCount=app.config.get('SLOW_QUERY_LOG_BACKUPS', 3))
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._logger = logging.getLogger(f'slow_queries.{id(self)}')
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+
+        if not _listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _forget_failed_query)
+            _listening = True
+
+    # --- Запись ---
+
+    def record(self, conn, cursor, statement, parameters, executemany, elapsed):
+        entry = {
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'duration_ms': round(elapsed * 1000, 1),
+            'statement': statement,
+            'parameters': _format_parameters(parameters, executemany),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'path': request.path if has_request_context() else None,
+            'call_site': self._call_site(),
+            'plan': None,
+        }
+        head = statement.lstrip()[:6].upper()
+        if not executemany and (head.startswith('SELECT') or head.startswith('WITH')):
+            entry['plan'] = self._explain(conn, statement, parameters)
+        self._logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def _call_site(self):
+        """Первый кадр из кода приложения (не библиотек и не этого модуля)."""
+        frame = sys._getframe(1)
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(self.root) and filename != _THIS_FILE and 'site-packages' not in filename:
+                relative = filename[len(self.root):]
+                code = linecache.getline(filename, frame.f_lineno).strip()
+                return {'file': relative, 'line': frame.f_lineno, 'function': frame.f_code.co_name, 'code': code}
+            frame = frame.f_back
+        return None
+
+    def _explain(self, conn, statement, parameters):
+        dialect = conn.dialect.name
+        if dialect == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN '
+        elif dialect == 'postgresql':
+            prefix = 'EXPLAIN ANALYZE ' if self.app.config.get('SLOW_QUERY_EXPLAIN_ANALYZE') else 'EXPLAIN '
+        else:
+            return None
+        # Сырой курсор DBAPI: план не проходит через хуки и не попадает в журнал сам
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception as e:
+            return [f'EXPLAIN не выполнен: {e}']
+        finally:
+            cursor.close()
+        if dialect == 'sqlite':
+            # (id, parent, notused, detail) -> строки с отступами по вложенности
+            depth = {0: 0}
+            lines = []
+            for node_id, parent, _, detail in rows:
+                depth[node_id] = depth.get(parent, 0) + 1
+                lines.append('  ' * (depth[node_id] - 1) + detail)
+            return lines
+        return [row[0] for row in rows]
+
+    # --- Чтение для страницы администратора ---
+
+    def _files(self):
+        backups = self.app.config.get('SLOW_QUERY_LOG_BACKUPS', 3)
+        # Старые файлы первыми, чтобы последние записи оказались в конце
+        candidates = [f'{self.path}.{i}' for i in range(backups, 0, -1)] + [self.path]
+        return [path for path in candidates if os.path.exists(path)]
+
+    def recent(self, limit=2000):
+        entries = deque(maxlen=limit)
+        for path in self._files():
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        return list(entries)
+
+    def summary(self, entries):
+        """Группировка по месту вызова и тексту запроса: сколько раз, среднее и максимум, последний план."""
+        groups = {}
+        for entry in entries:
+            site = entry.get('call_site') or {}
+            key = (site.get('file'), site.get('line'), entry['statement'])
+            group = groups.setdefault(key, {'call_site': site, 'statement': entry['statement'], 'count': 0,
+                                            'total_ms': 0.0, 'max_ms': 0.0, 'endpoints': set()})
+            group['count'] += 1
+            group['total_ms'] += entry['duration_ms']
+            group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+            group['plan'] = entry.get('plan') or group.get('plan')
+            if entry.get('endpoint'):
+                group['endpoints'].add(entry['endpoint'])
+        result = []
+        for group in groups.values():
+            group['avg_ms'] = round(group['total_ms'] / group['count'], 1)
+            group['full_scans'] = full_scans(group.get('plan'))
+            result.append(group)
+        return sorted(result, key=lambda g: g['total_ms'], reverse=True)
+
+    def clear(self):
+        for path in self._files():
+            with open(path, 'w', encoding='utf-8'):
+                pass
+
+
+def full_scans(plan):
+    """Полные просмотры таблиц в плане ('SCAN scores' без индекса) - вероятно, не хватает индекса."""
+    scans = []
+    for line in plan or []:
+        detail = line.strip()
+        if detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail:
+            scans.append(detail)
+        elif detail.startswith('Seq Scan on '):
+            scans.append(detail)
+    return scans
+
+
+def _format_parameters(parameters, executemany):
+    if executemany:
+        rows = list(parameters)
+        text = f'{len(rows)} строк, первая: {rows[0]!r}' if rows else '[]'
+    else:
+        text = repr(parameters)
+    return text[:1000]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if not has_app_context():
+        return
+    log = current_app.extensions.get('slow_queries')
+    if log is None or log.threshold is None or elapsed < log.threshold:
+        return
+    try:
+        log.record(conn, cursor, statement, parameters, executemany, elapsed)
+    except Exception:
+        current_app.logger.exception('Не удалось записать медленный запрос')
+
+
+def _forget_failed_query(context):
+    # after_cursor_execute не вызывается для упавшего запроса - снимаем его отметку,
+    # иначе на соединении из пула копятся записи и вложенные замеры смещаются
+    if context.connection is not None and context.statement is not None:
+        started = context.connection.info.get('_query_started')
+        if started:
+            started.pop()
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,70 @@
+// static/js/judging-sw.js
+// Service worker страниц судейства (отдается как /judging/sw.js, область - /judging/).
+//
+// Страница конкурса: сначала сеть, без сети - последняя сохраненная копия.
+// Стили и скрипты (/assets/ с хэшем в имени, Bootstrap с CDN) не меняются
+// под тем же адресом - берутся из кэша. Оценки сюда не попадают: их очередь
+// и синхронизация - в самой странице (judging_page.html, /judging/sync).
+
+const CACHE = 'judging-v1';
+const PAGE = /^\/judging\/\d+$/;
+
+self.addEventListener('install', function () {
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', function (event) {
+    event.waitUntil(
+        caches.keys().then(function (keys) {
+            return Promise.all(keys.filter(function (key) { return key !== CACHE; }).map(function (key) {
+                return caches.delete(key);
+            }));
+        }).then(function () {
+            return self.clients.claim();
+        })
+    );
+});
+
+function networkFirst(request) {
+    return fetch(request).then(function (response) {
+        // Редирект на вход или ошибку не сохраняем - иначе без сети откроется он
+        if (response.ok && !response.redirected) {
+            const copy = response.clone();
+            caches.open(CACHE).then(function (cache) { cache.put(request, copy); });
+        }
+        return response;
+    }).catch(function () {
+        return caches.match(request).then(function (cached) {
+            return cached || new Response(
+                '<!doctype html><meta charset="utf-8"><p>Нет связи, а эта страница еще не открывалась на устройстве.</p>',
+                {status: 503, headers: {'Content-Type': 'text/html; charset=utf-8'}}
+            );
+        });
+    });
+}
+
+function cacheFirst(request) {
+    return caches.match(request).then(function (cached) {
+        return cached || fetch(request).then(function (response) {
+            if (response.ok || response.type === 'opaque') {
+                const copy = response.clone();
+                caches.open(CACHE).then(function (cache) { cache.put(request, copy); });
+            }
+            return response;
+        });
+    });
+}
+
+self.addEventListener('fetch', function (event) {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    if (url.origin === self.location.origin && PAGE.test(url.pathname)) {
+        event.respondWith(networkFirst(request));
+    } else if ((url.origin === self.location.origin && url.pathname.startsWith('/assets/')) ||
+               url.hostname === 'cdn.jsdelivr.net') {
+        event.respondWith(cacheFirst(request));
+    }
+});
@@ -0,0 +1,42 @@
+# streaming.py
+# Потоковый рендер больших страниц админки.
+#
+# stream_page() - замена render_template(): HTML уходит клиенту частями по мере
+# рендера шаблона, и браузер начинает рисовать первые конкурсы, пока остальные
+# еще считаются (если данные в контекст переданы генераторами). Части
+# склеиваются до STREAM_CHUNK_SIZE, чтобы не слать сеть и компрессор
+# (compression.py) по паре байт.
+#
+# Ограничения потокового ответа: заголовки и cookie сессии уходят до рендера
+# тела, а ошибка в середине шаблона обрывает страницу, а не дает 500.
+
+from flask import Response, current_app, get_flashed_messages, stream_template
+
+
+def _buffered(pieces, size):
+    buffer, length = [], 0
+    try:
+        for piece in pieces:
+            buffer.append(piece)
+            length += len(piece)
+            if length >= size:
+                yield ''.join(buffer)
+                buffer, length = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        pieces.close()
+
+
+def stream_page(template_name, **context):
+    """Как render_template, но возвращает потоковый ответ."""
+    # Флеш-сообщения забираем из сессии сейчас: cookie уйдет с заголовками,
+    # а шаблон получит их из кэша запроса
+    get_flashed_messages()
+    response = Response(
+        _buffered(stream_template(template_name, **context), current_app.config.get('STREAM_CHUNK_SIZE', 8192)),
+        mimetype='text/html',
+    )
+    # nginx не должен копить ответ целиком перед отправкой
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,119 @@
+# sweeper.py
+# Перевод статусов слотов по времени.
+#
+# Переходы, которые зависят только от часов, выполняет периодический проход
+# (поток в процессе или команда `flask sweep-slots` для cron) - по одному
+# UPDATE на переход сразу для всех подходящих слотов. Страницы доверяют
+# сохраненному статусу и не пересчитывают его на каждый запрос.
+#
+#   конкурс:      pending   -> judging   наступило время начала
+#   конкурс:      completed -> awarded   закончилось награждение того же дня и категории
+#   награждение:  pending   -> awarded   закончилось само награждение
+#
+# Переход judging -> completed зависит от оценок, а не от времени, и
+# выполняется при их сохранении (logic.update_contest_status).
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import TimeSlot
+import leaderboard
+import notifications
+
+logger = logging.getLogger(__name__)
+
+
+def _advance(condition, new_status):
+    """Один UPDATE на переход. Пустые проходы ничего не пишут (и не сбрасывают версии кэшей)."""
+    ids = list(db.session.scalars(select(TimeSlot.id).where(condition)))
+    if ids:
+        db.session.execute(update(TimeSlot).where(TimeSlot.id.in_(ids), condition).values(status=new_status),
+                           execution_options={'synchronize_session': False})
+    return ids
+
+
+def sweep(now=None):
+    """Продвигает статусы всех слотов, чье время пришло. Возвращает {переход: число слотов}."""
+    now = now or datetime.now()
+    is_pending = or_(TimeSlot.status.is_(None), TimeSlot.status == 'pending')
+
+    started = _advance(and_(TimeSlot.type == 'judging', is_pending, TimeSlot.start_time <= now), 'judging')
+    if started:
+        # Уведомления - в той же транзакции, что и смена статуса
+        notifications.enqueue_contest_start(started)
+
+    award = aliased(TimeSlot)
+    award_finished = select(award.id).where(
+        award.type == 'award', award.day_id == TimeSlot.day_id,
+        award.category == TimeSlot.category, award.end_time <= now
+    ).exists()
+    awarded = _advance(and_(TimeSlot.type == 'judging', TimeSlot.status == 'completed', award_finished), 'awarded')
+
+    awards_done = _advance(and_(TimeSlot.type == 'award', is_pending, TimeSlot.end_time <= now), 'awarded')
+
+    # Статус конкурса виден на публичном табло
+    leaderboard.mark_contests(started + awarded)
+
+    db.session.commit()
+    return {'started': len(started), 'awarded': len(awarded), 'awards_done': len(awards_done)}
+
+
+class SlotSweeper:
+    def __init__(self, app=None):
+        self.app = None
+        self._started = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['sweeper'] = self
+        app.cli.add_command(sweep_slots_command)
+        if app.config.get('SWEEPER_ENABLED', True):
+            # Как и jobs.py, стартуем на первом запросе, а не в CLI
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            threading.Thread(target=self._loop, name='slot-sweeper', daemon=True).start()
+
+    def _loop(self):
+        interval = self.app.config.get('SWEEPER_INTERVAL', 30)
+        while True:
+            with self.app.app_context():
+                try:
+                    counts = sweep()
+                    if any(counts.values()):
+                        logger.info('Статусы слотов обновлены: %s', counts)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Ошибка при обновлении статусов слотов')
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+
+@click.command('sweep-slots')
+@with_appcontext
+def sweep_slots_command():
+    """Обновить статусы слотов по времени (для запуска из cron)."""
+    counts = sweep()
+    click.echo(f"Начато конкурсов: {counts['started']}, награждено конкурсов: {counts['awarded']}, "
+               f"завершено награждений: {counts['awards_done']}")
+
+
+slot_sweeper = SlotSweeper()
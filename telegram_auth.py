@@ -0,0 +1,50 @@
+# telegram_auth.py
+# Проверка initData, которую Telegram передает в WebApp.
+# Алгоритм: https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app
+
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import parse_qsl
+
+
+def verify_init_data(init_data, bot_token, max_age=None):
+    """
+    Проверяет подпись initData токеном бота.
+    Возвращает словарь пользователя Telegram ({'id': ..., 'first_name': ...})
+    или None, если подпись неверна, данные устарели или пользователя в них нет.
+    """
+    if not init_data or not bot_token:
+        return None
+
+    try:
+        pairs = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=True))
+    except ValueError:
+        return None
+
+    received_hash = pairs.pop('hash', None)
+    if not received_hash:
+        return None
+
+    data_check_string = '\n'.join(f'{key}={value}' for key, value in sorted(pairs.items()))
+    secret_key = hmac.new(b'WebAppData', bot_token.encode(), hashlib.sha256).digest()
+    expected_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected_hash, received_hash):
+        return None
+
+    if max_age:
+        try:
+            auth_date = int(pairs.get('auth_date', 0))
+        except ValueError:
+            return None
+        if time.time() - auth_date > max_age:
+            return None
+
+    try:
+        user = json.loads(pairs.get('user', 'null'))
+    except ValueError:
+        return None
+    if not isinstance(user, dict) or 'id' not in user:
+        return None
+    return user
@@ -0,0 +1,100 @@
+# tests/conftest.py
+# Общие фикстуры: приложение на временной SQLite-базе без фоновых потоков.
+
+import os
+import sys
+from datetime import date, datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+
+def make_config(base_dir):
+    """Конфигурация тестового приложения: база и все служебные каталоги - в base_dir."""
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(base_dir, "test.db")}'
+        JOBS_ENABLED = False
+        SWEEPER_ENABLED = False
+        NOTIFIER_ENABLED = False
+        WARMUP_ON_START = False
+        JINJA_BYTECODE_CACHE_DIR = None
+        SLOW_QUERY_THRESHOLD_MS = None
+        PROFILES_DIR = os.path.join(base_dir, 'profiles')
+        METRICS_DIR = os.path.join(base_dir, 'metrics')
+        TIMELINE_DIR = os.path.join(base_dir, 'timeline')
+        ASSETS_DIR = os.path.join(base_dir, 'assets')
+        ARCHIVE_DIR = os.path.join(base_dir, 'archive')
+    return TestConfig
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    from app import create_app
+    # Слушатели событий и расширения - на уровне модулей, поэтому приложение одно на сессию
+    return create_app(make_config(str(tmp_path_factory.mktemp('app'))))
+
+
+@pytest.fixture
+def db(app):
+    """Чистая схема на каждый тест, внутри контекста приложения."""
+    from extensions import db
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def festival_day(db):
+    """Фестиваль из одного дня, шаблон с одним критерием, судья и участник-профи."""
+    from models import Criterion, EventDay, Festival, NominationTemplate, User
+    judge = User(code='200001', nickname='judge1', role='judge')
+    participant = User(code='100001', nickname='pro1', role='participant', experience_category='pro')
+    criterion = Criterion(name='Техника', max_score=10, order=1)
+    template = NominationTemplate(name='ЧБ', participant_type='both', criteria=[criterion])
+    festival = Festival(name='F', start_date=date(2025, 7, 10), end_date=date(2025, 7, 10))
+    db.session.add_all([judge, participant, criterion, template, festival])
+    db.session.flush()
+    day = EventDay(festival_id=festival.id, date=date(2025, 7, 10), day_order=1)
+    db.session.add(day)
+    db.session.commit()
+    return {'day': day, 'template': template, 'criterion': criterion, 'judge': judge, 'participant': participant}
+
+
+@pytest.fixture
+def contest(db, festival_day):
+    """Идущий конкурс 10:00-11:00 в зоне A: участник festival_day записан, судья назначен."""
+    from models import JudgeNomination, Participation, TimeSlot
+    day = festival_day['day']
+    slot = TimeSlot(day_id=day.id, start_time=at(day, 10), end_time=at(day, 11), slot_order=1,
+                    type='judging', zone='A', status='judging',
+                    nomination_template_id=festival_day['template'].id, category='fresh')
+    db.session.add(slot)
+    db.session.flush()
+    participation = Participation(user_id=festival_day['participant'].id, time_slot_id=slot.id)
+    db.session.add_all([participation, JudgeNomination(judge_id=festival_day['judge'].id, time_slot_id=slot.id)])
+    db.session.commit()
+    return dict(festival_day, slot=slot, participation=participation)
+
+
+@pytest.fixture
+def admin_client(app, db):
+    """Клиент с сессией администратора."""
+    from models import User
+    admin = User(code='900001', nickname='admin', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = admin.id
+        session['user_role'] = 'admin'
+    return client
+
+
+def at(day, hour, minute=0):
+    return datetime.combine(day.date, datetime.min.time()).replace(hour=hour, minute=minute)
@@ -0,0 +1,81 @@
+# tests/telegram_stub.py
+# Локальная заглушка Telegram Bot API (sendMessage) для тестов отправителя уведомлений.
+#
+# Слушает 127.0.0.1 на свободном порту; адрес - в .url, его ставят в TELEGRAM_API_URL.
+# Для каждого текста сообщения можно заранее задать ответы (например, 429 или 500),
+# которые вернутся на первые запросы с этим текстом; остальные запросы успешны.
+# Можно запустить и вручную: python tests/telegram_stub.py [порт]
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class TelegramStub:
+    def __init__(self, port=0):
+        self.requests = []    # (время, chat_id, text, код ответа) - все запросы
+        self.delivered = []   # (chat_id, text) - успешно принятые сообщения
+        self._script = {}     # text -> [(код, тело), ...]
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def respond(self, text, *responses):
+        """Первые запросы с этим текстом получат заданные (код, тело)."""
+        self._script.setdefault(text, []).extend(responses)
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _reply(self, payload):
+        with self._lock:
+            scripted = self._script.get(payload.get('text'))
+            status, body = scripted.pop(0) if scripted else (200, {'ok': True, 'result': {}})
+            self.requests.append((time.monotonic(), payload.get('chat_id'), payload.get('text'), status))
+            if status == 200:
+                self.delivered.append((payload.get('chat_id'), payload.get('text')))
+        return status, body
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not self.path.endswith('/sendMessage'):
+                    status, body = 404, {'ok': False, 'description': 'Not Found'}
+                else:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    status, body = stub._reply(json.loads(self.rfile.read(length) or b'{}'))
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def too_many_requests(retry_after):
+    return 429, {'ok': False, 'error_code': 429, 'description': f'Too Many Requests: retry after {retry_after}',
+                 'parameters': {'retry_after': retry_after}}
+
+
+def server_error():
+    return 500, {'ok': False, 'error_code': 500, 'description': 'Internal Server Error'}
+
+
+if __name__ == '__main__':
+    stub = TelegramStub(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    print(f'Заглушка Bot API: {stub.url}')
+    stub._server.serve_forever()
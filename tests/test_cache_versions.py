@@ -0,0 +1,81 @@
+import multiprocessing
+
+import pytest
+
+from conftest import make_config
+
+TIMEOUT = 30
+
+
+def _serve(base_dir, connection, create_schema):
+    """Процесс-воркер: свое приложение на общей SQLite-базе, команды по каналу."""
+    from app import create_app
+    from extensions import db
+    from models import Criterion
+    import refdata
+
+    app = create_app(make_config(base_dir))
+    if create_schema:
+        with app.app_context():
+            db.create_all()
+    connection.send('ready')
+    while True:
+        command, argument = connection.recv()
+        if command == 'stop':
+            return
+        # Каждая команда - как отдельный запрос: новый контекст приложения и g
+        with app.app_context():
+            if command == 'write':
+                db.session.add(Criterion(name=argument, max_score=10, order=1))
+                db.session.commit()
+                connection.send('ok')
+            elif command == 'rename':
+                Criterion.query.filter_by(name=argument[0]).one().name = argument[1]
+                db.session.commit()
+                connection.send('ok')
+            elif command == 'read':
+                connection.send([c.name for c in refdata.get_reference_data().criteria])
+
+
+class Worker:
+    def __init__(self, context, base_dir, create_schema=False):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(base_dir, child, create_schema), daemon=True)
+        self.process.start()
+        assert self.receive() == 'ready'
+
+    def receive(self):
+        assert self.connection.poll(TIMEOUT), 'воркер не ответил'
+        return self.connection.recv()
+
+    def call(self, command, argument=None):
+        self.connection.send((command, argument))
+        return self.receive()
+
+    def stop(self):
+        self.connection.send(('stop', None))
+        self.process.join(TIMEOUT)
+
+
+@pytest.fixture
+def workers(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    started = [Worker(context, str(tmp_path), create_schema=True)]
+    started += [Worker(context, str(tmp_path)) for _ in range(2)]
+    yield started
+    for worker in started:
+        worker.stop()
+
+
+def test_write_in_one_process_is_visible_in_others_next_read(workers):
+    writer, *readers = workers
+    # Читатели кэшируют пустой справочник
+    assert [reader.call('read') for reader in readers] == [[], []]
+
+    assert writer.call('write', 'Техника') == 'ok'
+    assert [reader.call('read') for reader in readers] == [['Техника'], ['Техника']]
+
+    assert writer.call('rename', ('Техника', 'Композиция')) == 'ok'
+    assert [reader.call('read') for reader in readers] == [['Композиция'], ['Композиция']]
+    # Запись пишущего процесса видна и ему самому
+    assert writer.call('read') == ['Композиция']
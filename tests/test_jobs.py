@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from jobs import JobRunner, job_handler
+from models import Job
+
+released = threading.Event()
+started = threading.Event()
+
+
+@job_handler('test_blocking')
+def _blocking_job(payload, progress):
+    started.set()
+    assert released.wait(10)
+    return payload
+
+
+@pytest.fixture
+def runner(app, db, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOBS_LEASE', 60)
+    runner = JobRunner()
+    runner.app = app
+    runner._executor = ThreadPoolExecutor(max_workers=1)
+    started.clear()
+    released.clear()
+    yield runner
+    released.set()
+    runner._executor.shutdown(wait=True)
+
+
+def _running(db, worker, heartbeat_age=None, started_age=0):
+    now = datetime.utcnow()
+    job = Job(type='test_blocking', status='running', worker=worker, attempts=1,
+              started_at=now - timedelta(seconds=started_age),
+              heartbeat_at=now - timedelta(seconds=heartbeat_age) if heartbeat_age is not None else None)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def _status(db, job_id):
+    db.session.expire_all()
+    job = db.session.get(Job, job_id)
+    return job.status, job.worker
+
+
+def test_expired_lease_is_requeued_from_any_host(runner, db):
+    stale = _running(db, 'otherhost:101', heartbeat_age=120)
+    fresh = _running(db, 'otherhost:102', heartbeat_age=5)
+    legacy = _running(db, 'otherhost:103', started_age=120)  # до появления heartbeat_at
+
+    runner._requeue_orphans()
+
+    assert _status(db, stale) == ('queued', None)
+    assert _status(db, fresh) == ('running', 'otherhost:102')
+    assert _status(db, legacy) == ('queued', None)
+
+
+def test_own_running_job_keeps_its_lease(app, runner, db, monkeypatch):
+    job = Job(type='test_blocking', payload='1')
+    db.session.add(job)
+    db.session.commit()
+    job_id = job.id
+
+    with app.app_context():
+        runner._dispatch()
+    assert started.wait(10)
+    assert _status(db, job_id) == ('running', runner.worker_name)
+    claimed = db.session.get(Job, job_id).heartbeat_at
+
+    # Аренда короче времени выполнения: продление не дает забрать задачу
+    monkeypatch.setitem(app.config, 'JOBS_LEASE', 0)
+    with app.app_context():
+        runner._heartbeat()
+        runner._requeue_orphans()
+    assert _status(db, job_id) == ('running', runner.worker_name)
+    assert db.session.get(Job, job_id).heartbeat_at > claimed
+
+    released.set()
+    runner._executor.shutdown(wait=True)
+    assert _status(db, job_id)[0] == 'done'
+    assert not runner._running
@@ -0,0 +1,56 @@
+import json
+
+import leaderboard
+from models import LeaderboardSnapshot, Score, Winner
+
+
+def _snapshot(db, slot_id):
+    db.session.expire_all()
+    snapshot = db.session.get(LeaderboardSnapshot, slot_id)
+    return snapshot.version, json.loads(snapshot.payload)
+
+
+def test_snapshot_follows_scores_names_and_winners(db, contest):
+    slot, participation = contest['slot'], contest['participation']
+    slot_id = slot.id
+    version, payload = _snapshot(db, slot_id)
+    assert payload['standings']['pro'] == [{'entry': 1, 'name': 'pro1', 'place': None, 'score': None}]
+
+    score = Score(judge_id=contest['judge'].id, participation_id=participation.id,
+                  criterion_id=contest['criterion'].id, score=8)
+    db.session.add(score)
+    db.session.commit()
+    version_scored, payload = _snapshot(db, slot_id)
+    assert version_scored == version + 1
+    assert payload['standings']['pro'][0] == {'entry': 1, 'name': 'pro1', 'place': 1, 'score': 8.0}
+
+    # Смена ника пересобирает конкурсы участника
+    contest['participant'].nickname = 'Мастер'
+    db.session.commit()
+    version_renamed, payload = _snapshot(db, slot_id)
+    assert version_renamed == version_scored + 1
+    assert payload['standings']['pro'][0]['name'] == 'Мастер'
+
+    db.session.add(Winner(participation_id=participation.id, time_slot_id=slot_id,
+                          experience_category='pro', place=1))
+    db.session.commit()
+    assert db.session.get(LeaderboardSnapshot, slot_id).has_winners
+    assert _snapshot(db, slot_id)[1]['winners']['pro'] == [{'entry': 1, 'name': 'Мастер', 'place': 1}]
+
+
+def test_rebuild_without_changes_keeps_version(db, contest):
+    slot_id = contest['slot'].id
+    version, payload = _snapshot(db, slot_id)
+
+    assert leaderboard.rebuild(db.session.connection(), [slot_id]) == 0
+    assert leaderboard.rebuild_all() == 1
+    assert _snapshot(db, slot_id) == (version, payload)
+
+
+def test_snapshot_is_dropped_with_contest(db, contest):
+    slot = contest['slot']
+    slot_id = slot.id
+    db.session.delete(contest['participation'])
+    db.session.delete(slot)
+    db.session.commit()
+    assert db.session.get(LeaderboardSnapshot, slot_id) is None
@@ -0,0 +1,23 @@
+from sqlalchemy import delete
+
+import logic
+from models import Score, ScoreCube
+
+
+def test_contest_completes_from_scores_even_if_cube_drifted(db, contest):
+    db.session.add(Score(judge_id=contest['judge'].id, participation_id=contest['participation'].id,
+                         criterion_id=contest['criterion'].id, score=7))
+    db.session.commit()
+    # Куб разошелся с оценками (например, после сбоя пересчета) - на завершение это не влияет
+    db.session.execute(delete(ScoreCube))
+    db.session.commit()
+
+    slot = contest['slot']
+    assert logic.update_contest_status(slot)
+    db.session.commit()
+    assert slot.status == 'completed'
+
+
+def test_contest_stays_judging_until_all_scores(db, contest):
+    assert not logic.update_contest_status(contest['slot'])
+    assert contest['slot'].status == 'judging'
@@ -0,0 +1,96 @@
+import json
+import os
+import time
+
+import pytest
+
+from metrics import LATENCY, REQUESTS, RETIRED_FILE
+
+LABELS = ('test', 'test.view', 'GET', '200')  # этих меток текущий процесс не увеличивает
+
+
+@pytest.fixture
+def metrics(app, tmp_path, monkeypatch):
+    metrics = app.extensions['metrics']
+    monkeypatch.setattr(metrics, 'directory', str(tmp_path))
+    return metrics
+
+
+def _worker_snapshot(directory, pid, requests, age=0):
+    path = os.path.join(directory, f'{pid}.json')
+    histogram = [0] * (len(LATENCY.buckets) + 2)
+    histogram[0], histogram[-2], histogram[-1] = requests, 0.001 * requests, requests
+    with open(path, 'w') as f:
+        json.dump({REQUESTS.name: [[list(LABELS), requests]],
+                   LATENCY.name: [[list(LABELS[:2]), histogram]]}, f)
+    if age:
+        os.utime(path, (time.time() - age, time.time() - age))
+    return path
+
+
+def _totals(metrics, app):
+    with app.app_context():
+        merged = metrics.collect()
+    return merged[REQUESTS.name].get(LABELS), merged[LATENCY.name].get(LABELS[:2])[-1]
+
+
+def test_stale_snapshot_is_folded_into_retired(app, metrics):
+    stale_after = app.config['METRICS_STALE_AFTER']
+    first = _worker_snapshot(metrics.directory, 990001, 5)
+    _worker_snapshot(metrics.directory, 990002, 2)
+    assert _totals(metrics, app) == (7, 7)
+
+    # Воркер завершился: его снимок устарел и удаляется, но сумма не уменьшается
+    os.utime(first, (time.time() - stale_after - 1, time.time() - stale_after - 1))
+    assert _totals(metrics, app) == (7, 7)
+    assert not os.path.exists(first)
+    assert os.path.exists(os.path.join(metrics.directory, RETIRED_FILE))
+
+    # Следующий завершившийся воркер прибавляется к уже накопленному
+    _worker_snapshot(metrics.directory, 990003, 4, age=stale_after + 1)
+    assert _totals(metrics, app) == (11, 11)
+    assert _totals(metrics, app) == (11, 11)
+    assert sorted(set(os.listdir(metrics.directory)) - {f'{os.getpid()}.json'}) == [
+        '990002.json', RETIRED_FILE, 'retired.lock']
+
+
+def test_idle_worker_keeps_its_snapshot_fresh(app, metrics, monkeypatch):
+    path = os.path.join(metrics.directory, f'{os.getpid()}.json')
+    stale_after = app.config['METRICS_STALE_AFTER']
+    ages = []
+
+    def sleep(seconds):
+        # Воркер простаивает без запросов дольше METRICS_STALE_AFTER
+        ages.append(time.time() - os.path.getmtime(path))
+        os.utime(path, (time.time() - stale_after - 1, time.time() - stale_after - 1))
+        if len(ages) == 2:
+            raise StopIteration
+
+    monkeypatch.setattr(time, 'sleep', sleep)
+    with pytest.raises(StopIteration):
+        metrics._dump_loop()
+    # Снимок обновляет поток, а не запрос: после простоя он снова свежий и не уходит в retired
+    assert all(age < stale_after for age in ages)
+
+
+def test_streamed_page_is_timed_until_body_is_sent(app, admin_client, contest, monkeypatch):
+    import refdata
+    labels = ('admin', 'admin.admin_results_view')
+    reference = type(refdata.get_reference_data())
+    template_criteria = reference.template_criteria
+
+    def slow_criteria(self, template_id):
+        # Результаты конкурса считаются при рендере тела - уже после after_request
+        time.sleep(0.2)
+        return template_criteria(self, template_id)
+
+    monkeypatch.setattr(reference, 'template_criteria', slow_criteria)
+    before = list(LATENCY.values.get(labels, [0] * (len(LATENCY.buckets) + 2)))
+    response = admin_client.get('/admin/results')
+    assert response.is_streamed
+    response.get_data()
+    response.close()
+
+    after = LATENCY.values[labels]
+    assert after[-1] == before[-1] + 1
+    assert after[-2] - before[-2] >= 0.2
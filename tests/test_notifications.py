@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from models import Notification
+from notifications import TelegramNotifier
+from telegram_stub import TelegramStub, server_error, too_many_requests
+
+
+@pytest.fixture
+def stub(app, monkeypatch):
+    stub = TelegramStub().start()
+    for key, value in {'TELEGRAM_BOT_TOKEN': 'test-token', 'TELEGRAM_API_URL': stub.url,
+                       'NOTIFIER_BATCH_SIZE': 2, 'NOTIFIER_GLOBAL_RATE': 1000,
+                       'NOTIFIER_CHAT_INTERVAL': 0.01, 'NOTIFIER_RETRY_DELAY': 0}.items():
+        monkeypatch.setitem(app.config, key, value)
+    yield stub
+    stub.stop()
+
+
+def _queue(db, user, messages):
+    """messages: [(chat_id, text)] - строки outbox в порядке постановки."""
+    db.session.add_all(Notification(user_id=user.id, chat_id=chat_id, kind='contest_start', text=text,
+                                    dedup_key=f'test:{chat_id}:{text}') for chat_id, text in messages)
+    db.session.commit()
+
+
+def _drain(app, timeout=15):
+    """Гоняет пачки отправителя, пока в outbox есть что отправлять. Возвращает число пачек."""
+    notifier = TelegramNotifier()
+    notifier.app = app
+
+    def unsent():
+        return Notification.query.filter(Notification.status.in_(('pending', 'sending'))).count()
+
+    async def run():
+        notifier._setup()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        batches = 0
+        while True:
+            if await notifier._process_batch():
+                batches += 1
+                continue
+            if not await asyncio.to_thread(notifier._in_app, unsent):
+                return batches
+            assert loop.time() < deadline, 'outbox не разобран'
+            await asyncio.sleep(0.05)
+
+    return asyncio.run(run())
+
+
+def _by_chat(pairs):
+    chats = {}
+    for chat_id, text in pairs:
+        chats.setdefault(chat_id, []).append(text)
+    return chats
+
+
+def test_outbox_drains_in_batches_and_order(app, db, festival_day, stub):
+    messages = [('A', 'a1'), ('B', 'b1'), ('A', 'a2'), ('B', 'b2'), ('A', 'a3')]
+    _queue(db, festival_day['participant'], messages)
+
+    batches = _drain(app)
+
+    assert batches >= 3  # по NOTIFIER_BATCH_SIZE = 2 сообщения
+    assert _by_chat(stub.delivered) == {'A': ['a1', 'a2', 'a3'], 'B': ['b1', 'b2']}
+    assert sorted(stub.delivered) == sorted(messages)
+    assert {n.status for n in Notification.query} == {'sent'}
+
+
+def test_429_waits_retry_after_and_keeps_chat_order(app, db, festival_day, stub):
+    stub.respond('a1', too_many_requests(1))
+    _queue(db, festival_day['participant'], [('A', 'a1'), ('A', 'a2'), ('B', 'b1')])
+
+    _drain(app)
+
+    assert _by_chat(stub.delivered) == {'A': ['a1', 'a2'], 'B': ['b1']}
+    a1_requests = [(at, status) for at, _, text, status in stub.requests if text == 'a1']
+    assert [status for _, status in a1_requests] == [429, 200]
+    assert a1_requests[1][0] - a1_requests[0][0] >= 0.9
+    # Следующее сообщение чата ушло только после повтора первого
+    a2_at = next(at for at, _, text, _ in stub.requests if text == 'a2')
+    assert a2_at > a1_requests[1][0]
+    # Flood control не считается неудачной попыткой
+    assert Notification.query.filter_by(text='a1').one().attempts == 1
+
+
+def test_retry_after_error_sends_no_duplicates(app, db, festival_day, stub):
+    stub.respond('a1', server_error(), server_error())
+    _queue(db, festival_day['participant'], [('A', 'a1'), ('A', 'a2'), ('B', 'b1')])
+
+    _drain(app)
+
+    assert sorted(stub.delivered) == [('A', 'a1'), ('A', 'a2'), ('B', 'b1')]
+    assert _by_chat(stub.delivered)['A'] == ['a1', 'a2']
+    a1 = Notification.query.filter_by(text='a1').one()
+    assert (a1.status, a1.attempts, a1.error) == ('sent', 3, None)
+    assert [status for _, _, text, status in stub.requests if text == 'a1'] == [500, 500, 200]
+    # Отложенное вслед за сбоем сообщение не отправлялось раньше времени и не задвоилось
+    assert [text for _, _, text, _ in stub.requests].count('a2') == 1
@@ -0,0 +1,35 @@
+import time
+
+import pytest
+
+import refdata
+
+
+@pytest.fixture
+def profiler(app):
+    profiler = app.extensions['profiler']
+    profiler.clear()
+    profiler.save_settings(True, 1.0, ['admin.admin_results_view'])
+    yield profiler
+    profiler.save_settings(False, 1.0, [])
+    profiler.clear()
+
+
+def test_streamed_page_profile_covers_body(admin_client, contest, profiler, monkeypatch):
+    reference = type(refdata.get_reference_data())
+    template_criteria = reference.template_criteria
+
+    def slow_criteria(self, template_id):
+        time.sleep(0.2)
+        return template_criteria(self, template_id)
+
+    monkeypatch.setattr(reference, 'template_criteria', slow_criteria)
+    response = admin_client.get('/admin/results')
+    response.get_data()
+    response.close()
+
+    # teardown_request потокового ответа срабатывает после рендера тела (stream_template
+    # держит контекст запроса до конца генератора) - профиль включает расчет результатов
+    [profile] = profiler.list_profiles()
+    assert profile['endpoint'] == 'admin.admin_results_view'
+    assert profile['duration_ms'] >= 200
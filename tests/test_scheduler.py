@@ -0,0 +1,94 @@
+from conftest import at
+
+import scheduler
+from models import JudgeNomination, Participation, TimeSlot
+
+
+def _slot(db, day, start, end, order, **values):
+    slot = TimeSlot(day_id=day.id, start_time=start, end_time=end, slot_order=order, **values)
+    db.session.add(slot)
+    db.session.commit()
+    return slot
+
+
+def test_replan_overflow_keeps_existing_slots(db, festival_day):
+    day, template = festival_day['day'], festival_day['template']
+    contest = _slot(db, day, at(day, 10), at(day, 11), 1, type='judging', zone='A', status='pending',
+                    nomination_template_id=template.id, category='fresh')
+    award = _slot(db, day, at(day, 11), at(day, 11, 30), 2, type='award', zone='A', category='fresh')
+
+    # День 10:00-12:00 в одной зоне: новый конкурс на 1,5 часа ставится первым,
+    # и существующему конкурсу, а за ним и награждению, места уже не хватает
+    plan, unplaced, dropped_awards = scheduler.plan_day(
+        day, [{'nomination_template_id': template.id, 'category': 'healed', 'duration': 90}],
+        ['A'], 10 * 60, 12 * 60, award_rules={'duration': 30, 'zone': 'A'}, replan=True)
+
+    assert all(item.slot_id is None for item in unplaced)
+    assert [item.category for item in unplaced if item.type == 'judging'] == ['healed']
+    assert dropped_awards == []
+
+    scheduler.apply_plan(day, plan, dropped_awards)
+    db.session.commit()
+    db.session.expire_all()
+
+    # Конкурс остался на своем месте, награждение не удалено
+    assert db.session.get(TimeSlot, contest.id).start_time == at(day, 10)
+    assert db.session.get(TimeSlot, award.id) is not None
+    slots = TimeSlot.query.filter_by(day_id=day.id, zone='A').order_by(TimeSlot.start_time).all()
+    for earlier, later in zip(slots, slots[1:]):
+        assert earlier.end_time <= later.start_time
+
+
+def test_replan_moves_pending_contests_that_fit(db, festival_day):
+    day, template = festival_day['day'], festival_day['template']
+    contest = _slot(db, day, at(day, 14), at(day, 15), 1, type='judging', zone='A', status='pending',
+                    nomination_template_id=template.id, category='fresh')
+
+    plan, unplaced, _ = scheduler.plan_day(day, [], ['A'], 10 * 60, 20 * 60, replan=True)
+    assert unplaced == []
+    scheduler.apply_plan(day, plan)
+    db.session.commit()
+    db.session.expire_all()
+
+    assert db.session.get(TimeSlot, contest.id).start_time == at(day, 10)
+
+
+def _second_day(db, festival_day):
+    from datetime import timedelta
+    from models import EventDay
+    day = festival_day['day']
+    target = EventDay(festival_id=day.festival_id, date=day.date + timedelta(days=1), day_order=2)
+    db.session.add(target)
+    db.session.commit()
+    return target
+
+
+def test_clone_days_shifts_slots_and_copies_judges(db, contest):
+    day, slot = contest['day'], contest['slot']
+    _slot(db, day, at(day, 11), at(day, 11, 30), 2, type='award', zone='A', category='fresh')
+    target = _second_day(db, contest)
+
+    assert scheduler.clone_days([(day, target)], with_judges=True) == (2, 1)
+    db.session.commit()
+
+    cloned = TimeSlot.query.filter_by(day_id=target.id).order_by(TimeSlot.slot_order).all()
+    assert [(s.type, s.start_time, s.end_time, s.slot_order) for s in cloned] == [
+        ('judging', at(target, 10), at(target, 11), 1), ('award', at(target, 11), at(target, 11, 30), 2)]
+    assert [j.judge_id for j in JudgeNomination.query.filter_by(time_slot_id=cloned[0].id)] == [contest['judge'].id]
+    # Участники не копируются
+    assert Participation.query.filter_by(time_slot_id=cloned[0].id).count() == 0
+    assert TimeSlot.query.filter_by(day_id=day.id).count() == 2 and slot.start_time == at(day, 10)
+
+
+def test_clone_into_day_with_slots_is_refused(db, admin_client, contest):
+    day = contest['day']
+    target = _second_day(db, contest)
+    url = f'/admin/day/{day.id}/clone'
+
+    admin_client.post(url, data={'target_day_id': target.id})
+    assert TimeSlot.query.filter_by(day_id=target.id).count() == 1
+
+    # Повторное копирование в тот же день не накладывает второй экземпляр слотов
+    response = admin_client.post(url, data={'target_day_id': target.id}, follow_redirects=True)
+    assert 'Копировать можно только в пустой день' in response.get_data(as_text=True)
+    assert TimeSlot.query.filter_by(day_id=target.id).count() == 1
@@ -0,0 +1,33 @@
+from sqlalchemy import select
+
+import score_cube
+from models import Score, ScoreCube
+
+
+def _cube(db):
+    return sorted(tuple(row) for row in db.session.execute(select(
+        ScoreCube.time_slot_id, ScoreCube.judge_id, ScoreCube.criterion_id, ScoreCube.experience_category,
+        ScoreCube.n, ScoreCube.total, ScoreCube.total_sq)))
+
+
+def test_category_change_moves_cells(db, contest):
+    judge, participant, criterion = contest['judge'], contest['participant'], contest['criterion']
+    slot = contest['slot']
+    score = Score(judge_id=judge.id, participation_id=contest['participation'].id, criterion_id=criterion.id,
+                  score=8)
+    db.session.add(score)
+    db.session.commit()
+    assert _cube(db) == [(slot.id, judge.id, criterion.id, 'pro', 1, 8, 64)]
+
+    # Смена категории без изменения оценок: ячейки переезжают целиком
+    participant.experience_category = 'junior'
+    db.session.commit()
+    assert _cube(db) == [(slot.id, judge.id, criterion.id, 'junior', 1, 8, 64)]
+
+    # Следующая правка оценки ложится в ячейку новой категории
+    score.score = 6
+    db.session.commit()
+    live = _cube(db)
+    assert live == [(slot.id, judge.id, criterion.id, 'junior', 1, 6, 36)]
+    score_cube.rebuild_all()
+    assert _cube(db) == live
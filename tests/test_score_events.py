@@ -0,0 +1,33 @@
+from sqlalchemy import select
+
+import score_events
+from models import Score, ScoreCube, ScoreEvent
+
+
+def test_edit_after_commit_is_logged_and_replayed(app, db, contest):
+    judge, criterion = contest['judge'], contest['criterion']
+    slot = contest['slot']
+    score = Score(judge_id=judge.id, participation_id=contest['participation'].id, criterion_id=criterion.id,
+                  score=8)
+    db.session.add(score)
+    db.session.commit()
+
+    # После коммита атрибуты истекли - прежнее значение все равно попадает в журнал
+    score.score = 6
+    db.session.commit()
+    assert [(e.old_score, e.new_score, e.time_slot_id) for e in ScoreEvent.query.order_by(ScoreEvent.id)] == [
+        (None, 8, slot.id), (8, 6, slot.id)]
+
+    cells = select(ScoreCube.time_slot_id, ScoreCube.judge_id, ScoreCube.criterion_id, ScoreCube.n, ScoreCube.total)
+    live = db.session.execute(cells).all()
+    score_events.replay_cube()
+    db.session.commit()
+    assert db.session.execute(cells).all() == live == [(slot.id, judge.id, criterion.id, 1, 6)]
+
+    # Срез на первое событие - в памяти; живой куб остается актуальным
+    first = ScoreEvent.query.order_by(ScoreEvent.id).first().id
+    assert list(score_events.cube_at(first).values()) == [[1, 8, 64]]
+    result = app.test_cli_runner().invoke(args=['replay-score-events', '--to-offset', str(first)])
+    assert result.exit_code == 0 and 'данные не изменены' in result.output
+    db.session.expire_all()
+    assert db.session.execute(cells).all() == live
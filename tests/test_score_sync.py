@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import score_sync
+from models import Score, ScoreSyncOp, User
+
+
+@pytest.fixture(autouse=True)
+def forget_recent():
+    # Память недавних операций - на процесс, а id судей в пересоздаваемой базе повторяются
+    score_sync._recent.clear()
+    yield
+    score_sync._recent.clear()
+
+
+def _ms(moment):
+    return moment.timestamp() * 1000
+
+
+def _op(contest, op_id, score, scored_at):
+    return {'op_id': op_id, 'participation_id': contest['participation'].id,
+            'criterion_id': contest['criterion'].id, 'score': score, 'scored_at': _ms(scored_at)}
+
+
+def _score(contest):
+    return Score.query.filter_by(participation_id=contest['participation'].id).one()
+
+
+def test_retried_batch_is_applied_once(db, contest):
+    judge_id = contest['judge'].id
+    batch = [_op(contest, 'op-1', 7, datetime.now() - timedelta(minutes=1))]
+
+    response, rows = score_sync.sync(judge_id, batch)
+    assert [(r['op_id'], r['status']) for r in response] == [('op-1', 'applied')]
+    assert rows[contest['participation'].id]['scores'] == {str(contest['criterion'].id): 7}
+
+    # Повтор из памяти процесса и, после ее сброса, из score_sync_ops
+    assert score_sync.sync(judge_id, batch)[0] == [{'op_id': 'op-1', 'status': 'applied', 'duplicate': True}]
+    score_sync._recent.clear()
+    assert score_sync.sync(judge_id, batch + batch)[0] == [
+        {'op_id': 'op-1', 'status': 'applied', 'duplicate': True}]
+    assert Score.query.count() == 1 and ScoreSyncOp.query.count() == 1
+
+
+def test_older_edit_is_stale(db, contest):
+    judge_id, now = contest['judge'].id, datetime.now()
+    score_sync.sync(judge_id, [_op(contest, 'laptop', 9, now - timedelta(minutes=1))])
+
+    # Правка с телефона сделана раньше, но дошла позже - проигрывает
+    response, rows = score_sync.sync(judge_id, [_op(contest, 'phone', 4, now - timedelta(minutes=5))])
+    assert response[0]['status'] == 'stale'
+    assert rows[contest['participation'].id]['scores'] == {str(contest['criterion'].id): 9}
+    assert _score(contest).score == 9
+
+
+def test_client_time_is_clamped_to_server_time(db, contest):
+    judge_id, now = contest['judge'].id, datetime.now()
+    score_sync.sync(judge_id, [_op(contest, 'fast-clock', 5, now + timedelta(days=1))])
+    assert _score(contest).scored_at <= datetime.now()
+
+    # Правка с «убежавшими» часами не перебивает следующую настоящую правку
+    assert score_sync.sync(judge_id, [_op(contest, 'next', 6, datetime.now())])[0][0]['status'] == 'applied'
+    assert _score(contest).score == 6
+
+
+def test_ops_for_closed_or_foreign_contests_are_rejected(db, contest):
+    slot, now = contest['slot'], datetime.now()
+    other_judge = User(code='200002', nickname='judge2', role='judge')
+    db.session.add(other_judge)
+    slot.status = 'pending'
+    db.session.commit()
+
+    response, rows = score_sync.sync(contest['judge'].id, [_op(contest, 'early', 5, now)])
+    assert (response[0]['status'], response[0]['error']) == (
+        'rejected', 'Судейство для этого конкурса еще не началось.')
+
+    slot.status = 'judging'
+    db.session.commit()
+    response, rows = score_sync.sync(other_judge.id, [_op(contest, 'foreign', 5, now)])
+    assert (response[0]['status'], response[0]['error']) == ('rejected', 'Вы не назначены судьей на этот конкурс.')
+    assert rows == {}
+    assert Score.query.count() == 0
@@ -0,0 +1,15 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+
+def test_failed_statement_does_not_leave_start_mark(db):
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('SELECT 1')
+        assert conn.info.get('_query_started') == []
+
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql('SELECT * FROM no_such_table')
+        assert conn.info.get('_query_started') == []
+
+        conn.exec_driver_sql('SELECT 1')
+        assert conn.info.get('_query_started') == []
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+
+import deletion
+from conftest import at
+from timeline import ZoneTimeline, timeline
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    # База пересоздается на каждый тест, а индекс дат живет в процессе
+    timeline._days.clear()
+
+
+def _item(slot_id, start, end):
+    return (datetime(2025, 7, 10, *start), datetime(2025, 7, 10, *end), {'id': slot_id})
+
+
+def test_zone_timeline_current_and_next():
+    zone = ZoneTimeline([_item(2, (11, 0), (12, 0)), _item(1, (10, 0), (11, 0)), _item(3, (13, 0), (14, 0))])
+
+    def ids(*moment):
+        return tuple(slot and slot['id'] for slot in zone.at(datetime(2025, 7, 10, *moment)))
+
+    assert ids(9, 0) == (None, 1)
+    assert ids(10, 0) == (1, 2)
+    # Конец слота не входит в него: на стыке уже идет следующий
+    assert ids(11, 0) == (2, 3)
+    assert ids(12, 30) == (None, 3)
+    assert ids(14, 0) == (None, None)
+
+
+def _names(moment):
+    _, current, _ = timeline.now_next('A', moment)
+    return current and [p['name'] for p in current['participants']]
+
+
+def test_board_forgets_deleted_participant(db, contest):
+    moment = at(contest['day'], 10, 30)
+    assert _names(moment) == ['pro1']
+
+    deletion.purge_user(contest['participant'].id)
+    assert _names(moment) == []
+
+
+def test_board_shows_renamed_participant(db, admin_client, contest):
+    participant, moment = contest['participant'], at(contest['day'], 10, 30)
+    assert _names(moment) == ['pro1']
+
+    admin_client.post(f'/admin/user/{participant.id}/edit',
+                      data={'nickname': 'Мастер', 'role': 'participant', 'experience_category': 'pro'})
+    assert _names(moment) == ['Мастер']
+
+
+def test_board_forgets_purged_festival(db, contest):
+    moment = at(contest['day'], 10, 30)
+    assert _names(moment) == ['pro1']
+
+    deletion.purge_festival(contest['day'].festival_id)
+    assert _names(moment) is None
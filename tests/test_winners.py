@@ -0,0 +1,71 @@
+import winners
+from models import Participation, Score, User, Winner
+
+
+def _entrant(db, contest, code, category, score):
+    """Еще один участник конкурса с оценкой судьи по единственному критерию."""
+    user = User(code=code, nickname=f'u{code}', role='participant', experience_category=category)
+    db.session.add(user)
+    db.session.flush()
+    participation = Participation(user_id=user.id, time_slot_id=contest['slot'].id)
+    db.session.add(participation)
+    db.session.flush()
+    db.session.add(Score(judge_id=contest['judge'].id, participation_id=participation.id,
+                         criterion_id=contest['criterion'].id, score=score))
+    return participation.id
+
+
+def _finished(db, contest, scores):
+    ids = {code: _entrant(db, contest, code, category, score) for code, (category, score) in scores.items()}
+    contest['slot'].status = 'completed'
+    db.session.commit()
+    return ids
+
+
+def test_rank_stops_at_tie_in_top_places():
+    assert winners._rank([(1, 9.0), (2, 8.0), (3, 7.0), (4, 7.0)]) == ({1: 1, 2: 2}, [3, 4])
+    # Ничья ниже третьего места на призовые места не влияет
+    assert winners._rank([(1, 9.0), (2, 8.0), (3, 7.0), (4, 6.0), (5, 6.0)]) == ({1: 1, 2: 2, 3: 3}, None)
+    # Заявки без баллов мест не получают
+    assert winners._rank([(1, 0), (2, 5.0)]) == ({2: 1}, None)
+
+
+def test_tie_is_left_to_admin(db, contest):
+    ids = _finished(db, contest, {'101': ('pro', 8), '102': ('junior', 6), '103': ('junior', 4)})
+    # Участник из фикстуры (pro) без оценки - ставим ему ту же 8 для ничьей
+    db.session.add(Score(judge_id=contest['judge'].id, participation_id=contest['participation'].id,
+                         criterion_id=contest['criterion'].id, score=8))
+    db.session.commit()
+
+    plan, _, _ = winners.plan_day(contest['day'].id)
+    actions = {g['category']: (g['action'], g['proposed'], sorted(g['tie'])) for g in plan}
+    assert actions == {
+        'pro': ('tie', [], sorted([ids['101'], contest['participation'].id])),
+        'junior': ('update', [(ids['102'], 1), (ids['103'], 2)], []),
+    }
+
+    assert winners.apply_plan(plan) == 1
+    db.session.commit()
+    assert sorted((w.experience_category, w.participation_id, w.place) for w in Winner.query) == [
+        ('junior', ids['102'], 1), ('junior', ids['103'], 2)]
+    # После применения изменений не осталось
+    plan, _, _ = winners.plan_day(contest['day'].id)
+    assert {g['category']: g['action'] for g in plan} == {'pro': 'tie', 'junior': 'unchanged'}
+
+
+def test_fingerprint_tracks_only_proposed_changes(db, contest):
+    ids = _finished(db, contest, {'101': ('junior', 6), '102': ('junior', 4)})
+    day_id = contest['day'].id
+    fingerprint = winners.plan_fingerprint(winners.plan_day(day_id)[0])
+    assert winners.plan_fingerprint(winners.plan_day(day_id)[0]) == fingerprint
+
+    # Оценку изменили после предпросмотра - места другие, отпечаток тоже
+    Score.query.filter_by(participation_id=ids['102']).one().score = 9
+    db.session.commit()
+    changed = winners.plan_day(day_id)[0]
+    assert winners.plan_fingerprint(changed) != fingerprint
+
+    # Без изменений к применению отпечаток одинаковый, что бы ни было в плане
+    winners.apply_plan(changed)
+    db.session.commit()
+    assert winners.plan_fingerprint(winners.plan_day(day_id)[0]) == winners.plan_fingerprint([])
@@ -0,0 +1,174 @@
+# timeline.py
+# Табло зон «сейчас / далее»: индекс расписания дня в памяти процесса.
+#
+# На каждую дату держим слоты, разложенные по зонам и отсортированные по
+# времени начала, вместе с участниками и судьями. «Что идет в зоне в момент T»
+# - bisect по списку начал, без обращений к БД. Индекс даты перестраивается,
+# только когда расписание этого дня меняют в админке: маршруты вызывают
+# invalidate_day()/invalidate_slot() после коммита, а удаление и архивация
+# (deletion.py) и правка пользователя - invalidate_dates() для затронутых дат. Метка дня - файл в
+# TIMELINE_DIR; новый файл (os.replace) видят все воркеры через os.stat,
+# а не через БД.
+
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+from sqlalchemy import select
+
+from extensions import db
+from models import TimeSlot, EventDay, Participation, JudgeNomination
+from refdata import CATEGORY_MAP
+import loaders
+
+# Сколько дат держать в памяти (сегодня, вчера и т.п.)
+MAX_DAYS = 7
+
+
+class ZoneTimeline:
+    """Слоты одной зоны за дату, по времени начала."""
+
+    __slots__ = ('starts', 'ends', 'slots')
+
+    def __init__(self, items):
+        items = sorted(items, key=lambda item: (item[0], item[2]['id']))
+        self.starts = [start for start, _, _ in items]
+        self.ends = [end for _, end, _ in items]
+        self.slots = [info for _, _, info in items]
+
+    def at(self, moment):
+        """(текущий слот или None, следующий слот или None) в момент moment."""
+        index = bisect_right(self.starts, moment)
+        current = self.slots[index - 1] if index and self.ends[index - 1] > moment else None
+        upcoming = self.slots[index] if index < len(self.slots) else None
+        return current, upcoming
+
+
+def _title(slot):
+    if slot.type == 'judging':
+        return slot.nomination_template.name if slot.nomination_template else 'Конкурс'
+    if slot.type == 'award':
+        return slot.award_title or 'Награждение'
+    return slot.event_title or 'Событие'
+
+
+def _slot_info(slot):
+    return {
+        'id': slot.id,
+        'type': slot.type,
+        'title': _title(slot),
+        'category': CATEGORY_MAP.get(slot.category) if slot.category else None,
+        'start': slot.start_time.strftime('%H:%M'),
+        'end': slot.end_time.strftime('%H:%M'),
+        'participants': [{'entry': p.entry_number, 'name': p.user.nickname or p.user.code}
+                         for p in sorted(slot.participants, key=lambda p: (p.entry_number or 0, p.id))],
+        'judges': sorted(a.judge.nickname or a.judge.code for a in slot.judge_assignments),
+    }
+
+
+def build_day(day):
+    """Индекс даты: {зона: ZoneTimeline} (все дни фестивалей на эту дату)."""
+    slots = TimeSlot.query.join(EventDay, EventDay.id == TimeSlot.day_id).filter(
+        EventDay.date == day, TimeSlot.zone.isnot(None)
+    ).options(*loaders.CONTEST_RESULTS).all()
+    by_zone = {}
+    for slot in slots:
+        by_zone.setdefault(slot.zone, []).append((slot.start_time, slot.end_time, _slot_info(slot)))
+    return {zone: ZoneTimeline(items) for zone, items in by_zone.items()}
+
+
+class Timeline:
+    def __init__(self, app=None):
+        self.app = None
+        self.directory = None
+        # дата -> (метка, {зона: ZoneTimeline})
+        self._days = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['timeline'] = self
+        self.directory = app.config['TIMELINE_DIR']
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, day):
+        return os.path.join(self.directory, day.isoformat())
+
+    def _stamp(self, day):
+        try:
+            st = os.stat(self._path(day))
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def now_next(self, zone, moment=None):
+        """
+        Текущий и следующий слот зоны: (метка индекса, текущий, следующий).
+        БД читается только при первом обращении к дате и после изменения ее расписания.
+        """
+        moment = moment or datetime.now()
+        stamp, zones = self._index(moment.date())
+        timeline = zones.get(zone)
+        if timeline is None:
+            return stamp, None, None
+        return (stamp,) + timeline.at(moment)
+
+    def _index(self, day):
+        stamp = self._stamp(day)
+        cached = self._days.get(day)
+        if cached and cached[0] == stamp:
+            return cached
+        with self._lock:
+            cached = self._days.get(day)
+            if cached and cached[0] == stamp:
+                return cached
+            zones = build_day(day)
+            if day not in self._days and len(self._days) >= MAX_DAYS:
+                # Вытесняем самую далекую от запрошенной дату
+                self._days.pop(max(self._days, key=lambda d: abs((d - day).days)))
+            self._days[day] = cached = (stamp, zones)
+            return cached
+
+    def invalidate(self, day):
+        """Помечает расписание даты измененным для всех воркеров (вызывать после коммита)."""
+        # Новый файл вместо перезаписи: другой inode меняет метку даже в пределах одного тика часов
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp, self._path(day))
+        with self._lock:
+            self._days.pop(day, None)
+
+    def invalidate_day(self, day_id):
+        day = db.session.scalar(select(EventDay.date).where(EventDay.id == day_id))
+        if day is not None:
+            self.invalidate(day)
+
+    def invalidate_dates(self, days):
+        for day in set(days):
+            self.invalidate(day)
+
+    # Даты для invalidate_dates() - собрать до удаления строк
+    def festival_dates(self, festival_id):
+        return set(db.session.scalars(select(EventDay.date).where(EventDay.festival_id == festival_id)))
+
+    def user_dates(self, user_id):
+        """Даты, на табло которых виден пользователь - как участник или как судья."""
+        slot_ids = select(Participation.time_slot_id).where(Participation.user_id == user_id).union(
+            select(JudgeNomination.time_slot_id).where(JudgeNomination.judge_id == user_id))
+        return set(db.session.scalars(select(EventDay.date).join(TimeSlot, TimeSlot.day_id == EventDay.id)
+                                      .where(TimeSlot.id.in_(slot_ids)).distinct()))
+
+    def invalidate_slot(self, slot_id):
+        day = db.session.scalar(select(EventDay.date).join(TimeSlot, TimeSlot.day_id == EventDay.id)
+                                .where(TimeSlot.id == slot_id))
+        if day is not None:
+            self.invalidate(day)
+
+
+timeline = Timeline()
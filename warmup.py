@@ -0,0 +1,132 @@
+# warmup.py
+# Прогрев воркера при старте: шаблоны и справочники.
+#
+# Без прогрева каждый воркер gunicorn компилирует шаблон при первом обращении
+# к странице, и первый судья после перезапуска ждет дольше остальных. Здесь:
+#   - байткод-кэш Jinja на диске (общий для всех воркеров и перезапусков):
+#     повторная компиляция шаблона сводится к чтению файла;
+#   - в create_app все шаблоны компилируются заранее и попадают в кэш
+#     окружения Jinja, справочники (refdata) загружаются в память;
+#   - отчет о времени прогрева пишется в лог.
+# Под командами `flask ...` (миграции и т.п.) автоматический прогрев не
+# выполняется; `flask warmup` заполняет байткод-кэш при выкладке и печатает отчет.
+
+import logging
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+import refdata
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_EXTENSIONS = ('.html',)
+
+
+class CountingBytecodeCache(FileSystemBytecodeCache):
+    """Байткод-кэш, который считает попадания (для отчета о прогреве)."""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.hits = 0
+
+    def load_bytecode(self, bucket):
+        super().load_bytecode(bucket)
+        if bucket.code is not None:
+            self.hits += 1
+
+
+class Warmup:
+    def __init__(self, app=None):
+        self.app = None
+        self.bytecode_cache = None
+        self.report = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['warmup'] = self
+        directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.bytecode_cache = CountingBytecodeCache(directory)
+            app.jinja_env.bytecode_cache = self.bytecode_cache
+        app.cli.add_command(warmup_command)
+
+        if app.config.get('WARMUP_ON_START', True) and not os.environ.get('FLASK_RUN_FROM_CLI'):
+            self.report = self.run()
+            logger.info(format_report(self.report))
+
+    def run(self):
+        """Компилирует все шаблоны и загружает справочники. Возвращает отчет (словарь)."""
+        started = time.perf_counter()
+        hits_before = self.bytecode_cache.hits if self.bytecode_cache else 0
+        env = self.app.jinja_env
+        compiled, failed = 0, []
+        for name in env.list_templates(extensions=[ext.lstrip('.') for ext in TEMPLATE_EXTENSIONS]):
+            try:
+                env.get_template(name)
+                compiled += 1
+            except Exception as e:
+                failed.append(f'{name}: {e}')
+                logger.exception('Не удалось скомпилировать шаблон %s', name)
+        templates_ms = (time.perf_counter() - started) * 1000
+
+        refdata_started = time.perf_counter()
+        refdata_ok = self._load_refdata()
+        refdata_ms = (time.perf_counter() - refdata_started) * 1000
+
+        return {
+            'pid': os.getpid(),
+            'templates': compiled,
+            'templates_failed': failed,
+            'bytecode_hits': (self.bytecode_cache.hits - hits_before) if self.bytecode_cache else None,
+            'templates_ms': round(templates_ms, 1),
+            'refdata_loaded': refdata_ok,
+            'refdata_ms': round(refdata_ms, 1),
+            'total_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def _load_refdata(self):
+        with self.app.app_context():
+            try:
+                refdata.get_reference_data()
+                return True
+            except SQLAlchemyError as e:
+                # Например, БД еще не создана или не применены миграции
+                logger.warning('Прогрев: справочники не загружены: %s', getattr(e, 'orig', e))
+                return False
+            finally:
+                db.session.remove()
+                # Соединения не должны пережить fork в воркеры gunicorn (--preload)
+                db.engine.dispose()
+
+
+def format_report(report):
+    bytecode = ('байткод-кэш выключен' if report['bytecode_hits'] is None
+                else f"из байткод-кэша: {report['bytecode_hits']}")
+    refdata_part = (f"справочники за {report['refdata_ms']} мс" if report['refdata_loaded']
+                    else 'справочники не загружены')
+    text = (f"Прогрев воркера {report['pid']}: {report['templates']} шаблонов за {report['templates_ms']} мс "
+            f"({bytecode}), {refdata_part}, всего {report['total_ms']} мс")
+    if report['templates_failed']:
+        text += f"; ошибки в шаблонах: {', '.join(report['templates_failed'])}"
+    return text
+
+
+@click.command('warmup')
+@with_appcontext
+def warmup_command():
+    """Скомпилировать все шаблоны в байткод-кэш, загрузить справочники и показать отчет."""
+    report = current_app.extensions['warmup'].run()
+    click.echo(format_report(report))
+
+
+warmup = Warmup()
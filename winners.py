@@ -0,0 +1,170 @@
+# winners.py
+# Итоги дня: места 1-3 по всем завершенным конкурсам дня за один проход.
+#
+# Итоговый балл считается так же, как на странице результатов: среднее по
+# назначенным судьям от среднего балла судьи по критериям шаблона. Весь
+# расчет - один агрегирующий запрос. Если в первую тройку категории попадает
+# ничья, места для этой категории не назначаются автоматически - их решает
+# администратор, а существующие записи остаются как есть.
+
+import hashlib
+from itertools import groupby
+
+from sqlalchemy import and_, delete, func, insert, select, tuple_
+
+from extensions import db
+from models import TimeSlot, Participation, Score, JudgeNomination, Winner, User
+from models.nomination_template import nomination_template_criteria
+import leaderboard
+import loaders
+import notifications
+
+PLACES = 3
+EXPERIENCE_CATEGORIES = ('pro', 'junior')
+# Итоги можно подвести и после награждения (sweeper переводит конкурс в 'awarded')
+FINISHED_STATUSES = ('completed', 'awarded')
+
+
+def final_scores_query(*conditions):
+    """
+    Запрос итоговых баллов заявок конкурсов, отобранных условиями на TimeSlot:
+    строки (time_slot_id, experience_category, participation_id, final_score).
+    Заявки без единой оценки в результат не попадают.
+    """
+    judge_averages = select(
+        Participation.id.label('participation_id'),
+        Participation.time_slot_id.label('time_slot_id'),
+        func.coalesce(User.experience_category, 'junior').label('experience_category'),
+        func.avg(Score.score).label('judge_avg'),
+    ).join(Score, Score.participation_id == Participation.id).join(
+        User, User.id == Participation.user_id
+    ).join(TimeSlot, TimeSlot.id == Participation.time_slot_id).join(
+        # Учитываем только назначенных на конкурс судей и только критерии его шаблона
+        JudgeNomination, and_(JudgeNomination.time_slot_id == TimeSlot.id,
+                              JudgeNomination.judge_id == Score.judge_id)
+    ).join(nomination_template_criteria, and_(
+        nomination_template_criteria.c.nomination_template_id == TimeSlot.nomination_template_id,
+        nomination_template_criteria.c.criterion_id == Score.criterion_id)
+    ).where(
+        TimeSlot.type == 'judging', *conditions
+    ).group_by(Participation.id, Score.judge_id).subquery()
+
+    return select(
+        judge_averages.c.time_slot_id, judge_averages.c.experience_category,
+        judge_averages.c.participation_id, func.avg(judge_averages.c.judge_avg),
+    ).group_by(judge_averages.c.participation_id)
+
+
+def day_final_scores(day_id):
+    """
+    Итоговые баллы всех заявок завершенных конкурсов дня одним запросом:
+    [(time_slot_id, experience_category, participation_id, final_score)].
+    """
+    rows = db.session.execute(final_scores_query(
+        TimeSlot.day_id == day_id, TimeSlot.status.in_(FINISHED_STATUSES))).all()
+    # Округляем как на странице результатов: ничьей считается равенство видимых баллов
+    return [(slot_id, category, participation_id, round(score, 2))
+            for slot_id, category, participation_id, score in rows]
+
+
+def _rank(entries):
+    """
+    entries: [(participation_id, score)] одной категории конкурса.
+    Возвращает (места {participation_id: place}, ничья или None).
+    Ничья - список participation_id с равным баллом, которые делят место в первой тройке.
+    """
+    entries = sorted((e for e in entries if e[1] > 0), key=lambda e: e[1], reverse=True)
+    places = {}
+    place = 1
+    for score, group in groupby(entries, key=lambda e: e[1]):
+        if place > PLACES:
+            break
+        group = [participation_id for participation_id, _ in group]
+        if len(group) > 1:
+            return places, group
+        places[group[0]] = place
+        place += 1
+    return places, None
+
+
+def plan_day(day_id):
+    """
+    Предпросмотр итогов дня: по каждому завершенному конкурсу и категории участников -
+    текущие и рассчитанные места. Ничего не пишет.
+    """
+    contests = TimeSlot.query.filter(
+        TimeSlot.day_id == day_id, TimeSlot.type == 'judging', TimeSlot.status.in_(FINISHED_STATUSES)
+    ).options(*loaders.SLOT_SUMMARY).order_by(TimeSlot.start_time).all()
+    contest_ids = [c.id for c in contests]
+
+    scores = {}
+    for slot_id, category, participation_id, score in day_final_scores(day_id):
+        scores.setdefault((slot_id, category), []).append((participation_id, score))
+
+    current = {}
+    if contest_ids:
+        for w in Winner.query.filter(Winner.time_slot_id.in_(contest_ids)):
+            current.setdefault((w.time_slot_id, w.experience_category), {})[w.participation_id] = w.place
+
+    names = dict(db.session.query(Participation.id, func.coalesce(User.nickname, User.code)).join(
+        User, User.id == Participation.user_id).filter(Participation.time_slot_id.in_(contest_ids))) if contest_ids else {}
+    score_by_participation = {pid: score for entries in scores.values() for pid, score in entries}
+
+    plan = []
+    for contest in contests:
+        for category in EXPERIENCE_CATEGORIES:
+            key = (contest.id, category)
+            if key not in scores and key not in current:
+                continue
+            proposed, tie = _rank(scores.get(key, []))
+            existing = current.get(key, {})
+            if tie:
+                action = 'tie'
+            elif proposed == existing:
+                action = 'unchanged'
+            else:
+                action = 'update'
+            plan.append({
+                'contest': contest,
+                'category': category,
+                'action': action,
+                'current': sorted(existing.items(), key=lambda item: item[1]),
+                'proposed': sorted(proposed.items(), key=lambda item: item[1]),
+                'tie': tie or [],
+            })
+    return plan, names, score_by_participation
+
+
+def plan_fingerprint(plan):
+    """Отпечаток изменений: применяем только то, что администратор видел в предпросмотре."""
+    changes = [(g['contest'].id, g['category'], tuple(g['proposed']))
+               for g in plan if g['action'] == 'update']
+    return hashlib.sha1(repr(changes).encode()).hexdigest()
+
+
+def apply_plan(plan):
+    """
+    Записывает рассчитанные места одной транзакцией (delete + insert по всем
+    изменившимся категориям) и ставит в очередь уведомления победителям.
+    Коммит делает вызывающий. Возвращает число обновленных категорий.
+    """
+    groups = [g for g in plan if g['action'] == 'update']
+    if not groups:
+        return 0
+
+    keys = [(g['contest'].id, g['category']) for g in groups]
+    db.session.execute(delete(Winner).where(
+        tuple_(Winner.time_slot_id, Winner.experience_category).in_(keys)
+    ), execution_options={'synchronize_session': False})
+
+    rows = [{'participation_id': participation_id, 'time_slot_id': g['contest'].id,
+             'experience_category': g['category'], 'place': place}
+            for g in groups for participation_id, place in g['proposed']]
+    if rows:
+        db.session.execute(insert(Winner), rows)
+
+    for contest_id, category in keys:
+        notifications.enqueue_award_results(contest_id, category)
+    # Массовая запись мимо flush - табло этих конкурсов пересоберется при коммите
+    leaderboard.mark_contests({contest_id for contest_id, _ in keys})
+    return len(groups)